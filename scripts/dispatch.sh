@@ -5,6 +5,7 @@ set -euo pipefail
 #
 # Usage:
 #   dispatch.sh render <composition.js> [cycles] [bpm]
+#   dispatch.sh pipeline <composition.js>... [--cycles N] [--bpm N] [--jobs N]
 #   dispatch.sh play <name> [channel-id]
 #   dispatch.sh list
 #   dispatch.sh samples <subcommand> [args...]
@@ -137,6 +138,10 @@ case "${1:-help}" in
     shift
     _render "${1:?Usage: dispatch.sh render <file.js> [cycles] [bpm]}" "${2:-16}" "${3:-120}"
     ;;
+  pipeline)
+    shift
+    exec "$SCRIPT_DIR/strudel-qa" pipeline "$@"
+    ;;
   play)
     shift
     _play "${1:?Usage: dispatch.sh play <name> [channel-id]}" "${2:-}"
@@ -163,6 +168,7 @@ case "${1:-help}" in
     echo ""
     echo "Commands:"
     echo "  render <file.js> [cycles] [bpm]  — Render a composition to WAV/MP3"
+    echo "  pipeline <file.js>... [options]   — Render + QA + MP3 with overlapping stages"
     echo "  play <name> [channel-id]         — Render + stream to Discord VC"
     echo "  list                              — Show available compositions"
     echo "  samples <subcommand> [args]       — Manage sample packs"
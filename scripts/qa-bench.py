@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""qa-bench.py — QA benchmarks; same as `strudel-qa bench` (see strudel_qa/)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from strudel_qa.cli import run
+
+run("bench", sys.argv[1:], prog=os.path.basename(sys.argv[0]))
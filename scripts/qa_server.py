@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""qa_server.py — Resident QA server; same as `strudel-qa serve` (see strudel_qa/)."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from strudel_qa.cli import run
+
+run("serve", sys.argv[1:], prog=os.path.basename(sys.argv[0]))
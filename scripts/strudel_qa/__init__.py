@@ -0,0 +1,43 @@
+"""
+strudel_qa — Post-render and live QA tools for Strudel compositions.
+
+One package behind the `strudel-qa` command (scripts/strudel-qa):
+
+    strudel-qa gate     <audio>   QA gate: null drops, spectral floor, LUFS, true peak
+    strudel-qa analyze  <audio>   Per-window spectral diagnostic and anomaly list
+    strudel-qa gaps     <audio>   Null-drop (silence gap) detector
+    strudel-qa pipeline <js>...   Render, QA and MP3-encode with overlapping stages
+    strudel-qa history <query>    Metric drift and regressions from recorded QA runs
+    strudel-qa tap                Live QA on a raw PCM stream (stdin)
+    strudel-qa bench              Benchmarks on synthetic renders
+    strudel-qa serve              Resident server the commands above delegate to
+
+The shared core (audio_session, loudness, gaps, spectrum, wavmap) is numpy
+code; the command modules import it only once they have work to do, so
+`--help`, cache hits and server delegation start on the standard library
+alone. The old script names (scripts/qa-gate.py, analyze-render.py,
+null-drop-detect.py, qa-tap.py, qa-bench.py, qa_server.py) are thin wrappers
+around the same entry points.
+
+Usage:
+    from strudel_qa import run_qa_gate, analyze, analyze_region, detect_null_drops, run_pipeline
+"""
+
+_EXPORTS = {
+    "run_qa_gate": "gate",
+    "analyze": "analyze",
+    "analyze_region": "region",
+    "detect_null_drops": "null_drops",
+    "run_pipeline": "pipeline",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    # Import command modules on first use, not with the package
+    if name in _EXPORTS:
+        import importlib
+        module = importlib.import_module(f".{_EXPORTS[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
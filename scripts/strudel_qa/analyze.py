@@ -0,0 +1,663 @@
+"""
+analyze.py — Post-render spectral diagnostic for headless audio agents.
+
+Analyzes a rendered WAV/MP3 and outputs a machine-readable JSON report:
+  - Per-window stats (K-weighted loudness, RMS, silence, centroid, flux,
+    rolloff, flatness) from one batched STFT, optionally with overlapping hops
+  - Summary: total silence, cliff count, ITU BS.1770 integrated loudness,
+    loudness range and true peak (shared with `strudel-qa gate` via loudness.py)
+  - Anomaly list: timestamped issues with severity
+
+Usage:
+  strudel-qa analyze <input.wav|mp3> [--window 3.0] [--hop 1.5] [--json] [--quiet]
+                     [--cliff-windows 20,100] [--stream] [--quick] [--shard-jobs N]
+                     [--format json|columns|ndjson|npz] [--output FILE]
+                     [--spectrogram out.png] [--spectrogram-size 1200x256]
+                     [--from SECONDS] [--to SECONDS]
+  python3 scripts/analyze-render.py ...   (same thing)
+
+--json prints the report as indented JSON, one dict per window. For long
+renders with fine windows --format picks a cheaper encoding of the same
+data (reports.py): "columns" (compact JSON, one list per metric), "ndjson"
+(each window printed as soon as it is computed, then anomalies and the
+summary) or "npz" (numpy arrays; needs --output). --output FILE writes the
+report there instead of stdout, once the run has succeeded (ndjson streams
+into FILE.part, renamed over FILE at the end).
+
+--spectrogram FILE writes a log-frequency spectrogram PNG with the
+anomalies marked above it (red critical, yellow warning). It is built from
+the same decoded blocks with numpy and zlib (spectrogram.py), so it works
+with --stream and memory stays bounded however long the render is.
+
+--from/--to analyse only that span (region.py), for drilling into an
+anomaly: the file is seeked and only the span plus a 0.5 s margin is
+decoded, so the cost follows the span rather than the track. Windows
+default to 10 ms there, cliffs are checked at 20 and 100 ms, and the
+report adds sample-accurate "gaps". Either bound may be left out.
+
+--stream reads ffmpeg's output in fixed-size blocks and updates every metric
+incrementally, so memory stays flat for hour-long renders.
+
+--shard-jobs N splits a long render into fixed time shards and analyses
+them on N processes that read the decoded audio from shared memory
+(shards.py); the partial results merge into the same report as a
+single-process run.
+
+--quick estimates the summary from the peak envelope and a fixed number of
+sampled excerpts (quick.py) instead of analysing every window: integrated
+LUFS and spectral share below 320 Hz ± a ~95% bound, true peak between
+strict bounds, and likely gaps as anomalies. WAV PCM is memory-mapped, so
+only the excerpts are read. "quick.needs_full_pass" is set when a bound is
+too wide to settle a verdict (LUFS near the -14..-18 target, true peak
+near -1 dBTP); windows are not reported.
+
+--history records the summary metrics in the QA history database
+(history.py) under the composition (--composition, default the file's
+stem), --render-params and the renderer version, for `strudel-qa history`.
+
+--timings adds per-stage wall time and peak memory to the report, and
+--profile FILE writes a Chrome trace (.json) or cProfile dump (see
+instrument.py).
+
+Reports are cached under $STRUDEL_TMP/qa-cache, keyed on the audio's content
+hash, the analysis options and the QA code version (see cache.py); a
+re-rendered but unchanged file is answered without decoding. --no-cache
+bypasses the cache.
+
+If the QA server (strudel-qa serve) is running, the invocation is handed to
+it over its Unix socket (same output and exit code, without the import cost).
+
+The decoding and feature kernels live in features.py and are only imported
+once the cache has missed.
+
+Dependencies: numpy, scipy, ffmpeg (in PATH)
+
+dandelion cult — ronan🌊 / 2026-02-28
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from . import reports
+from .cache import ReportCache
+from .client import delegate
+from .history import add_record_arguments, recorder
+from .instrument import NO_TIMINGS, Timings, profiling
+
+
+def analyze(path, window_sec=3.0, silence_threshold_db=-50, cliff_threshold_db=20,
+            cliff_windows_ms=(100,), hop_sec=None, stream=False, block_frames=1 << 16,
+            cache=None, timings=NO_TIMINGS, shard_jobs=1, on_window=None,
+            spectrogram=None, spectrogram_size=(1200, 256)):
+    """
+    Run full analysis on an audio file. `hop_sec` < `window_sec` overlaps windows.
+
+    With `stream`, ffmpeg's output is consumed in `block_frames` blocks and
+    every metric is updated incrementally, so memory stays constant with
+    track length. Both modes share the same trackers and give the same report.
+    `cache` (a cache.ReportCache) returns stored reports for identical audio.
+    `timings` (an instrument.Timings) records decode and each analysis stage.
+    `shard_jobs` > 1 analyses time shards of a long track on that many
+    processes (see shards.py; not with `stream`), with the same report.
+    `on_window(window)` is called for each window in order as soon as it is
+    computed (block by block with `stream`), before the report is returned.
+    `spectrogram` is a path to write a `spectrogram_size` (width, height)
+    PNG to, with the anomalies marked (see spectrogram.py); the image needs
+    the audio, so the cache is not consulted.
+    """
+    if cache is not None and os.path.isfile(path) and spectrogram is None:
+        params = {
+            "window_sec": window_sec, "silence_threshold_db": silence_threshold_db,
+            "cliff_threshold_db": cliff_threshold_db,
+            "cliff_windows_ms": list(cliff_windows_ms), "hop_sec": hop_sec,
+        }
+        with timings.stage("cache_lookup"):
+            key = cache.key("analyze-render", path, params)
+            report = cache.get(key)
+        if report is None:
+            report = analyze(path, window_sec, silence_threshold_db, cliff_threshold_db,
+                             cliff_windows_ms, hop_sec, stream, block_frames, timings=timings,
+                             shard_jobs=shard_jobs, on_window=on_window)
+            cache.put(key, report)
+        elif on_window is not None:
+            for window in report["windows"]:
+                on_window(window)
+        report["file"] = os.path.basename(path)
+        return report
+
+    # numpy/scipy load here, after the cache lookup
+    from .features import iter_audio_via_ffmpeg, read_audio_via_ffmpeg
+
+    sr = 44100
+    with timings.stage("decode"):
+        if stream:
+            blocks = iter_audio_via_ffmpeg(path, sr, block_frames)
+        else:
+            frames, sr = read_audio_via_ffmpeg(path, sr)
+            blocks = iter([frames])
+
+    window_samples = int(sr * window_sec)
+    hop_samples = int(sr * hop_sec) if hop_sec else window_samples
+
+    image = None
+    if spectrogram is not None:
+        from .spectrogram import Spectrogram
+        image = Spectrogram(sr, *spectrogram_size)
+
+    sharded = None
+    if shard_jobs > 1 and not stream:
+        from .shards import analyze_sharded
+        with timings.stage("shards"):
+            sharded = analyze_sharded(frames, sr, shard_jobs, window_samples, hop_samples,
+                                      silence_threshold_db, cliff_threshold_db,
+                                      tuple(cliff_windows_ms))
+    if sharded is not None:
+        stats, windows, total_silence_sec, found = sharded
+        duration = len(frames) / sr
+        if on_window is not None:
+            for window in windows:
+                on_window(window)
+        if image is not None:
+            with timings.stage("spectrogram"):
+                for lo in range(0, len(frames), block_frames):
+                    block = frames[lo:lo + block_frames]
+                    image.feed(block.mean(axis=1) if block.shape[1] > 1 else block[:, 0])
+    else:
+        stats, windows, total_silence_sec, found, duration = _measure(
+            blocks, sr, window_samples, hop_samples, silence_threshold_db,
+            cliff_threshold_db, cliff_windows_ms, timings, on_window, image)
+
+    cliffs = merge_cliffs(found)
+    anomalies = build_anomalies(windows, cliffs, len(cliff_windows_ms) > 1)
+
+    if image is not None:
+        with timings.stage("spectrogram"):
+            image.save(spectrogram, anomalies)
+
+    integrated_lufs = max(-100.0, stats["integrated_lufs"])
+
+    report = {
+        "file": os.path.basename(path),
+        "duration_sec": round(duration, 2),
+        "sample_rate": sr,
+        "summary": {
+            "integrated_lufs": round(integrated_lufs, 1),
+            "integrated_lufs_proxy": round(integrated_lufs, 1),
+            "lra": round(stats["lra"], 1),
+            "true_peak_dbfs": round(max(-100.0, stats["true_peak_dbfs"]), 1),
+            "total_silence_sec": round(total_silence_sec, 2),
+            "silence_pct": round(100 * total_silence_sec / duration, 1) if duration > 0 else 0,
+            "cliff_count": len(cliffs),
+            "anomaly_count": len(anomalies),
+            "window_count": len(windows),
+            "window_sec": window_sec,
+            "hop_sec": hop_samples / sr,
+        },
+        "anomalies": anomalies,
+        "windows": windows,
+    }
+
+    return report
+
+
+def merge_cliffs(found: dict) -> list:
+    """Cliffs at every window size from CliffTracker.finish(), each tagged with its window_ms."""
+    cliffs = []
+    for window_ms, window_cliffs in found.items():
+        for cliff in window_cliffs:
+            cliff["window_ms"] = window_ms
+        cliffs.extend(window_cliffs)
+    return cliffs
+
+
+def build_anomalies(windows: list, cliffs: list, multi_window: bool = False) -> list:
+    """
+    Timestamped anomalies from silent and high-flux windows and spectral
+    cliffs, sorted by time. `multi_window` names each cliff's window size.
+    """
+    anomalies = []
+    for w in windows:
+        if w["silent"]:
+            anomalies.append({
+                "time": w["time_start"],
+                "type": "silence",
+                "severity": "critical",
+                "detail": f"Window {w['window']} is silent (RMS {w['rms_db']} dB)"
+            })
+        if w["spectral_flux"] > 0.8:
+            anomalies.append({
+                "time": w["time_start"],
+                "type": "spectral_discontinuity",
+                "severity": "warning",
+                "detail": f"High spectral flux ({w['spectral_flux']:.3f}) — possible hard cut"
+            })
+
+    for cliff in cliffs:
+        detail = f"Energy drop of {cliff['drop_db']} dB"
+        if multi_window:
+            detail += f" within {cliff['window_ms']:g} ms"
+        anomalies.append({
+            "time": cliff["time"],
+            "type": "spectral_cliff",
+            "severity": "critical" if cliff["drop_db"] > 40 else "warning",
+            "detail": detail
+        })
+
+    # Sort anomalies by time
+    anomalies.sort(key=lambda a: a["time"])
+    return anomalies
+
+
+def _measure(blocks, sr, window_samples, hop_samples, silence_threshold_db,
+             cliff_threshold_db, cliff_windows_ms, timings, on_window=None, image=None):
+    """
+    Feed decoded blocks through the loudness meter and window and cliff
+    trackers (and `image`, a spectrogram.Spectrogram): (loudness stats,
+    windows, total silence in s, {window_ms: cliffs}, duration in s).
+    Windows are passed to `on_window` as they are emitted.
+    """
+    from . import loudness
+    from .features import CliffTracker, WindowStatsTracker
+
+    windows_tracker = WindowStatsTracker(sr, window_samples, hop_samples, silence_threshold_db)
+    cliff_tracker = CliffTracker(sr, cliff_threshold_db, cliff_windows_ms)
+    meter = None
+    total_samples = 0
+    reported = 0
+
+    while True:
+        # Streamed blocks are decoded lazily, so time each one as decode
+        with timings.stage("decode"):
+            block = next(blocks, None)
+        if block is None:
+            break
+        if meter is None:
+            meter = loudness.LoudnessMeter(sr, block.shape[1])
+        mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        # K-weighted power feeds both the summary meter and window LUFS
+        with timings.stage("loudness"):
+            kpower = meter.feed(block)
+        with timings.stage("window_stats"):
+            windows_tracker.feed(mono, kpower)
+        if on_window is not None:
+            for window in windows_tracker.windows[reported:]:
+                on_window(window)
+            reported = len(windows_tracker.windows)
+        with timings.stage("cliffs"):
+            cliff_tracker.feed(mono)
+        if image is not None:
+            with timings.stage("spectrogram"):
+                image.feed(mono)
+        total_samples += len(mono)
+
+    if meter is None:
+        meter = loudness.LoudnessMeter(sr, 1)
+    with timings.stage("loudness"):
+        stats = meter.result()
+    with timings.stage("window_stats"):
+        windows = windows_tracker.finish()
+    if on_window is not None:
+        for window in windows[reported:]:
+            on_window(window)
+    total_silence_sec = windows_tracker.total_silence_sec
+    duration = total_samples / sr
+    return stats, windows, total_silence_sec, cliff_tracker.finish(), duration
+
+
+# Verdict limits --quick checks its bounds against (the qa-gate defaults)
+QUICK_LUFS_RANGE = (-18.0, -14.0)
+QUICK_PEAK_LIMIT_DBFS = -1.0
+QUICK_MIN_GAP_MS = 50.0
+
+
+def analyze_quick(path, silence_threshold_db=-50, cache=None, timings=NO_TIMINGS):
+    """
+    Approximate summary with error bounds (see quick.py). Reads only the
+    peak envelope and sampled excerpts of WAV PCM; other formats are
+    decoded with ffmpeg first.
+    """
+    if cache is not None and os.path.isfile(path):
+        with timings.stage("cache_lookup"):
+            key = cache.key("analyze-render-quick", path,
+                            {"silence_threshold_db": silence_threshold_db})
+            report = cache.get(key)
+        if report is None:
+            report = analyze_quick(path, silence_threshold_db, timings=timings)
+            cache.put(key, report)
+        report["file"] = os.path.basename(path)
+        return report
+
+    from .audio_session import AudioSession, MappedSession
+    from .features import read_audio_via_ffmpeg
+    from .loudness import amplitude_to_dbfs
+    from .quick import quick_gaps, quick_loudness, quick_spectrum, quick_true_peak
+    from .wavmap import MappedWav
+
+    with timings.stage("decode"):
+        wav = MappedWav.from_file(path) if os.path.isfile(path) else None
+        if wav is not None:
+            session = MappedSession(wav)
+        else:
+            frames, sr = read_audio_via_ffmpeg(path, 44100)
+            session = AudioSession(frames, sr, path)
+    sr = session.sr
+
+    with timings.stage("loudness"):
+        lufs = quick_loudness(session)
+    with timings.stage("true_peak"):
+        peak = quick_true_peak(session)
+    with timings.stage("spectrum"):
+        spectrum = quick_spectrum(session, 320.0)
+    with timings.stage("gaps"):
+        gaps = quick_gaps(session, 10 ** (silence_threshold_db / 20), 0.0, QUICK_MIN_GAP_MS)
+
+    anomalies = []
+    silence_sec = 0.0
+    longest_gap_ms = 0.0
+    for lo, hi, max_lo, max_hi in gaps:
+        duration_ms = ((hi - lo) + (max_hi - max_lo)) / 2 / sr * 1000.0
+        silence_sec += duration_ms / 1000.0
+        longest_gap_ms = max(longest_gap_ms, duration_ms)
+        anomalies.append({
+            "time": round((lo + max_lo) / 2 / sr, 2),
+            "type": "silence",
+            "severity": "critical" if duration_ms > 100 else "warning",
+            "detail": f"Likely gap of {duration_ms:.0f} ms "
+                      f"(± {(max_hi - max_lo - (hi - lo)) / 2 / sr * 1000.0:.0f} ms)",
+        })
+
+    integrated_lufs = max(-100.0, lufs["integrated_lufs"])
+    peak_dbfs = max(-100.0, amplitude_to_dbfs(peak["value"]))
+    peak_upper = max(-100.0, amplitude_to_dbfs(peak["upper"]))
+    duration = session.duration_s
+
+    confirm = []
+    if lufs["error_lu"] is None or any(abs(integrated_lufs - limit) <= lufs["error_lu"]
+                                       for limit in QUICK_LUFS_RANGE):
+        confirm.append("integrated_lufs")
+    if peak_dbfs <= QUICK_PEAK_LIMIT_DBFS < peak_upper:
+        confirm.append("true_peak_dbfs")
+
+    def bound(value):
+        return None if value is None else round(value, 1)
+
+    return {
+        "file": os.path.basename(path),
+        "duration_sec": round(duration, 2),
+        "sample_rate": sr,
+        "summary": {
+            "integrated_lufs": round(integrated_lufs, 1),
+            "integrated_lufs_error_lu": bound(lufs["error_lu"]),
+            "true_peak_dbfs": round(peak_dbfs, 1),
+            "true_peak_upper_dbfs": round(peak_upper, 1),
+            "sample_peak_dbfs": round(max(-100.0, amplitude_to_dbfs(peak["sample_peak"])), 1),
+            "pct_below_320hz": round(spectrum["pct_below"], 1),
+            "pct_below_320hz_error": bound(spectrum["error_pct"]),
+            "total_silence_sec": round(silence_sec, 2),
+            "silence_pct": round(100 * silence_sec / duration, 1) if duration > 0 else 0,
+            "gap_count": len(gaps),
+            "longest_gap_ms": round(longest_gap_ms),
+            "anomaly_count": len(anomalies),
+        },
+        "anomalies": anomalies,
+        "windows": [],
+        "quick": {
+            "needs_full_pass": bool(confirm),
+            "confirm": confirm,
+            "coverage": {
+                "loudness_blocks": [lufs["blocks"], lufs["of"]],
+                "spectrum_segments": [spectrum["segments"], spectrum["of"]],
+                "peak_blocks": [peak["scanned"], peak["of"]],
+            },
+            "confidence": "LUFS and spectral bounds are z=2 (~95%); "
+                          "true peak and gap bounds are strict",
+        },
+    }
+
+
+def _print_quick(report, quiet):
+    s, quick = report["summary"], report["quick"]
+
+    def pm(value):
+        return "?" if value is None else value
+
+    print(f"═══ Quick Render Analysis: {report['file']} ═══")
+    print(f"Duration: {report['duration_sec']}s")
+    print(f"Integrated LUFS: {s['integrated_lufs']} ± {pm(s['integrated_lufs_error_lu'])} LU")
+    print(f"True peak: {s['true_peak_dbfs']} to {s['true_peak_upper_dbfs']} dBTP "
+          f"(sample peak {s['sample_peak_dbfs']} dBFS)")
+    print(f"Energy below 320 Hz: {s['pct_below_320hz']}% ± {pm(s['pct_below_320hz_error'])}")
+    print(f"Likely silence: {s['total_silence_sec']}s ({s['silence_pct']}%)")
+    if quick["needs_full_pass"]:
+        print(f"Full pass needed: {', '.join(quick['confirm'])} too close to call")
+    else:
+        print("Full pass not needed for the LUFS and true-peak verdicts")
+
+    if not quiet and report["anomalies"]:
+        print(f"\n─── Likely Gaps ───")
+        for a in report["anomalies"]:
+            icon = "🔴" if a["severity"] == "critical" else "🟡"
+            print(f"  {icon} {a['time']:>6.1f}s  {a['detail']}")
+
+
+def _print_region(report, quiet):
+    s, r = report["summary"], report["region"]
+    print(f"═══ Region Analysis: {report['file']} {r['from_s']:.3f}s – {r['to_s']:.3f}s ═══")
+    print(f"Decoded: {r['decoded_sec']}s via {r['decoder']} | "
+          f"Windows: {s['window_count']} × {s['window_sec']}s")
+    print(f"Integrated LUFS: {s['integrated_lufs']} (true peak {s['true_peak_dbfs']} dBTP, "
+          f"sample peak {s['sample_peak_dbfs']} dBFS)")
+    print(f"Silence: {s['total_silence_sec']}s ({s['silence_pct']}%)")
+    print(f"Gaps: {s['gap_count']} | Spectral cliffs: {s['cliff_count']}")
+    print(f"Total anomalies: {s['anomaly_count']}")
+
+    if quiet:
+        return
+    if report["gaps"]:
+        print(f"\n─── Gaps ───")
+        for g in report["gaps"]:
+            # "…" marks an edge that runs past the decoded margin
+            start = ("…" if g["open_start"] else "") + f"{g['start_s']:.6f}s"
+            end = f"{g['end_s']:.6f}s" + ("…" if g["open_end"] else "")
+            print(f"  {start} – {end}  {g['duration_ms']:>8.2f} ms  "
+                  f"samples {g['start_sample']}–{g['end_sample']}")
+    if report["anomalies"]:
+        print(f"\n─── Anomalies ───")
+        for a in report["anomalies"]:
+            icon = "🔴" if a["severity"] == "critical" else "🟡"
+            print(f"  {icon} {a['time']:>9.4f}s  [{a['type']}] {a['detail']}")
+    print(f"\n─── Window Stats ───")
+    for w in report["windows"]:
+        bar = "█" * max(0, int((w["rms_db"] + 60) / 2))
+        silent_mark = " ⚠️ SILENT" if w["silent"] else ""
+        print(f"  {w['time_start']:>9.4f}s  RMS:{w['rms_db']:>6.1f}dB  "
+              f"C:{w['centroid_hz']:>6.0f}Hz  F:{w['spectral_flux']:.3f}  "
+              f"{bar}{silent_mark}")
+
+
+def main(argv: list = None, prog: str = None):
+    # Hand the invocation to a running QA server before paying for
+    # numpy/scipy imports; returns if none is listening
+    delegate("analyze", argv, prog)
+
+    parser = argparse.ArgumentParser(prog=prog, description="Post-render audio diagnostic")
+    parser.add_argument("input", help="Audio file to analyze")
+    parser.add_argument("--window", type=float, default=None,
+                        help="Window size in seconds (default 3.0, or 0.01 with --from/--to)")
+    parser.add_argument("--hop", type=float, default=None,
+                        help="Hop between windows in seconds (default: window size)")
+    parser.add_argument("--json", action="store_true", help="Output raw JSON")
+    parser.add_argument("--format", choices=reports.FORMATS, default=None,
+                        help="Report format: json (as --json), columns, ndjson or npz")
+    parser.add_argument("--output", "-o", metavar="FILE", default=None,
+                        help="Write the --json/--format report to FILE")
+    parser.add_argument("--spectrogram", metavar="FILE", default=None,
+                        help="Write a spectrogram PNG with the anomalies marked")
+    parser.add_argument("--spectrogram-size", default="1200x256", metavar="WxH",
+                        help="Spectrogram image size in pixels (default 1200x256)")
+    parser.add_argument("--quiet", action="store_true", help="Summary only")
+    parser.add_argument("--silence-threshold", type=float, default=-50, help="Silence threshold in dB")
+    parser.add_argument("--cliff-threshold", type=float, default=20, help="Cliff detection threshold in dB")
+    parser.add_argument("--cliff-windows", default=None,
+                        help="Comma-separated cliff window sizes in ms "
+                             "(default 100, or 20,100 with --from/--to)")
+    parser.add_argument("--from", dest="start", type=float, default=None, metavar="SECONDS",
+                        help="Analyse a region starting here, at high resolution")
+    parser.add_argument("--to", dest="end", type=float, default=None, metavar="SECONDS",
+                        help="End of the region (default: end of track)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Decode in blocks with constant memory (long renders)")
+    parser.add_argument("--quick", action="store_true",
+                        help="Approximate summary with error bounds from sampled excerpts")
+    parser.add_argument("--shard-jobs", type=int, default=1, metavar="N",
+                        help="Analyse time shards of long renders on N processes")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore and don't update the QA report cache")
+    parser.add_argument("--timings", action="store_true",
+                        help="Add per-stage wall time and peak memory to the report")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="Write a Chrome trace (.json) or cProfile dump of the run")
+    add_record_arguments(parser)
+    args = parser.parse_args(argv)
+    fmt = args.format or ("json" if args.json else None)
+    if args.json and args.format not in (None, "json"):
+        parser.error("--json is --format json; pass one of them")
+    if fmt == "npz" and not args.output:
+        parser.error("--format npz needs --output FILE")
+    if args.output and fmt is None:
+        parser.error("--output needs --json or --format")
+    if args.shard_jobs < 1:
+        parser.error("--shard-jobs must be at least 1")
+    if args.shard_jobs > 1 and args.stream:
+        parser.error("--shard-jobs needs the whole track in memory; drop --stream")
+    region = args.start is not None or args.end is not None
+    if region and (args.quick or args.stream or args.shard_jobs > 1):
+        parser.error("--from/--to decode only the region; drop --quick, --stream and --shard-jobs")
+    if region and args.start is not None and args.start < 0:
+        parser.error("--from must not be negative")
+    if region and args.end is not None and args.end <= (args.start or 0.0):
+        parser.error("--to must be after --from")
+    if region and args.history:
+        parser.error("--history records whole renders; not with --from/--to")
+    if args.spectrogram and args.quick:
+        parser.error("--spectrogram needs every sample; drop --quick")
+    try:
+        spectrogram_size = tuple(int(n) for n in args.spectrogram_size.lower().split("x"))
+    except ValueError:
+        spectrogram_size = ()
+    if len(spectrogram_size) != 2 or min(spectrogram_size) < 1:
+        parser.error("--spectrogram-size must be WIDTHxHEIGHT, e.g. 1200x256")
+
+    if region:
+        from .region import CLIFF_WINDOWS_MS, WINDOW_S
+    window = args.window or (WINDOW_S if region else 3.0)
+    if args.cliff_windows is None:
+        cliff_windows = CLIFF_WINDOWS_MS if region else (100.0,)
+    else:
+        cliff_windows = tuple(float(w) for w in args.cliff_windows.split(",") if w.strip())
+    cache = None if args.no_cache else ReportCache.default()
+    timings = Timings() if args.timings or args.profile else NO_TIMINGS
+    out, part = sys.stdout, None
+    on_window = None
+    if fmt == "ndjson":
+        if args.output:
+            # Windows are written as they come; a failed run must not
+            # replace an earlier report with a partial one
+            part = args.output + ".part"
+            out = open(part, "w")
+
+        def on_window(window):
+            out.write(json.dumps(reports.window_record(window), separators=reports.COMPACT) + "\n")
+            out.flush()
+
+    try:
+        with profiling(args.profile, timings):
+            if args.quick:
+                report = analyze_quick(args.input, args.silence_threshold, cache=cache,
+                                       timings=timings)
+            elif region:
+                from .region import analyze_region
+                try:
+                    report = analyze_region(args.input, args.start or 0.0, args.end, window,
+                                            args.hop, args.silence_threshold,
+                                            args.cliff_threshold, cliff_windows, timings=timings,
+                                            on_window=on_window, spectrogram=args.spectrogram,
+                                            spectrogram_size=spectrogram_size)
+                except ValueError as e:
+                    parser.error(str(e))
+            else:
+                report = analyze(args.input, window, args.silence_threshold, args.cliff_threshold,
+                                 cliff_windows, args.hop, stream=args.stream, cache=cache,
+                                 timings=timings, shard_jobs=args.shard_jobs, on_window=on_window,
+                                 spectrogram=args.spectrogram, spectrogram_size=spectrogram_size)
+        if args.timings:
+            report["timings"] = timings.report()
+        with recorder(args, "analyze-quick" if args.quick else "analyze") as record:
+            record(report)
+        if fmt == "ndjson":
+            reports.write_ndjson(report, out, windows=False)
+    except BaseException:
+        if part is not None:
+            out.close()
+            os.unlink(part)
+        raise
+    if part is not None:
+        out.close()
+        os.replace(part, args.output)
+
+    if fmt is not None:
+        # The other formats open --output only now, with the report complete
+        if fmt in ("json", "columns"):
+            out = open(args.output, "w") if args.output else sys.stdout
+            if fmt == "json":
+                out.write(json.dumps(report, indent=2) + "\n")
+            else:
+                out.write(json.dumps(reports.columnar_report(report), separators=reports.COMPACT) + "\n")
+            if out is not sys.stdout:
+                out.close()
+        elif fmt == "npz":
+            reports.write_npz(report, args.output)
+        return
+
+    if args.quick:
+        _print_quick(report, args.quiet)
+    elif region:
+        _print_region(report, args.quiet)
+    else:
+        # Human-readable summary
+        s = report["summary"]
+        print(f"═══ Render Analysis: {report['file']} ═══")
+        print(f"Duration: {report['duration_sec']}s | Windows: {s['window_count']} × {s['window_sec']}s")
+        print(f"Integrated LUFS: {s['integrated_lufs']} (LRA {s['lra']} LU, "
+              f"true peak {s['true_peak_dbfs']} dBTP)")
+        print(f"Silence: {s['total_silence_sec']}s ({s['silence_pct']}%)")
+        print(f"Spectral cliffs: {s['cliff_count']}")
+        print(f"Total anomalies: {s['anomaly_count']}")
+
+        if not args.quiet and report["anomalies"]:
+            print(f"\n─── Anomalies ───")
+            for a in report["anomalies"]:
+                icon = "🔴" if a["severity"] == "critical" else "🟡"
+                print(f"  {icon} {a['time']:>6.1f}s  [{a['type']}] {a['detail']}")
+
+    if "timings" in report:
+        t = report["timings"]
+        print(f"\n─── Timings ───")
+        for name, stage in t["stages"].items():
+            print(f"  {name:<14} {stage['wall_s']:>8.3f}s  {stage['peak_mb']:>7.1f} MB")
+        print(f"  {'total':<14} {t['total_s']:>8.3f}s  {t['peak_rss_mb']:>7.1f} MB RSS")
+
+    if not args.quiet and not args.quick and not region:
+        print(f"\n─── Window Stats ───")
+        for w in report["windows"]:
+            bar = "█" * max(0, int((w["rms_db"] + 60) / 2))
+            silent_mark = " ⚠️ SILENT" if w["silent"] else ""
+            print(f"  {w['time_start']:>6.1f}s  RMS:{w['rms_db']:>6.1f}dB  "
+                  f"C:{w['centroid_hz']:>6.0f}Hz  F:{w['spectral_flux']:.3f}  "
+                  f"{bar}{silent_mark}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+audio_session.py — Decode-once audio buffer shared by the QA checks.
+
+An AudioSession holds one decoded copy of a render and lazily derives the
+arrays the checks need (mono downmix, peak envelope, power spectrum,
+BS.1770 loudness). Each derived array is computed on first use and then
+reused, so running every check against the same session costs a single
+decode.
+
+Usage:
+    from strudel_qa.audio_session import AudioSession
+
+    session = AudioSession.from_file("render.wav")
+    session.mono            # mean downmix, shape (n,)
+    session.peak_envelope   # max |x| across channels, shape (n,)
+    session.power_spectrum  # Welch (freqs, power) of the mono downmix
+    session.loudness        # loudness.measure() of the full buffer
+    session.gaps(1e-5, 500, 50)  # (starts, ends, peaks) of null drops
+    session.sample_peak     # max |x|, from the gap scan's envelope pyramid
+
+StreamedSession exposes the same attributes the checks read (power_spectrum,
+loudness, gaps, sample_peak) but builds them from soundfile blocks with incremental
+accumulators, so peak memory is a few blocks regardless of track length.
+
+MappedSession does the same over a memory-mapped WAV (see wavmap.py): gaps
+are found on native int16/float32 tiles, and loudness and spectrum are
+separate passes that convert one block at a time (so the check scheduler
+can skip either or run them on separate threads). open_session() picks it for mappable WAVs and falls
+back to AudioSession for everything else.
+
+Dependencies: numpy, scipy, soundfile
+"""
+
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from . import loudness
+from .gaps import EnvelopePyramid, GapTracker, analysis_bounds
+from .spectrum import WelchAccumulator, welch_psd
+from .wavmap import MappedWav
+
+
+class _GapQueries:
+    """
+    Null-drop queries over a session's peak envelope, shared by the gate's
+    check_null_drops and `strudel-qa gaps`. Subclasses provide `envelope`,
+    `scale` and native_threshold().
+    """
+
+    scale = 1.0
+
+    def native_threshold(self, threshold: float):
+        return threshold
+
+    @cached_property
+    def envelope_pyramid(self) -> EnvelopePyramid:
+        return EnvelopePyramid(self.envelope, self.sr)
+
+    @property
+    def sample_peak(self) -> float:
+        """Largest sample magnitude as a linear amplitude, from the pyramid."""
+        return float(self.envelope_pyramid.peak) / self.scale
+
+    def gaps(self, threshold: float, skip_ms: float, min_gap_ms: float,
+             window_ms: float = 100.0) -> tuple:
+        """
+        (starts, ends, peaks) of silent runs in the peak envelope, skipping
+        `skip_ms` at both ends. `window_ms` only sets the pyramid level the
+        scan starts from; results are sample-exact either way.
+        """
+        start_idx, end_idx = analysis_bounds(self.num_samples, self.sr, skip_ms)
+        min_len = max(1, int((min_gap_ms / 1000.0) * self.sr))
+        window_samples = max(1, int((window_ms / 1000.0) * self.sr))
+        starts, ends, peaks = self.envelope_pyramid.find_gaps(
+            self.native_threshold(threshold), min_len, start_idx, end_idx, window_samples
+        )
+        return starts, ends, np.asarray(peaks, dtype=np.float64) / self.scale
+
+
+class AudioSession(_GapQueries):
+    """A decoded audio buffer plus cached derived arrays."""
+
+    def __init__(self, data: np.ndarray, sr: int, path: str = None):
+        self.data = data
+        self.sr = int(sr)
+        self.path = path
+
+    @classmethod
+    def from_file(cls, audio_path: str) -> "AudioSession":
+        """Decode an audio file once as float64."""
+        path = Path(audio_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        data, sr = sf.read(str(path), dtype="float64")
+        return cls(data, sr, str(path))
+
+    @property
+    def channels(self) -> int:
+        return self.data.shape[1] if self.data.ndim == 2 else 1
+
+    @property
+    def num_samples(self) -> int:
+        return self.data.shape[0]
+
+    @property
+    def duration_s(self) -> float:
+        return self.num_samples / self.sr
+
+    @cached_property
+    def frames(self) -> np.ndarray:
+        """Audio as a (samples, channels) array, even for mono input."""
+        if self.data.ndim == 2:
+            return self.data
+        return self.data[:, np.newaxis]
+
+    @cached_property
+    def mono(self) -> np.ndarray:
+        """Mean downmix across channels."""
+        if self.data.ndim == 2:
+            return np.mean(self.data, axis=1)
+        return self.data
+
+    @cached_property
+    def peak_envelope(self) -> np.ndarray:
+        """Per-sample absolute peak across channels (used for silence tests)."""
+        if self.data.ndim == 2:
+            return np.max(np.abs(self.data), axis=1)
+        return np.abs(self.data)
+
+    @property
+    def envelope(self) -> np.ndarray:
+        return self.peak_envelope
+
+    @cached_property
+    def power_spectrum(self) -> tuple:
+        """(freqs, power) of the mono downmix, Welch-averaged."""
+        return welch_psd(self.mono, self.sr)
+
+    @cached_property
+    def loudness(self) -> dict:
+        """Integrated/short-term/momentary LUFS, LRA and true peak."""
+        return loudness.measure(self.frames, self.sr)
+
+
+class StreamedSession:
+    """
+    Single streaming pass over a file feeding every incremental metric.
+
+    Gap parameters must be fixed up front because the tracker runs during
+    the pass; gaps() only answers for those parameters.
+    """
+
+    def __init__(self, sr: int, channels: int, path: str = None,
+                 gap_threshold: float = 1e-5, skip_ms: float = 500.0,
+                 min_gap_ms: float = 50.0):
+        self.sr = int(sr)
+        self.channels = channels
+        self.path = path
+        self.num_samples = 0
+        self.gap_params = (gap_threshold, skip_ms, min_gap_ms)
+        self._meter = loudness.LoudnessMeter(self.sr, channels)
+        self._welch = WelchAccumulator(self.sr)
+        self._gaps = GapTracker(self.sr, gap_threshold, skip_ms, min_gap_ms)
+        self._finished = None
+
+    @classmethod
+    def from_file(cls, audio_path: str, block_frames: int = 1 << 16, **gap_params) -> "StreamedSession":
+        """Stream an audio file through every accumulator in fixed-size blocks."""
+        path = Path(audio_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        info = sf.info(str(path))
+        session = cls(info.samplerate, info.channels, str(path), **gap_params)
+        for block in sf.blocks(str(path), blocksize=block_frames, dtype="float64", always_2d=True):
+            session.feed(block)
+        session.finish()
+        return session
+
+    @property
+    def duration_s(self) -> float:
+        return self.num_samples / self.sr
+
+    @property
+    def sample_peak(self) -> float:
+        return self._meter.sample_peak
+
+    @property
+    def running_true_peak(self) -> float:
+        """True peak of the blocks fed so far; the final one can only be higher."""
+        return self._meter.true_peak.peak
+
+    def feed(self, frames: np.ndarray):
+        """Add one (samples, channels) block."""
+        self.num_samples += frames.shape[0]
+        self._meter.feed(frames)
+        self._welch.feed(np.mean(frames, axis=1) if frames.shape[1] > 1 else frames[:, 0])
+        self._gaps.feed(np.max(np.abs(frames), axis=1))
+
+    def finish(self):
+        self._finished = {
+            "loudness": self._meter.result(),
+            "power_spectrum": self._welch.finish(),
+            "gaps": self._gaps.finish(),
+        }
+
+    @property
+    def loudness(self) -> dict:
+        return self._finished["loudness"]
+
+    @property
+    def power_spectrum(self) -> tuple:
+        return self._finished["power_spectrum"]
+
+    def gaps(self, threshold: float, skip_ms: float, min_gap_ms: float,
+             window_ms: float = 100.0) -> tuple:
+        if (threshold, skip_ms, min_gap_ms) != self.gap_params:
+            raise ValueError("StreamedSession was run with different gap parameters")
+        return self._finished["gaps"]
+
+
+class MappedSession(_GapQueries):
+    """Checks over a memory-mapped WAV, without a full-length decoded copy."""
+
+    def __init__(self, wav: MappedWav):
+        self.wav = wav
+        self.sr = wav.sr
+        self.path = wav.path
+
+    @property
+    def channels(self) -> int:
+        return self.wav.channels
+
+    @property
+    def num_samples(self) -> int:
+        return self.wav.num_samples
+
+    @property
+    def duration_s(self) -> float:
+        return self.wav.duration_s
+
+    @property
+    def frames(self) -> np.ndarray:
+        """The mapped (samples, channels) data in its native dtype."""
+        return self.wav.frames
+
+    @property
+    def envelope(self):
+        """Peak envelope in the file's native scale, computed per tile."""
+        return self.wav.envelope
+
+    @property
+    def scale(self) -> float:
+        return self.wav.scale
+
+    def native_threshold(self, threshold: float):
+        return self.wav.native_threshold(threshold)
+
+    # Loudness and spectrum are separate passes over the map (each converts
+    # its own float blocks), so either can be skipped or run on its own thread
+
+    @cached_property
+    def loudness(self) -> dict:
+        meter = loudness.LoudnessMeter(self.sr, self.channels)
+        for block in self.wav.float_blocks():
+            meter.feed(block)
+        return meter.result()
+
+    @cached_property
+    def power_spectrum(self) -> tuple:
+        welch = WelchAccumulator(self.sr)
+        for block in self.wav.float_blocks():
+            welch.feed(np.mean(block, axis=1) if block.shape[1] > 1 else block[:, 0])
+        return welch.finish()
+
+
+def float_frames(session, lo: int, hi: int) -> np.ndarray:
+    """
+    Samples [lo, hi) of an AudioSession or MappedSession as float64
+    (samples, channels), scaled as sf.read would.
+    """
+    block = np.asarray(session.frames[lo:hi], dtype=np.float64)
+    if block.ndim == 1:
+        block = block[:, np.newaxis]
+    if session.scale != 1.0:
+        block *= 1.0 / session.scale
+    return block
+
+
+def open_session(audio_path: str):
+    """Memory-map WAV PCM when possible, otherwise decode into an AudioSession."""
+    wav = MappedWav.from_file(audio_path)
+    if wav is not None:
+        return MappedSession(wav)
+    return AudioSession.from_file(audio_path)
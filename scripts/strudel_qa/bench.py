@@ -0,0 +1,324 @@
+"""
+bench.py — Benchmarks for the QA tools on synthetic renders.
+
+Generates renders with the features the checks look for (silence gaps,
+energy cliffs, clipped peaks) in several shapes (stereo 16-bit, mono float,
+prime sample counts) and lengths, then times:
+  - each check on its own (decode, gaps, spectrum, loudness, cliffs, window
+    stats, null-drop scan), in a fresh process per measurement
+  - each command end to end (strudel-qa gate, gaps, analyze), plus the
+    interpreter start-up and import cost alone (cli.startup, `gate --help`)
+
+Every measurement records wall time and the peak RSS of its process
+(os.wait4), and the best of --repeat runs is kept. Results are written as
+JSON; --compare checks them against an earlier results file and exits 1 if
+anything got slower (or bigger) than --threshold allows.
+
+Usage:
+    strudel-qa bench [--durations 10,60] [--repeat 3] [--out results.json]
+    strudel-qa bench --durations 10,60,600,3600 --out full.json
+    strudel-qa bench --compare main.json --threshold 0.15
+
+Options:
+    --durations  Render lengths in seconds (default: 10,60)
+    --repeat     Runs per measurement; the fastest is kept (default: 3)
+    --only       Comma-separated benchmark names to run (default: all)
+    --workdir    Where synthetic renders are cached
+                 (default: $STRUDEL_TMP/qa-bench, see cache.py)
+    --out        Results file (default: print to stdout)
+    --compare    Earlier results file to compare against
+    --threshold  Allowed relative slowdown before flagging (default: 0.15);
+                 changes under 5 ms or 2 MB are never flagged
+
+Runs offline. The harness itself needs only numpy and soundfile; the
+benchmarked tools need their usual dependencies, and the analyze command
+is skipped when ffmpeg is not in PATH. The QA cache and server are
+disabled for CLI runs so every run does the full work.
+
+Exit codes:
+    0  Done (no regressions, if comparing)
+    1  Regressions found
+    3  Error
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from .cache import default_root
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+ENTRY = SCRIPTS_DIR / "strudel-qa"
+SR = 44100
+WRITE_BLOCK_S = 30
+
+# name -> (channels, subtype, prime length)
+SHAPES = {
+    "stereo": (2, "PCM_16", False),
+    "mono-float": (1, "FLOAT", False),
+    "prime": (2, "PCM_16", True),
+}
+
+# Changes smaller than this are timer/allocator noise, never regressions
+NOISE_FLOOR = {"seconds": 0.005, "peak_rss_mb": 2.0}
+
+CHECKS = (
+    "decode", "qa.null_drops", "qa.spectral_floor", "qa.lufs",
+    "analyze.cliffs", "analyze.windows", "null_drop.detect",
+)
+CLIS = {
+    "cli.startup": ("gate", ["--help"]),
+    "cli.qa-gate": ("gate", ["--json", "--no-cache"]),
+    "cli.null-drop-detect": ("gaps", ["--json"]),
+    "cli.analyze-render": ("analyze", ["--json", "--no-cache", "--cliff-windows", "20,100"]),
+}
+
+
+# ── Synthetic renders ─────────────────────────────────────────────────
+
+def next_prime(n: int) -> int:
+    def is_prime(k):
+        if k < 2 or k % 2 == 0:
+            return k == 2
+        return all(k % d for d in range(3, int(k ** 0.5) + 1, 2))
+    while not is_prime(n):
+        n += 1
+    return n
+
+
+def synth_block(start: int, count: int, channels: int, rng) -> np.ndarray:
+    """Chords plus noise, with a 200 ms gap, a hard cliff and a clipped hit every 8 s."""
+    t = (start + np.arange(count)) / SR
+    tone = sum(0.12 * np.sin(2 * np.pi * f * t) for f in (110.0, 220.0, 277.2, 329.6))
+    signal = tone + 0.02 * rng.standard_normal(count)
+    phase = t % 8.0
+    signal[(phase >= 2.0) & (phase < 2.2)] = 0.0        # null drop
+    signal[(phase >= 5.0) & (phase < 5.5)] *= 1e-4      # energy cliff
+    hit = (phase >= 7.0) & (phase < 7.01)
+    signal[hit] = np.sign(signal[hit]) * 1.2            # clipped peak
+    frames = np.repeat(signal[:, None], channels, axis=1)
+    if channels > 1:
+        frames[:, 1:] *= 0.9
+    return np.clip(frames, -1.0, 1.0)
+
+
+def make_render(workdir: Path, shape: str, duration_s: float) -> Path:
+    """Write (or reuse) one synthetic render, a block at a time."""
+    channels, subtype, prime = SHAPES[shape]
+    total = int(duration_s * SR)
+    if prime:
+        total = next_prime(total)
+    path = workdir / f"{shape}-{duration_s:g}s.wav"
+    if path.exists():
+        return path
+    workdir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(0)
+    tmp = path.with_suffix(".tmp.wav")
+    with sf.SoundFile(str(tmp), "w", SR, channels, subtype) as f:
+        for start in range(0, total, WRITE_BLOCK_S * SR):
+            f.write(synth_block(start, min(WRITE_BLOCK_S * SR, total - start), channels, rng))
+    os.replace(tmp, path)
+    return path
+
+
+# ── Measurements ──────────────────────────────────────────────────────
+
+def run_check(name: str, path: str) -> float:
+    """Time one check in this process (setup excluded); returns seconds."""
+    if name == "decode":
+        start = time.perf_counter()
+        sf.read(path, dtype="float64")
+        return time.perf_counter() - start
+
+    if name.startswith("qa."):
+        from . import gate
+        from .audio_session import open_session
+        session = open_session(path)
+        check = {
+            "qa.null_drops": gate.check_null_drops,
+            "qa.spectral_floor": gate.check_spectral_floor,
+            "qa.lufs": gate.check_lufs,
+        }[name]
+        start = time.perf_counter()
+        check(session)
+        return time.perf_counter() - start
+
+    if name.startswith("analyze."):
+        from . import features, loudness
+        frames, sr = sf.read(path, dtype="float32", always_2d=True)
+        mono = frames.mean(axis=1)
+        start = time.perf_counter()
+        if name == "analyze.cliffs":
+            features.detect_cliffs_multi(mono, sr, 20, (20, 100))
+        else:
+            tracker = features.WindowStatsTracker(sr, 3 * sr, 3 * sr, -50)
+            tracker.feed(mono, loudness.LoudnessMeter(sr, frames.shape[1]).feed(frames))
+            tracker.finish()
+        return time.perf_counter() - start
+
+    if name == "null_drop.detect":
+        from . import audio_session  # Imported outside the timed region
+        from .null_drops import detect_null_drops
+        start = time.perf_counter()
+        detect_null_drops(path)
+        return time.perf_counter() - start
+
+    raise ValueError(f"unknown check: {name}")
+
+
+def measure_process(cmd: list, env: dict = None) -> tuple:
+    """Run a command; returns (wall seconds, peak RSS MB, stdout, exit status)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+    with proc.stdout:
+        stdout = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss_mb = usage.ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    return elapsed, rss_mb, stdout, proc.returncode
+
+
+def bench(name: str, path: Path, repeat: int) -> dict:
+    env = dict(os.environ, STRUDEL_QA_SERVER="0", STRUDEL_QA_CACHE="0")
+    if name in CLIS:
+        command, args = CLIS[name]
+        cmd = [sys.executable, str(ENTRY), command, str(path)] + args
+    else:
+        cmd = [sys.executable, str(ENTRY), "bench", "--worker", name, str(path)]
+
+    runs = []
+    for _ in range(repeat):
+        elapsed, rss_mb, stdout, code = measure_process(cmd, env)
+        if name not in CLIS:
+            if code != 0:
+                raise RuntimeError(f"{name} failed on {path.name}")
+            elapsed = json.loads(stdout)["seconds"]
+        elif code == 3:
+            raise RuntimeError(f"{name} errored on {path.name}")
+        runs.append((elapsed, rss_mb))
+
+    return {
+        "seconds": round(min(r[0] for r in runs), 4),
+        "seconds_all": [round(r[0], 4) for r in runs],
+        "peak_rss_mb": round(max(r[1] for r in runs), 1),
+    }
+
+
+# ── Results ───────────────────────────────────────────────────────────
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Benchmarks that got slower or grew by more than `threshold` (relative)."""
+    before = {(r["render"], r["bench"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results["results"]:
+        old = before.get((r["render"], r["bench"]))
+        if old is None or "seconds" not in old or "seconds" not in r:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if (r[metric] > old[metric] * (1.0 + threshold)
+                    and r[metric] - old[metric] > NOISE_FLOOR[metric]):
+                regressions.append({
+                    "render": r["render"], "bench": r["bench"], "metric": metric,
+                    "before": old[metric], "after": r[metric],
+                    "change_pct": round(100.0 * (r[metric] / old[metric] - 1.0), 1),
+                })
+    return regressions
+
+
+def main(argv: list = None, prog: str = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Benchmark the QA tools on synthetic renders.")
+    parser.add_argument("--durations", default="10,60")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default=None)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--compare", default=None)
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--worker", nargs=2, metavar=("CHECK", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps({"seconds": run_check(*args.worker)}))
+        return
+
+    names = list(CHECKS) + list(CLIS)
+    if args.only:
+        wanted = {n.strip() for n in args.only.split(",")}
+        unknown = wanted - set(names)
+        if unknown:
+            print(f"Error: unknown benchmark(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+            sys.exit(3)
+        names = [n for n in names if n in wanted]
+
+    workdir = Path(args.workdir) if args.workdir else default_root().parent / "qa-bench"
+    have_ffmpeg = shutil.which("ffmpeg") is not None
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": [],
+    }
+
+    for duration in (float(d) for d in args.durations.split(",") if d.strip()):
+        for shape in SHAPES:
+            path = make_render(workdir, shape, duration)
+            for name in names:
+                entry = {"render": path.name, "bench": name, "duration_s": duration}
+                if name == "cli.analyze-render" and not have_ffmpeg:
+                    entry["skipped"] = "ffmpeg not in PATH"
+                else:
+                    entry.update(bench(name, path, args.repeat))
+                results["results"].append(entry)
+                print(f"{path.name:<24} {name:<22} "
+                      + (f"{entry['seconds']:>8.3f}s {entry['peak_rss_mb']:>8.1f} MB"
+                         if "seconds" in entry else entry["skipped"]),
+                      file=sys.stderr)
+
+    exit_code = 0
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        results["baseline"] = {"file": args.compare, "commit": baseline.get("meta", {}).get("commit"),
+                               "threshold": args.threshold}
+        results["regressions"] = compare(results, baseline, args.threshold)
+        for r in results["regressions"]:
+            print(f"REGRESSION {r['render']} {r['bench']} {r['metric']}: "
+                  f"{r['before']} -> {r['after']} ({r['change_pct']:+.1f}%)", file=sys.stderr)
+        exit_code = 1 if results["regressions"] else 0
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+cache.py — Content-addressed cache of QA reports.
+
+dispatch.sh re-renders compositions that have not changed, and the QA tools
+then get byte-identical WAVs and produce identical reports. ReportCache keys
+each report on:
+  - a BLAKE2b hash of the audio file's bytes (so renames and copies still
+    hit, and any change to the audio misses),
+  - the tool name and its analysis parameters,
+  - a hash of the QA scripts' source, so editing any analysis code
+    invalidates old entries without a manual version bump.
+
+A hit returns the stored JSON report without decoding the audio.
+
+Entries live under $STRUDEL_TMP/qa-cache (the same root dispatch.sh uses for
+renders), one JSON file per key. Writes go to a temp file that is renamed
+into place, so concurrent writers and readers never see partial entries. A
+hit touches the entry's mtime, and eviction after each write drops entries
+older than the age limit and then least-recently-used ones until the cache
+fits the size limit.
+
+Environment:
+    STRUDEL_TMP                    cache root parent (see dispatch.sh)
+    STRUDEL_QA_CACHE               set to 0 to disable the cache
+    STRUDEL_QA_CACHE_MAX_MB        size limit (default: 64)
+    STRUDEL_QA_CACHE_MAX_AGE_DAYS  age limit (default: 30)
+
+Usage:
+    from strudel_qa.cache import ReportCache
+
+    cache = ReportCache.default()
+    report = cache.get_or_compute("qa-gate", audio_path, params,
+                                  lambda: run_checks(audio_path))
+
+Dependencies: none (stdlib only)
+"""
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+DEFAULT_MAX_MB = 64
+DEFAULT_MAX_AGE_DAYS = 30
+HASH_CHUNK = 1 << 20
+
+
+def render_dir() -> Path:
+    """$STRUDEL_TMP, with dispatch.sh's fallback when it is unset."""
+    tmp = os.environ.get("STRUDEL_TMP")
+    if not tmp:
+        workspace = os.environ.get(
+            "OPENCLAW_WORKSPACE", os.path.join(os.path.expanduser("~"), ".openclaw", "workspace")
+        )
+        tmp = os.path.join(workspace, "strudel-renders")
+    return Path(tmp)
+
+
+def default_root() -> Path:
+    """$STRUDEL_TMP/qa-cache, with dispatch.sh's fallback for STRUDEL_TMP."""
+    return render_dir() / "qa-cache"
+
+
+def file_digest(path: str) -> str:
+    """BLAKE2b hex digest of a file's bytes."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def tool_version() -> str:
+    """Hash of every QA script's source; changes whenever analysis code does."""
+    digest = hashlib.blake2b(digest_size=12)
+    for source in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """A directory of JSON reports keyed by audio content and parameters."""
+
+    def __init__(self, root, max_bytes: int = DEFAULT_MAX_MB << 20,
+                 max_age_s: float = DEFAULT_MAX_AGE_DAYS * 86400.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+
+    @classmethod
+    def default(cls):
+        """Cache configured from the environment, or None when disabled."""
+        if os.environ.get("STRUDEL_QA_CACHE", "1") == "0":
+            return None
+        max_mb = float(os.environ.get("STRUDEL_QA_CACHE_MAX_MB", DEFAULT_MAX_MB))
+        max_days = float(os.environ.get("STRUDEL_QA_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS))
+        return cls(default_root(), int(max_mb * (1 << 20)), max_days * 86400.0)
+
+    def key(self, tool: str, audio_path: str, params: dict) -> str:
+        material = json.dumps(
+            {"tool": tool, "version": tool_version(), "audio": file_digest(audio_path),
+             "params": params},
+            sort_keys=True,
+        )
+        return hashlib.blake2b(material.encode(), digest_size=20).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        """Stored report for `key`, or None. A hit marks the entry as recently used."""
+        entry = self._entry(key)
+        try:
+            report = json.loads(entry.read_text())
+            os.utime(entry)
+        except (OSError, ValueError):
+            return None
+        return report
+
+    def put(self, key: str, report: dict):
+        """Store a report atomically, then evict down to the limits."""
+        entry = self._entry(key)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=entry.parent, prefix=".tmp-", suffix=".json")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(report, f)
+                os.replace(tmp, entry)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            # A cache that can't be written is just a miss next time
+            return
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over the size limit."""
+        now = time.time()
+        entries = []
+        for path in self.root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue  # Evicted by another process
+            entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age_s and total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get_or_compute(self, tool: str, audio_path: str, params: dict, compute):
+        """Cached report for this audio and parameters, computing and storing it on a miss."""
+        key = self.key(tool, audio_path, params)
+        report = self.get(key)
+        if report is None:
+            report = compute()
+            self.put(key, report)
+        return report
@@ -0,0 +1,51 @@
+"""
+cli.py — The `strudel-qa` command: one entry point for every QA tool.
+
+    strudel-qa <command> [args...]
+
+Each command is a module with main(argv, prog), imported only when its
+command runs, so start-up costs the interpreter and the standard library
+until a command actually decodes audio.
+"""
+
+import importlib
+import sys
+
+# command -> (module, one-line description)
+COMMANDS = {
+    "gate": ("gate", "Post-render QA gate (null drops, spectral floor, LUFS, true peak)"),
+    "analyze": ("analyze", "Per-window spectral diagnostic and anomaly report"),
+    "gaps": ("null_drops", "Detect silence gaps (null drops)"),
+    "pipeline": ("pipeline", "Render, QA and MP3-encode compositions with overlapping stages"),
+    "history": ("history", "QA metric drift and regressions across renders"),
+    "tap": ("tap", "Real-time QA on a raw PCM stream from stdin"),
+    "bench": ("bench", "Benchmark the QA tools on synthetic renders"),
+    "serve": ("server", "Run the resident QA server on a Unix socket"),
+}
+
+
+def usage(prog: str) -> str:
+    lines = [f"usage: {prog} <command> [args...]", "", "commands:"]
+    for name, (_, description) in COMMANDS.items():
+        lines.append(f"  {name:<9} {description}")
+    lines.append("")
+    lines.append(f"Run '{prog} <command> --help' for a command's options.")
+    return "\n".join(lines)
+
+
+def run(command: str, argv: list, prog: str = None):
+    """Run one command's main() with `argv`; `prog` names it in usage and errors."""
+    module = importlib.import_module(f".{COMMANDS[command][0]}", __package__)
+    module.main(argv, prog=prog or f"strudel-qa {command}")
+
+
+def main(argv: list = None, prog: str = "strudel-qa"):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage(prog))
+        sys.exit(0 if argv else 2)
+    command, rest = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"{prog}: unknown command '{command}'\n\n{usage(prog)}", file=sys.stderr)
+        sys.exit(2)
+    run(command, rest, f"{prog} {command}")
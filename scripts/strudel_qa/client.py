@@ -0,0 +1,83 @@
+"""
+client.py — Thin client for the resident QA server (server.py).
+
+Each QA command calls delegate() before importing numpy/scipy. If a server is
+listening, the whole invocation (argv, cwd) is sent over its Unix socket and
+the server's stdout, stderr and exit code are replayed here, so the command
+behaves exactly as if it had run locally. If no server is reachable,
+delegate() returns and the command runs in-process as usual.
+
+The socket is $STRUDEL_QA_SOCKET, or qa.sock next to the QA cache under
+$STRUDEL_TMP. Set STRUDEL_QA_SERVER=0 to never delegate (the server sets
+it for itself, so its children run commands locally).
+
+Protocol: one JSON object per line, one request per connection.
+    {"op": "cli", "tool": "gate", "argv": [...], "prog": "...", "cwd": "...",
+     "env": {"STRUDEL_TMP": "...", ...}}
+        -> {"ok": true, "stdout": "...", "stderr": "...", "exit_code": 0}
+"env" carries the caller's STRUDEL_* variables (cache, history and render
+locations); the server's child runs the command with those instead of its own.
+    {"op": "qa_gate" | "analyze" | "null_drops", "args": [...], "kwargs": {...}}
+        -> {"ok": true, "result": {...}}
+    {"op": "ping"} -> {"ok": true, "pid": ...}
+Errors come back as {"ok": false, "error": "...", "type": "ExceptionName"}.
+
+Usage:
+    from strudel_qa.client import request
+    report = request({"op": "qa_gate", "args": ["render.wav"]})["result"]
+
+Dependencies: none (stdlib only)
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+from .cache import default_root
+
+
+def socket_path() -> str:
+    return os.environ.get("STRUDEL_QA_SOCKET") or str(default_root().parent / "qa.sock")
+
+
+def request(message: dict, path: str = None, timeout: float = None) -> dict:
+    """Send one request and return the decoded reply. Raises OSError if no server."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path or socket_path())
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile("rb") as reply:
+            line = reply.readline()
+    if not line:
+        raise ConnectionError("QA server closed the connection without replying")
+    return json.loads(line)
+
+
+def client_env() -> dict:
+    """The STRUDEL_* variables a delegated command must see (except STRUDEL_QA_SERVER)."""
+    return {key: value for key, value in os.environ.items()
+            if key.startswith("STRUDEL_") and key != "STRUDEL_QA_SERVER"}
+
+
+def delegate(tool: str, argv: list = None, prog: str = None):
+    """Run this command on the QA server and exit, or return if none is up."""
+    if os.environ.get("STRUDEL_QA_SERVER", "1") == "0":
+        return
+    path = socket_path()
+    if not Path(path).exists():
+        return
+    try:
+        reply = request({"op": "cli", "tool": tool, "prog": prog,
+                         "argv": sys.argv[1:] if argv is None else list(argv),
+                         "cwd": os.getcwd(), "env": client_env()}, path)
+    except (OSError, ValueError):
+        return  # Stale socket or server gone: run locally
+    if not reply.get("ok"):
+        return
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    sys.stdout.flush()
+    sys.exit(reply["exit_code"])
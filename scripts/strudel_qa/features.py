@@ -0,0 +1,382 @@
+"""
+features.py — Decoding and per-window feature extraction for analyze.py.
+
+The numpy half of `strudel-qa analyze`: ffmpeg decoding (whole-file or
+block-streamed), batched STFT window stats and the multi-window cliff
+detector. Everything here is incremental (the trackers are fed blocks and
+finished once), so batch and --stream runs share one code path.
+
+Usage:
+    from strudel_qa.features import WindowStatsTracker, detect_cliffs_multi
+
+Dependencies: numpy, ffmpeg (in PATH)
+"""
+
+import functools
+import io
+import math
+import struct
+import subprocess
+
+import numpy as np
+
+from . import loudness
+
+
+def _read_wav_header(stream):
+    """Consume a piped ffmpeg WAV header up to the data chunk; returns channels."""
+    head = stream.read(12)
+    if head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        raise RuntimeError("ffmpeg did not produce a WAV stream")
+    channels = 1
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            raise RuntimeError("ffmpeg WAV stream has no data chunk")
+        chunk_id, size = struct.unpack('<4sI', chunk)
+        if chunk_id == b'data':
+            # Piped output can't seek back to patch the size; read to EOF
+            return channels
+        body = stream.read(size + (size & 1))
+        if chunk_id == b'fmt ':
+            channels = struct.unpack('<H', body[2:4])[0]
+
+
+def _ffmpeg_wav_cmd(path, sr, start_s=None, duration_s=None):
+    # -ss/-t before -i seek the input, so skipped audio is never decoded
+    span = []
+    if start_s is not None:
+        span += ['-ss', f'{start_s:.6f}']
+    if duration_s is not None:
+        span += ['-t', f'{duration_s:.6f}']
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', *span, '-i', path,
+            '-ar', str(sr), '-c:a', 'pcm_f32le', '-f', 'wav', '-']
+
+
+def read_audio_via_ffmpeg(path, sr=44100, start_s=None, duration_s=None):
+    """
+    Convert any audio file to f32 PCM frames (samples, channels) via ffmpeg,
+    optionally only `duration_s` seconds from `start_s`.
+    """
+    result = subprocess.run(_ffmpeg_wav_cmd(path, sr, start_s, duration_s),
+                            capture_output=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode()[:200]}")
+    stream = io.BytesIO(result.stdout)
+    channels = _read_wav_header(stream)
+    pcm = stream.read()
+    usable = len(pcm) - len(pcm) % (4 * channels)
+    frames = np.frombuffer(pcm[:usable], dtype=np.float32).reshape(-1, channels)
+    return frames, sr
+
+
+def iter_audio_via_ffmpeg(path, sr=44100, block_frames=1 << 16):
+    """
+    Yield f32 PCM blocks of up to `block_frames` (samples, channels) from
+    ffmpeg's stdout as they are decoded. Memory is one block, not the track.
+    """
+    proc = subprocess.Popen(_ffmpeg_wav_cmd(path, sr), stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    try:
+        channels = _read_wav_header(proc.stdout)
+        frame_bytes = 4 * channels
+        leftover = b''
+        while True:
+            raw = proc.stdout.read(block_frames * frame_bytes)
+            if not raw:
+                break
+            raw = leftover + raw
+            usable = len(raw) - len(raw) % frame_bytes
+            leftover = raw[usable:]
+            if usable:
+                yield np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, channels)
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read()
+        proc.stderr.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode()[:200]}")
+
+
+def window_lufs(prefix, start, end):
+    """
+    Ungated K-weighted loudness of samples [start, end) in LUFS.
+    `prefix` is loudness.energy_prefix() of the K-weighted power.
+    """
+    if end <= start:
+        return -100.0
+    power = (prefix[end] - prefix[start]) / (end - start)
+    return max(-100.0, float(loudness.power_to_lufs(power)))
+
+
+@functools.lru_cache(maxsize=8)
+def hann_window(length):
+    """Cached Hann window (reused by every batch of the same length)."""
+    return np.hanning(length)
+
+
+def spectral_rows(rows, sr, prev_norm=None, rolloff_pct=0.85, batch_samples=1 << 22):
+    """
+    Spectral features of a (windows, window_samples) stack of rows.
+
+    Rows are transformed a batch at a time with one rfft each, so memory is
+    bounded by `batch_samples`. `prev_norm` is the last normalized spectrum
+    of the previous call, for flux continuity across calls.
+
+    Returns (features, last_norm); features holds arrays
+    rms_db, centroid_hz, flux, rolloff_hz, flatness.
+    """
+    count, window_samples = rows.shape
+    features = {
+        "rms_db": np.full(count, -100.0), "centroid_hz": np.zeros(count),
+        "flux": np.zeros(count), "rolloff_hz": np.zeros(count),
+        "flatness": np.zeros(count),
+    }
+    window = hann_window(window_samples)
+    freqs = np.fft.rfftfreq(window_samples, 1.0 / sr)
+    batch = max(1, batch_samples // window_samples)
+
+    for lo in range(0, count, batch):
+        hi = min(lo + batch, count)
+        chunk = np.asarray(rows[lo:hi], dtype=np.float64)
+
+        rms = np.sqrt(np.einsum('ij,ij->i', chunk, chunk) / window_samples)
+        with np.errstate(divide="ignore"):
+            features["rms_db"][lo:hi] = np.where(rms < 1e-10, -100.0, 20 * np.log10(np.maximum(rms, 1e-10)))
+
+        spectrum = np.abs(np.fft.rfft(chunk * window, axis=1))
+        total = spectrum.sum(axis=1)
+        audible = total >= 1e-10
+        if window_samples >= 512:
+            centroid = (spectrum @ freqs) / np.maximum(total, 1e-10)
+            features["centroid_hz"][lo:hi] = np.where(audible, centroid, 0.0)
+
+        # Rolloff: lowest bin holding rolloff_pct of the magnitude sum
+        cumulative = np.cumsum(spectrum, axis=1)
+        rolloff_bin = np.argmax(cumulative >= rolloff_pct * total[:, None], axis=1)
+        features["rolloff_hz"][lo:hi] = np.where(audible, freqs[rolloff_bin], 0.0)
+
+        # Flatness: geometric over arithmetic mean of the power spectrum
+        power = np.maximum(spectrum ** 2, 1e-20)
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        features["flatness"][lo:hi] = np.where(audible, flatness, 0.0)
+
+        # Flux between peak-normalized spectra of consecutive windows
+        norm = spectrum / (spectrum.max(axis=1, keepdims=True) + 1e-10)
+        if prev_norm is not None:
+            features["flux"][lo] = np.maximum(norm[0] - prev_norm, 0).sum()
+        features["flux"][lo + 1:hi] = np.maximum(np.diff(norm, axis=0), 0).sum(axis=1)
+        prev_norm = norm[-1]
+
+    return features, prev_norm
+
+
+class WindowStatsTracker:
+    """
+    Per-window stats over a signal fed in blocks.
+
+    Windows start every `hop_samples`; the tail is zero-padded to a full
+    window and windows with fewer than 256 real samples are dropped. Only
+    the samples of windows not yet emitted are buffered (about one window
+    plus one block), together with their K-weighted power for window LUFS.
+
+    `start` is the absolute sample index of the first sample fed (a
+    multiple of `hop_samples`) and `prev_norm` the previous window's
+    normalized spectrum, for trackers that pick up mid-track (shards.py).
+    Times are rounded to `digits` decimals.
+    """
+
+    MIN_SAMPLES = 256
+
+    def __init__(self, sr, window_samples, hop_samples, silence_threshold_db,
+                 start=0, prev_norm=None, digits=2):
+        self.sr = sr
+        self.digits = digits
+        self.window_samples = window_samples
+        self.hop_samples = hop_samples
+        self.silence_threshold_db = silence_threshold_db
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.kpower = np.zeros(0)
+        self.buffer_start = start
+        self.prev_norm = prev_norm
+        self.windows = []
+        self.total_silence_sec = 0.0
+
+    def feed(self, mono, kpower):
+        self.buffer = np.concatenate([self.buffer, mono])
+        self.kpower = np.concatenate([self.kpower, kpower])
+        span = max(self.window_samples, self.MIN_SAMPLES)
+        if len(self.buffer) < span:
+            return
+        ready = (len(self.buffer) - span) // self.hop_samples + 1
+        rows = np.lib.stride_tricks.sliding_window_view(
+            self.buffer, self.window_samples)[::self.hop_samples][:ready]
+        starts = np.arange(ready) * self.hop_samples
+        self._emit(rows, starts, starts + self.window_samples)
+        drop = ready * self.hop_samples
+        self.buffer = self.buffer[drop:].copy()
+        self.kpower = self.kpower[drop:].copy()
+        self.buffer_start += drop
+
+    def finish(self):
+        n = len(self.buffer)
+        starts = np.arange(0, n, self.hop_samples)
+        starts = starts[(n - starts) >= self.MIN_SAMPLES]
+        if len(starts):
+            padded = np.zeros(int(starts[-1]) + self.window_samples, dtype=self.buffer.dtype)
+            padded[:n] = self.buffer
+            rows = np.lib.stride_tricks.sliding_window_view(
+                padded, self.window_samples)[::self.hop_samples][:len(starts)]
+            self._emit(rows, starts, np.minimum(starts + self.window_samples, n))
+        self.buffer = self.buffer[:0]
+        self.kpower = self.kpower[:0]
+        return self.windows
+
+    def _emit(self, rows, starts, ends):
+        features, self.prev_norm = spectral_rows(rows, self.sr, self.prev_norm)
+        prefix = loudness.energy_prefix(self.kpower)
+        sr = self.sr
+        for i in range(len(starts)):
+            start, end = int(starts[i]), int(ends[i])
+            rms = float(features["rms_db"][i])
+            is_silent = rms < self.silence_threshold_db
+            if is_silent:
+                # Each window owns its hop, so overlapping windows don't double-count
+                self.total_silence_sec += min(self.hop_samples, end - start) / sr
+
+            abs_start = self.buffer_start + start
+            self.windows.append({
+                "window": abs_start // self.hop_samples,
+                "time_start": round(abs_start / sr, self.digits),
+                "time_end": round((self.buffer_start + end) / sr, self.digits),
+                "rms_db": round(rms, 1),
+                "lufs_proxy": round(window_lufs(prefix, start, end), 1),
+                "centroid_hz": round(float(features["centroid_hz"][i]), 1),
+                "spectral_flux": round(float(features["flux"][i]), 4),
+                "rolloff_hz": round(float(features["rolloff_hz"][i]), 1),
+                "flatness": round(float(features["flatness"][i]), 4),
+                "silent": is_silent,
+            })
+
+
+def cliff_grid(sr, windows_ms):
+    """(window, hop) in samples for each cliff window, plus their common block size."""
+    sizes = []
+    for window_ms in windows_ms:
+        window_samples = int(sr * window_ms / 1000)
+        sizes.append((window_samples, max(1, window_samples // 2)))
+    block = 0
+    for window_samples, hop in sizes:
+        block = math.gcd(block, math.gcd(window_samples, hop))
+    return sizes, max(1, block)
+
+
+def block_energy(samples, block):
+    """Sum of squares of each whole `block`-sample block (one strided pass)."""
+    usable = len(samples) // block * block
+    frames = samples[:usable].reshape(-1, block)
+    return np.einsum('ij,ij->i', frames, frames).astype(np.float64)
+
+
+class CliffTracker:
+    """
+    Spectral cliff detection over a signal fed in blocks, at several window
+    sizes at once.
+
+    Samples are reduced to sums of squares over blocks sized to the common
+    divisor of every window and hop, and each window's frame energy is a
+    short sliding sum over those blocks. Only blocks not yet consumed by
+    every window are kept, so memory is about one frame per window size.
+
+    `offset` is the absolute sample index of the first sample fed, for
+    reported times; it must be a multiple of every hop so frames stay on
+    the track's grid. Times are rounded to `digits` decimals.
+    """
+
+    def __init__(self, sr, threshold_db=20, windows_ms=(100,), offset=0, digits=2):
+        self.sr = sr
+        self.offset = offset
+        self.digits = digits
+        self.threshold_db = threshold_db
+        sizes, self.block = cliff_grid(sr, windows_ms)
+        self.carry = np.zeros(0, dtype=np.float32)
+        self.energy = np.zeros(0)
+        self.energy_offset = 0
+        self.seen = 0
+        self.states = [
+            {"window_ms": window_ms, "window": window_samples, "hop": hop,
+             "next": 0, "prev_rms": None, "cliffs": []}
+            for window_ms, (window_samples, hop) in zip(windows_ms, sizes)
+        ]
+
+    def feed(self, samples):
+        self.seen += len(samples)
+        data = np.concatenate([self.carry, samples]) if len(self.carry) else samples
+        usable = len(data) // self.block * self.block
+        if usable:
+            self.energy = np.concatenate([self.energy, block_energy(data[:usable], self.block)])
+        self.carry = np.array(data[usable:])
+
+        for state in self.states:
+            self._advance(state)
+
+        consumed = min(state["next"] * state["hop"] // self.block for state in self.states)
+        drop = consumed - self.energy_offset
+        if drop > 0:
+            self.energy = self.energy[drop:]
+            self.energy_offset = consumed
+
+    def _advance(self, state):
+        window, hop = state["window"], state["hop"]
+        # Frames start at k * hop and must end strictly before the last sample seen
+        last = (self.seen - window - 1) // hop
+        first = state["next"]
+        if last < first:
+            return
+        count = last - first + 1
+        span = window // self.block
+        step = hop // self.block
+        lo = first * hop // self.block - self.energy_offset
+        frames = np.lib.stride_tricks.sliding_window_view(self.energy[lo:], span)[::step][:count]
+        rms = np.sqrt(np.maximum(frames.sum(axis=1), 0.0) / window)
+        starts = self.offset + np.arange(first, last + 1) * hop
+
+        if state["prev_rms"] is None:
+            prev_rms, curr_rms, curr_starts = rms[:-1], rms[1:], starts[1:]
+        else:
+            prev_rms = np.concatenate([[state["prev_rms"]], rms[:-1]])
+            curr_rms, curr_starts = rms, starts
+
+        with np.errstate(divide="ignore"):
+            drop = np.where(curr_rms < 1e-10, 100.0,
+                            20 * np.log10(prev_rms / np.maximum(curr_rms, 1e-10)))
+        hits = np.flatnonzero((prev_rms > 1e-8) & (drop > self.threshold_db))
+        state["cliffs"].extend(
+            {"time": round(int(curr_starts[i]) / self.sr, self.digits), "drop_db": round(float(drop[i]), 1)}
+            for i in hits
+        )
+        state["next"] = last + 1
+        state["prev_rms"] = float(rms[-1])
+
+    def finish(self):
+        """Returns {window_ms: cliffs}."""
+        return {state["window_ms"]: state["cliffs"] for state in self.states}
+
+
+def detect_cliffs_multi(samples, sr, threshold_db=20, windows_ms=(20, 100)):
+    """
+    Detect cliffs at several window sizes from one block-energy pass.
+    Returns {window_ms: cliffs}.
+    """
+    tracker = CliffTracker(sr, threshold_db, windows_ms)
+    tracker.feed(samples)
+    return tracker.finish()
+
+
+def detect_cliffs(samples, sr, threshold_db=20, window_ms=100):
+    """
+    Detect spectral cliffs: sudden energy drops > threshold_db in < window_ms.
+    Frames hop by half a window; a cliff is reported at the start of the
+    quieter frame. Returns list of {time, drop_db}.
+    """
+    return detect_cliffs_multi(samples, sr, threshold_db, (window_ms,))[window_ms]
@@ -0,0 +1,281 @@
+"""
+gaps.py — Vectorized silence-run detection shared by the null-drop checks.
+
+Both `strudel-qa gate` (check_null_drops) and `strudel-qa gaps` find gaps
+the same way, through the sessions in audio_session.py: threshold a
+per-sample peak envelope, locate contiguous silent runs, keep the ones at
+least `min_gap` samples long. This module does that
+with edge detection on the boolean mask instead of a per-sample loop, and
+computes every gap's max amplitude in one np.maximum.reduceat call.
+
+EnvelopePyramid keeps block-wise min/max of the envelope at about 1, 10 and
+100 ms. A query classifies blocks at the level matching its window size and
+only rescans samples inside runs of blocks that dip below the threshold, so
+repeated sweeps over thresholds and windows never touch the loud majority
+of a render again. Results are identical to a sample-level scan. The
+envelope only needs len() and slicing, so a wavmap.PeakEnvelope over a
+memory-mapped file works too (thresholds then in its native scale).
+
+GapTracker applies the same skip/min-gap rules to an envelope that arrives
+in blocks, holding back only the tail-skip window and one open run.
+
+Usage:
+    from strudel_qa.gaps import EnvelopePyramid, find_silent_runs
+
+    starts, ends, peaks = find_silent_runs(envelope, 1e-5, min_len, lo, hi)
+
+    pyramid = EnvelopePyramid(envelope, sr)
+    starts, ends, peaks = pyramid.find_gaps(1e-5, min_len, lo, hi, window)
+
+    tracker = GapTracker(sr, 1e-5, skip_ms=500, min_gap_ms=50)
+    for block in envelope_blocks:
+        tracker.feed(block)
+    starts, ends, peaks = tracker.finish()
+
+Dependencies: numpy
+"""
+
+import numpy as np
+
+
+def analysis_bounds(total_samples: int, sr: int, skip_ms: float) -> tuple:
+    """[start, end) sample range left after skipping `skip_ms` at both ends."""
+    skip_samples = int((skip_ms / 1000.0) * sr)
+    start_idx = min(skip_samples, total_samples)
+    end_idx = max(start_idx, total_samples - skip_samples)
+    return start_idx, end_idx
+
+
+def find_silent_runs(
+    envelope: np.ndarray,
+    threshold: float,
+    min_len: int = 1,
+    start: int = 0,
+    end: int = None,
+    with_peaks: bool = True,
+) -> tuple:
+    """
+    Find runs of `envelope < threshold` within [start, end).
+
+    Returns (starts, ends, peaks): absolute sample indices of each run
+    (end exclusive) and the max envelope value inside it. `peaks` is None
+    when `with_peaks` is False. Runs shorter than `min_len` are dropped.
+    """
+    if end is None:
+        end = len(envelope)
+    region = envelope[start:end]
+    if len(region) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, (np.zeros(0) if with_peaks else None)
+
+    silent = region < threshold
+    edges = np.diff(silent.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+
+    keep = (run_ends - run_starts) >= max(1, min_len)
+    run_starts = run_starts[keep]
+    run_ends = run_ends[keep]
+
+    peaks = None
+    if with_peaks:
+        if len(run_starts) == 0:
+            peaks = np.zeros(0, dtype=region.dtype)
+        else:
+            # reduceat over [s0, e0, s1, e1, ...]; even slots are the gaps
+            bounds = np.empty(2 * len(run_starts), dtype=np.int64)
+            bounds[0::2] = run_starts
+            bounds[1::2] = run_ends
+            if bounds[-1] == len(region):
+                bounds = bounds[:-1]
+            peaks = np.maximum.reduceat(region, bounds)[0::2]
+
+    return run_starts + start, run_ends + start, peaks
+
+
+class EnvelopePyramid:
+    """Block-wise min/max of a peak envelope at several resolutions."""
+
+    def __init__(self, envelope: np.ndarray, sr: int, base_ms: float = 1.0,
+                 factor: int = 10, levels: int = 3, tile_samples: int = 1 << 16):
+        self.envelope = envelope
+        self.sr = sr
+        self.block_sizes = []
+        self.mins = []
+        self.maxs = []
+
+        # Level 0 reduces samples a tile at a time (the envelope may be a
+        # lazily computed view); each later level reduces the one below it
+        step = max(1, int(sr * base_ms / 1000.0))
+        if levels == 0 or len(envelope) == 0:
+            return
+        tile = step * max(1, tile_samples // step)
+        mins, maxs = [], []
+        for lo in range(0, len(envelope), tile):
+            values = envelope[lo:lo + tile]
+            mins.append(self._blocks(np.minimum, values, step))
+            maxs.append(self._blocks(np.maximum, values, step))
+        src_min, src_max = np.concatenate(mins), np.concatenate(maxs)
+        block = step
+        for level in range(levels):
+            if level:
+                src_min = self._blocks(np.minimum, src_min, factor)
+                src_max = self._blocks(np.maximum, src_max, factor)
+                block *= factor
+            self.block_sizes.append(block)
+            self.mins.append(src_min)
+            self.maxs.append(src_max)
+
+    @classmethod
+    def from_parts(cls, envelope, sr: int, parts: list) -> "EnvelopePyramid":
+        """
+        Join pyramids built over consecutive slices of `envelope`, each
+        starting on a multiple of coarsest_block(), given as (block_sizes,
+        mins, maxs). The result equals a pyramid over the whole envelope.
+        """
+        pyramid = cls(envelope, sr, levels=0)
+        pyramid.block_sizes = list(parts[0][0])
+        for level in range(len(pyramid.block_sizes)):
+            pyramid.mins.append(np.concatenate([mins[level] for _, mins, _ in parts]))
+            pyramid.maxs.append(np.concatenate([maxs[level] for _, _, maxs in parts]))
+        return pyramid
+
+    @staticmethod
+    def coarsest_block(sr: int, base_ms: float = 1.0, factor: int = 10, levels: int = 3) -> int:
+        """Block size of the top level, in samples."""
+        return max(1, int(sr * base_ms / 1000.0)) * factor ** (levels - 1)
+
+    @property
+    def peak(self):
+        """Largest envelope value (0 for an empty envelope)."""
+        return self.maxs[-1].max() if self.maxs else 0
+
+    @staticmethod
+    def _blocks(ufunc, values: np.ndarray, step: int) -> np.ndarray:
+        return ufunc.reduceat(values, np.arange(0, len(values), step))
+
+    def level_for(self, window_samples: int):
+        """Coarsest level whose blocks fit in `window_samples` (None = samples)."""
+        level = None
+        for i, block in enumerate(self.block_sizes):
+            if block <= window_samples:
+                level = i
+        return level
+
+    def find_gaps(
+        self,
+        threshold: float,
+        min_len: int = 1,
+        start: int = 0,
+        end: int = None,
+        window_samples: int = 1,
+    ) -> tuple:
+        """
+        Same contract as find_silent_runs() over the pyramid's envelope.
+
+        Blocks whose minimum is at or above `threshold` cannot hold a silent
+        sample, so only runs of the remaining blocks at least `min_len`
+        samples long are refined at sample resolution.
+        """
+        if end is None:
+            end = len(self.envelope)
+        level = self.level_for(window_samples)
+        if level is None or end <= start:
+            return find_silent_runs(self.envelope, threshold, min_len, start, end)
+
+        block = self.block_sizes[level]
+        first = start // block
+        last = -(-end // block)
+        quiet = self.mins[level][first:last] < threshold
+        edges = np.diff(quiet.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+        span_starts = np.maximum((np.flatnonzero(edges == 1) + first) * block, start)
+        span_ends = np.minimum((np.flatnonzero(edges == -1) + first) * block, end)
+
+        keep = (span_ends - span_starts) >= max(1, min_len)
+        found = [
+            find_silent_runs(self.envelope, threshold, min_len, int(a), int(b))
+            for a, b in zip(span_starts[keep], span_ends[keep])
+        ]
+        if not found:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=self.envelope.dtype)
+        starts, ends, peaks = zip(*found)
+        return np.concatenate(starts), np.concatenate(ends), np.concatenate(peaks)
+
+
+class GapTracker:
+    """
+    Incremental silent-run detection with head/tail skip.
+
+    The last `skip` samples are held back until more audio arrives, so the
+    tail skip is applied without knowing the stream length in advance.
+    Results match find_silent_runs() over analysis_bounds() of the whole
+    envelope.
+    """
+
+    def __init__(self, sr: int, threshold: float, skip_ms: float = 500.0,
+                 min_gap_ms: float = 50.0):
+        self.threshold = threshold
+        self.skip = int((skip_ms / 1000.0) * sr)
+        self.min_len = max(1, int((min_gap_ms / 1000.0) * sr))
+        self.seen = 0
+        self.lag = np.zeros(0)
+        self.lag_start = 0
+        self.open_start = None
+        self.open_peak = 0.0
+        self.starts = []
+        self.ends = []
+        self.peaks = []
+
+    def _emit(self, start, end, peak):
+        if end - start >= self.min_len:
+            self.starts.append(start)
+            self.ends.append(end)
+            self.peaks.append(peak)
+
+    def feed(self, envelope: np.ndarray):
+        self.seen += len(envelope)
+        buf = np.concatenate([self.lag, envelope]) if len(self.lag) else np.asarray(envelope)
+        release_end = max(self.lag_start, self.seen - self.skip)
+        lo = max(self.lag_start, self.skip)
+        if release_end > lo:
+            self._scan(buf[lo - self.lag_start:release_end - self.lag_start], lo)
+        keep_from = max(self.lag_start, release_end)
+        self.lag = np.array(buf[keep_from - self.lag_start:])
+        self.lag_start = keep_from
+
+    def _scan(self, chunk: np.ndarray, offset: int):
+        starts, ends, peaks = find_silent_runs(chunk, self.threshold)
+        first = 0
+        if self.open_start is not None:
+            if len(starts) and starts[0] == 0:
+                self.open_peak = max(self.open_peak, float(peaks[0]))
+                if ends[0] < len(chunk):
+                    self._emit(self.open_start, offset + int(ends[0]), self.open_peak)
+                    self.open_start = None
+                first = 1
+            else:
+                self._emit(self.open_start, offset, self.open_peak)
+                self.open_start = None
+
+        starts, ends, peaks = starts[first:], ends[first:], peaks[first:]
+        if len(starts) and ends[-1] == len(chunk) and self.open_start is None:
+            self.open_start = offset + int(starts[-1])
+            self.open_peak = float(peaks[-1])
+            starts, ends, peaks = starts[:-1], ends[:-1], peaks[:-1]
+
+        keep = (ends - starts) >= self.min_len
+        self.starts.extend((starts[keep] + offset).tolist())
+        self.ends.extend((ends[keep] + offset).tolist())
+        self.peaks.extend(peaks[keep].tolist())
+
+    def finish(self) -> tuple:
+        """Close any open run at the tail-skip boundary; returns (starts, ends, peaks)."""
+        if self.open_start is not None:
+            self._emit(self.open_start, max(self.lag_start, self.seen - self.skip), self.open_peak)
+            self.open_start = None
+        return (
+            np.asarray(self.starts, dtype=np.int64),
+            np.asarray(self.ends, dtype=np.int64),
+            np.asarray(self.peaks, dtype=np.float64),
+        )
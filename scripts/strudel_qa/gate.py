@@ -0,0 +1,878 @@
+"""
+gate.py — Post-render QA gate for Strudel compositions.
+
+Runs 4 checks on a rendered audio file and returns structured diagnostics.
+The file is read once into a session and every check reads from it (WAV PCM
+is memory-mapped and scanned in its native sample format; other formats are
+decoded into an AudioSession):
+1. Null drops — silence gaps mid-track (the same session scan as `strudel-qa gaps`)
+2. Spectral floor — flags if energy is concentrated below 320Hz (.slow() squash)
+3. LUFS — warns if integrated loudness (ITU BS.1770) is outside -14 to -18 range
+4. True peak — hard fail if the 4x-oversampled peak exceeds -1.0 dBFS
+
+Usage:
+    strudel-qa gate <audio_file> [options]
+    strudel-qa gate --batch <dir|glob|manifest> [--jobs N] [options]
+    python3 scripts/qa-gate.py ...   (same thing)
+
+Options:
+    --json          Output structured JSON (default: human-readable)
+    --lufs-min      Minimum LUFS target (default: -18)
+    --lufs-max      Maximum LUFS target (default: -14)
+    --peak-limit    True peak dBFS limit (default: -1.0)
+    --spectral-pct  Max % energy below 320Hz before flagging (default: 80)
+    --spectral-hz   Frequency threshold for spectral floor (default: 320)
+    --stream        Read the file in blocks; memory stays constant with length
+    --fail-fast     Stop at the first hard failure. Checks run cheapest first,
+                    and a sample peak over --peak-limit settles the true-peak
+                    hard fail before the oversampling pass; checks not run
+                    are reported as "skipped" (listed in "skipped")
+    --quick         Approximate pass for previews: loudness and spectrum from
+                    sampled excerpts, true peak and gaps from the peak
+                    envelope. Each estimate carries an error bound; the
+                    "quick" block says whether a full pass is needed (a
+                    threshold falls inside a bound)
+    --threads       Run checks that read different parts of the session
+                    (envelope, spectrum, loudness) on this many threads
+                    (default: up to 3; 1 per worker with --batch)
+    --shard-jobs N  Split one long render into ~45 s time shards and compute
+                    the gap envelope, loudness and spectrum on N processes
+                    reading the audio from the page cache or shared memory
+                    (shards.py). Same report as a single-process run; not
+                    with --stream or --batch
+    --batch         Check many files: a directory (searched recursively for
+                    audio), a glob ("renders/**/*.wav") or a manifest file
+                    (one path per line, or a JSON list; relative to the
+                    manifest). Repeatable.
+    --jobs          Worker processes for --batch (default: available CPUs)
+    --timings       Add a "timings" block: wall time and peak memory for the
+                    decode and each check, plus total time and peak RSS
+    --profile FILE  Also write a Chrome trace (FILE.json) or a cProfile dump
+                    (any other name; read with python3 -m pstats) of the run.
+                    Single-file mode only
+    --no-cache      Always re-analyze. By default reports are cached under
+                    $STRUDEL_TMP/qa-cache keyed on the audio's content hash,
+                    the options above and the QA code version (cache.py)
+    --history       Record the summary metrics in the QA history database
+                    (history.py), keyed by composition, render parameters,
+                    renderer version and time; query it with
+                    `strudel-qa history drift|regressions`
+    --composition   Composition name for --history (default: the file's stem)
+    --render-params Render parameters for --history, e.g. cycles=16,bpm=120
+    --renderer-version  Override the detected renderer version for --history
+
+Batch mode writes one NDJSON line per file as each finishes, then a final
+{"summary": ...} line, and exits with the worst exit code of any file.
+Workers are long-lived processes, so numpy/scipy/soundfile load once per
+worker rather than once per file.
+
+If the QA server (strudel-qa serve) is running, the invocation is handed to
+it over its Unix socket (same output and exit code, without the import cost).
+
+Exit codes:
+    0  All checks pass
+    1  One or more checks failed
+    2  Hard fail (true peak clipping)
+    3  Error (file not found, dependency missing, etc.)
+
+Dependencies: numpy, scipy, soundfile
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cache import ReportCache
+from .client import delegate
+from .history import add_record_arguments, recorder
+from .instrument import NO_TIMINGS, Timings, profiling
+from .schedule import run_checks
+
+if TYPE_CHECKING:
+    from .audio_session import AudioSession
+
+
+# ── Check 1: Null Drops ──────────────────────────────────────────────
+
+def check_null_drops(
+    session: "AudioSession",
+    threshold: float = 1e-5,
+    skip_ms: float = 500.0,
+    min_gap_ms: float = 50.0,
+) -> dict:
+    """Detect silence gaps in the audio signal."""
+    sr = session.sr
+    starts, ends, _ = session.gaps(threshold, skip_ms, min_gap_ms)
+    gaps = [
+        {
+            "at": round(int(a) / sr, 2),
+            "duration_ms": round((int(b - a) / sr) * 1000.0, 1),
+        }
+        for a, b in zip(starts, ends)
+    ]
+
+    # Fail if any gap > 100ms
+    has_problem = any(g["duration_ms"] > 100 for g in gaps)
+    total_silence = sum(g["duration_ms"] for g in gaps)
+
+    return {
+        "status": "fail" if has_problem else ("warn" if gaps else "pass"),
+        "gaps": gaps,
+        "total_silence_ms": round(total_silence, 1),
+    }
+
+
+# ── Check 2: Spectral Floor ──────────────────────────────────────────
+
+def check_spectral_floor(
+    session: "AudioSession",
+    freq_threshold: float = 320.0,
+    pct_limit: float = 80.0,
+) -> dict:
+    """Check if energy is concentrated below a frequency threshold.
+
+    Uses the session's Welch-averaged spectrum, so memory stays bounded by
+    one batch of segments however long the render is.
+    """
+    from .spectrum import band_energy
+
+    freqs, power = session.power_spectrum
+
+    # Total energy
+    total_energy = power.sum()
+    if total_energy == 0:
+        return {
+            "status": "fail",
+            "pct_below_threshold": 100.0,
+            "threshold_hz": freq_threshold,
+            "bands": band_energy(freqs, power),
+        }
+
+    # Energy below threshold
+    mask = freqs <= freq_threshold
+    low_energy = power[mask].sum()
+    pct_below = (low_energy / total_energy) * 100.0
+
+    status = "fail" if pct_below > pct_limit else "pass"
+    return {
+        "status": status,
+        "pct_below_threshold": round(pct_below, 1),
+        "threshold_hz": freq_threshold,
+        "bands": band_energy(freqs, power),
+    }
+
+
+# ── Check 3: LUFS ────────────────────────────────────────────────────
+
+def check_lufs(
+    session: "AudioSession",
+    lufs_min: float = -18.0,
+    lufs_max: float = -14.0,
+) -> dict:
+    """Measure integrated LUFS (ITU BS.1770, gated) from the session buffer."""
+    stats = session.loudness
+    lufs_value = stats["integrated_lufs"]
+
+    if lufs_value < lufs_min:
+        status = "warn"  # Too quiet
+    elif lufs_value > lufs_max:
+        status = "warn"  # Too loud
+    else:
+        status = "pass"
+
+    return {
+        "status": status,
+        "value": round(lufs_value, 1),
+        "lra": round(stats["lra"], 1),
+        "short_term_max": round(stats["short_term_max_lufs"], 1),
+        "momentary_max": round(stats["momentary_max_lufs"], 1),
+        "true_peak_dbfs": round(stats["true_peak_dbfs"], 1),
+        "target_range": [lufs_min, lufs_max],
+    }
+
+
+# ── Check 4: True Peak ───────────────────────────────────────────────
+
+def check_true_peak(
+    session: "AudioSession",
+    peak_limit_dbfs: float = -1.0,
+) -> dict:
+    """Check if the 4x-oversampled true peak exceeds the limit."""
+    stats = session.loudness
+    peak_dbfs = stats["true_peak_dbfs"]
+
+    status = "hard_fail" if peak_dbfs > peak_limit_dbfs else "pass"
+    return {
+        "status": status,
+        "value_dbfs": round(peak_dbfs, 1),
+        "sample_peak_dbfs": round(stats["sample_peak_dbfs"], 1),
+        "limit_dbfs": peak_limit_dbfs,
+    }
+
+
+def screen_true_peak(
+    session: "AudioSession",
+    peak_limit_dbfs: float = -1.0,
+) -> dict:
+    """Settle a true-peak hard fail from the sample peak, or return None.
+
+    The true-peak meter includes the samples themselves, so a sample peak
+    over the limit is a hard fail without the oversampling pass. The
+    reported value is then a lower bound on the true peak.
+    """
+    from .loudness import amplitude_to_dbfs
+
+    peak_dbfs = amplitude_to_dbfs(session.sample_peak)
+    if peak_dbfs <= peak_limit_dbfs:
+        return None
+    return {
+        "status": "hard_fail",
+        "value_dbfs": round(peak_dbfs, 1),
+        "value_is_lower_bound": True,
+        "sample_peak_dbfs": round(peak_dbfs, 1),
+        "limit_dbfs": peak_limit_dbfs,
+    }
+
+
+# ── Check Registry ───────────────────────────────────────────────────
+
+# name -> (check, estimated cost, session resource it reads), in report
+# order. Costs are relative wall time on a 300 s stereo 16-bit render,
+# envelope scan = 1; checks sharing a resource pay for it once.
+CHECKS = {
+    "null_drops": (check_null_drops, 1.0, "envelope"),
+    "spectral_floor": (check_spectral_floor, 1.5, "spectrum"),
+    "lufs": (check_lufs, 5.0, "loudness"),
+    "true_peak": (check_true_peak, 5.0, "loudness"),
+}
+
+# name -> (screen, estimated cost, resource): cheap tests that can settle a
+# check's hard fail early; only run with --fail-fast
+SCREENS = {
+    "true_peak": (screen_true_peak, 0.1, "envelope"),
+}
+
+
+# ── Quick Checks (--quick) ───────────────────────────────────────────
+
+def _within(value: float, error, *limits) -> bool:
+    """Whether any limit lies inside value ± error (None = unbounded)."""
+    return error is None or any(abs(value - limit) <= error for limit in limits)
+
+
+def check_null_drops_quick(
+    session: "AudioSession",
+    threshold: float = 1e-5,
+    skip_ms: float = 500.0,
+    min_gap_ms: float = 50.0,
+) -> dict:
+    """Likely gaps from envelope blocks, each as midpoint ± half its uncertainty."""
+    from .quick import quick_gaps
+
+    sr = session.sr
+    gaps, shortest, longest = [], [], []
+    for lo, hi, max_lo, max_hi in quick_gaps(session, threshold, skip_ms, min_gap_ms):
+        shortest.append((hi - lo) / sr * 1000.0)
+        longest.append((max_hi - max_lo) / sr * 1000.0)
+        gaps.append({
+            "at": round((lo + max_lo) / 2 / sr, 2),
+            "at_error_ms": round((lo - max_lo) / 2 / sr * 1000.0, 1),
+            "duration_ms": round((shortest[-1] + longest[-1]) / 2, 1),
+            "duration_error_ms": round((longest[-1] - shortest[-1]) / 2, 1),
+        })
+
+    def status(durations):
+        if any(d > 100 for d in durations):
+            return "fail"
+        return "warn" if any(d >= min_gap_ms for d in durations) else "pass"
+
+    return {
+        "status": status([g["duration_ms"] for g in gaps]),
+        "gaps": gaps,
+        "total_silence_ms": round(sum(g["duration_ms"] for g in gaps), 1),
+        # Only ask for a full pass if the bounds allow a different status
+        "confirm": status(shortest) != status(longest),
+    }
+
+
+def check_spectral_floor_quick(
+    session: "AudioSession",
+    freq_threshold: float = 320.0,
+    pct_limit: float = 80.0,
+) -> dict:
+    """Share of energy below the threshold from sampled Welch segments."""
+    from .quick import quick_spectrum
+    from .spectrum import band_energy
+
+    estimate = quick_spectrum(session, freq_threshold)
+    pct, error = estimate["pct_below"], estimate["error_pct"]
+    return {
+        "status": "fail" if pct > pct_limit else "pass",
+        "pct_below_threshold": round(pct, 1),
+        "error_pct": None if error is None else round(error, 1),
+        "threshold_hz": freq_threshold,
+        "bands": band_energy(estimate["freqs"], estimate["psd"]),
+        "confirm": _within(pct, error, pct_limit),
+    }
+
+
+def check_lufs_quick(
+    session: "AudioSession",
+    lufs_min: float = -18.0,
+    lufs_max: float = -14.0,
+) -> dict:
+    """Integrated LUFS from sampled momentary blocks."""
+    from .quick import quick_loudness
+
+    estimate = quick_loudness(session)
+    value, error = estimate["integrated_lufs"], estimate["error_lu"]
+    return {
+        "status": "pass" if lufs_min <= value <= lufs_max else "warn",
+        "value": round(value, 1),
+        "error_lu": None if error is None else round(error, 1),
+        "target_range": [lufs_min, lufs_max],
+        "confirm": _within(value, error, lufs_min, lufs_max),
+    }
+
+
+def check_true_peak_quick(
+    session: "AudioSession",
+    peak_limit_dbfs: float = -1.0,
+) -> dict:
+    """True peak of the loudest blocks, with a strict upper bound for the rest."""
+    from .loudness import amplitude_to_dbfs
+    from .quick import quick_true_peak
+
+    estimate = quick_true_peak(session)
+    value = amplitude_to_dbfs(estimate["value"])
+    upper = amplitude_to_dbfs(estimate["upper"])
+    return {
+        "status": "hard_fail" if value > peak_limit_dbfs else "pass",
+        "value_dbfs": round(value, 1),
+        "upper_dbfs": round(upper, 1),
+        "sample_peak_dbfs": round(amplitude_to_dbfs(estimate["sample_peak"]), 1),
+        "limit_dbfs": peak_limit_dbfs,
+        "confirm": value <= peak_limit_dbfs < upper,
+    }
+
+
+# Same layout as CHECKS. Gaps and true peak share the envelope pyramid;
+# spectrum and loudness read a fixed number of excerpts
+QUICK_CHECKS = {
+    "null_drops": (check_null_drops_quick, 1.0, "envelope"),
+    "spectral_floor": (check_spectral_floor_quick, 0.1, "spectrum"),
+    "lufs": (check_lufs_quick, 0.2, "loudness"),
+    "true_peak": (check_true_peak_quick, 1.2, "envelope"),
+}
+
+
+# ── Suggestions Generator ────────────────────────────────────────────
+
+def generate_suggestions(checks: dict) -> list:
+    """Generate human-readable fix suggestions based on check results."""
+    suggestions = []
+
+    null_drops = checks.get("null_drops", {})
+    if null_drops.get("status") in ("fail", "warn"):
+        count = len(null_drops.get("gaps", []))
+        suggestions.append(
+            f"Null drops: {count} silence gap(s) detected — check cycle/arrange() "
+            f"boundaries. Consider adding overlap or crossfade between sections."
+        )
+
+    spectral = checks.get("spectral_floor", {})
+    if spectral.get("status") == "fail":
+        pct = spectral.get("pct_below_threshold", 0)
+        hz = spectral.get("threshold_hz", 320)
+        top = sorted(spectral.get("bands", []), key=lambda b: b["pct"], reverse=True)[:2]
+        where = ", ".join(f"{b['band']} {b['pct']}%" for b in top)
+        suggestions.append(
+            f"Spectral: {pct}% energy below {hz}Hz — likely .slow() frequency squash"
+            + (f" (most energy in {where})" if where else "")
+            + ". Add .speed(N) to compensate, or reduce .slow() divisor."
+        )
+
+    lufs = checks.get("lufs", {})
+    if lufs.get("status") == "warn":
+        value = lufs.get("value", 0)
+        target = lufs.get("target_range", [-18, -14])
+        if value < target[0]:
+            suggestions.append(
+                f"LUFS: {value} dB is below target range ({target[0]} to {target[1]}). "
+                f"Consider increasing gain or applying loudnorm normalization."
+            )
+        else:
+            suggestions.append(
+                f"LUFS: {value} dB exceeds target range ({target[0]} to {target[1]}). "
+                f"Consider reducing gain."
+            )
+
+    true_peak = checks.get("true_peak", {})
+    if true_peak.get("status") == "hard_fail":
+        value = true_peak.get("value_dbfs", 0)
+        limit = true_peak.get("limit_dbfs", -1.0)
+        suggestions.append(
+            f"TRUE PEAK CLIPPING: {value} dBFS exceeds {limit} dBFS limit. "
+            f"Reduce gain immediately — this MUST be fixed before posting."
+        )
+
+    return suggestions
+
+
+# ── Main ──────────────────────────────────────────────────────────────
+
+def run_qa_gate(
+    audio_path: str,
+    lufs_min: float = -18.0,
+    lufs_max: float = -14.0,
+    peak_limit: float = -1.0,
+    spectral_pct: float = 80.0,
+    spectral_hz: float = 320.0,
+    stream: bool = False,
+    cache: ReportCache = None,
+    timings=NO_TIMINGS,
+    fail_fast: bool = False,
+    threads: int = 1,
+    quick: bool = False,
+    shard_jobs: int = 1,
+) -> dict:
+    """Run all QA checks and return structured results.
+
+    With `stream`, the file is read in fixed-size blocks through incremental
+    accumulators instead of being decoded into memory, so peak memory does
+    not grow with track length. With a `cache`, a report for byte-identical
+    audio and the same thresholds is returned without decoding. `timings`
+    (an instrument.Timings) records each stage.
+
+    Checks run cheapest first (see CHECKS). With `fail_fast`, the first hard
+    fail stops the run and the checks not yet run are reported as
+    "skipped"; `threads` > 1 runs checks reading different session
+    resources concurrently. Neither changes the result of a check that runs.
+
+    With `quick`, each check is estimated from excerpts and the peak
+    envelope instead (see quick.py; `stream` is ignored). Estimates carry
+    an error bound and a "confirm" flag, set when the check's threshold
+    lies inside the bound; the report's "quick" block lists those checks
+    and says whether a full pass is needed.
+
+    `shard_jobs` > 1 computes the envelope pyramid, loudness and spectrum of
+    a long track shard by shard on that many processes (see shards.py),
+    with the same result; checks then run one at a time.
+    """
+    path = Path(audio_path)
+
+    if cache is not None and path.is_file():
+        params = {
+            "lufs_min": lufs_min, "lufs_max": lufs_max, "peak_limit": peak_limit,
+            "spectral_pct": spectral_pct, "spectral_hz": spectral_hz,
+        }
+        with timings.stage("cache_lookup"):
+            key = cache.key("qa-gate-quick" if quick else "qa-gate", str(path), params)
+            result = cache.get(key)
+        if result is None:
+            result = run_qa_gate(audio_path, lufs_min, lufs_max, peak_limit, spectral_pct,
+                                 spectral_hz, stream, timings=timings, fail_fast=fail_fast,
+                                 threads=threads, quick=quick, shard_jobs=shard_jobs)
+            # A fail-fast report is partial; a full one answers both modes
+            if "skipped" not in result:
+                cache.put(key, result)
+        result["file"] = str(path)
+        return result
+
+    # numpy/scipy/soundfile load here, after the cache lookup
+    from .audio_session import StreamedSession, open_session
+
+    # Decode (or map) once; every check reads from the same session
+    with timings.stage("decode"):
+        if stream and not quick:
+            session = StreamedSession.from_file(str(path))
+        else:
+            session = open_session(str(path))
+
+    with ExitStack() as stack:
+        if shard_jobs > 1 and not quick and not stream:
+            from .shards import open_sharded
+            session = stack.enter_context(open_sharded(session, shard_jobs))
+            # Each resource already fills the pool; keep worker start-up
+            # on this thread
+            threads = 1
+        return check_session(path, session, lufs_min, lufs_max, peak_limit, spectral_pct,
+                             spectral_hz, fail_fast=fail_fast, threads=threads, quick=quick,
+                             timings=timings)
+
+
+def check_session(
+    path,
+    session: "AudioSession",
+    lufs_min: float = -18.0,
+    lufs_max: float = -14.0,
+    peak_limit: float = -1.0,
+    spectral_pct: float = 80.0,
+    spectral_hz: float = 320.0,
+    fail_fast: bool = False,
+    threads: int = 1,
+    quick: bool = False,
+    timings=NO_TIMINGS,
+) -> dict:
+    """Run the checks on an open session (see run_qa_gate) and build the result."""
+    # Run all checks, cheapest first
+    args = {
+        "null_drops": (),
+        "spectral_floor": (spectral_hz, spectral_pct),
+        "lufs": (lufs_min, lufs_max),
+        "true_peak": (peak_limit,),
+    }
+    checks = run_checks(
+        {name: (partial(check, session, *args[name]), cost, resource)
+         for name, (check, cost, resource) in (QUICK_CHECKS if quick else CHECKS).items()},
+        fail_fast=fail_fast,
+        threads=threads,
+        screens={name: (partial(screen, session, *args[name]), cost, resource)
+                 for name, (screen, cost, resource) in SCREENS.items()},
+        timings=timings,
+    )
+    return gate_report(path, session, checks, quick)
+
+
+def gate_report(path, session, checks: dict, quick: bool = False) -> dict:
+    """The gate's result for `checks` (name -> check result) run on `session`."""
+    # Overall pass/fail
+    statuses = [c.get("status", "error") for c in checks.values()]
+    if "hard_fail" in statuses:
+        overall = "hard_fail"
+    elif "fail" in statuses or "error" in statuses:
+        overall = "fail"
+    elif "warn" in statuses:
+        overall = "warn"
+    else:
+        overall = "pass"
+
+    suggestions = generate_suggestions(checks)
+
+    result = {
+        "file": str(path),
+        "duration_s": round(session.duration_s, 3),
+        "sample_rate": session.sr,
+        "channels": session.channels,
+        "pass": overall == "pass",
+        "overall": overall,
+        "checks": checks,
+        "suggestions": suggestions,
+    }
+    skipped = [name for name, check in checks.items() if check["status"] == "skipped"]
+    if skipped:
+        result["skipped"] = skipped
+    if quick:
+        confirm = [name for name, check in checks.items() if check.get("confirm")]
+        result["quick"] = {
+            "needs_full_pass": bool(confirm),
+            "confirm": confirm,
+            "confidence": "sampled LUFS and spectral bounds are z=2 (~95%); "
+                          "true peak and gap bounds are strict",
+        }
+    return result
+
+
+def exit_code(result: dict) -> int:
+    """Exit codes: 0=pass, 1=fail/warn, 2=hard_fail, 3=error."""
+    if result["overall"] == "pass":
+        return 0
+    if result["overall"] == "hard_fail":
+        return 2
+    if result["overall"] == "error":
+        return 3
+    return 1
+
+
+# ── Batch Mode ────────────────────────────────────────────────────────
+
+AUDIO_EXTENSIONS = {".wav", ".flac", ".mp3", ".ogg", ".aiff", ".aif"}
+
+
+def expand_batch_inputs(specs: list) -> list:
+    """Resolve directories, globs and manifests into a sorted list of unique files."""
+    files = []
+    for spec in specs:
+        path = Path(spec)
+        if path.is_dir():
+            files.extend(
+                p for p in path.rglob("*")
+                if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS
+            )
+        elif glob.has_magic(spec):
+            files.extend(Path(p) for p in glob.glob(spec, recursive=True) if Path(p).is_file())
+        elif path.is_file() and path.suffix.lower() not in AUDIO_EXTENSIONS:
+            files.extend(read_manifest(path))
+        else:
+            # A plain audio path; a missing one is reported as an error result
+            files.append(path)
+    return sorted({str(f) for f in files})
+
+
+def read_manifest(path: Path) -> list:
+    """Paths from a manifest: a JSON list (or {"files": [...]}) or one path per line."""
+    text = path.read_text()
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        entries = [
+            line.strip() for line in text.splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]
+    if isinstance(entries, dict):
+        entries = entries.get("files", [])
+    return [path.parent / entry for entry in entries]
+
+
+def _batch_check(audio_path: str, options: dict, timed: bool = False) -> dict:
+    """Worker entry point: run the gate on one file, folding errors into the result."""
+    timings = Timings() if timed else NO_TIMINGS
+    try:
+        result = run_qa_gate(audio_path, **options, timings=timings)
+    except Exception as e:
+        result = {"file": audio_path, "pass": False, "overall": "error", "error": str(e)}
+    if timed:
+        result["timings"] = timings.report()
+    result["exit_code"] = exit_code(result)
+    return result
+
+
+def default_jobs() -> int:
+    """CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def run_batch(files: list, options: dict, jobs: int = None, out=sys.stdout,
+              timed: bool = False, on_result=None) -> dict:
+    """
+    Check `files` over a process pool, writing one NDJSON line per file as
+    it completes (and passing it to `on_result`). Returns the aggregate
+    summary (also written last).
+    """
+    jobs = max(1, min(jobs or default_jobs(), len(files) or 1))
+    counts = {status: 0 for status in ("pass", "warn", "fail", "hard_fail", "error")}
+    worst = 0
+
+    def emit(result):
+        nonlocal worst
+        counts[result["overall"]] = counts.get(result["overall"], 0) + 1
+        worst = max(worst, result["exit_code"])
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        if on_result is not None:
+            on_result(result)
+
+    if jobs == 1:
+        for audio_path in files:
+            emit(_batch_check(audio_path, options, timed))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_batch_check, audio_path, options, timed) for audio_path in files]
+            for future in as_completed(futures):
+                emit(future.result())
+
+    summary = {"files": len(files), "jobs": jobs, **counts, "worst_exit_code": worst}
+    out.write(json.dumps({"summary": summary}) + "\n")
+    out.flush()
+    return summary
+
+
+def _error(value, spec: str) -> str:
+    return "?" if value is None else format(value, spec)
+
+
+def format_human(result: dict) -> str:
+    """Format QA results for human reading."""
+    lines = []
+    lines.append(f"╔══ QA Gate: {result['file']}")
+    lines.append(f"║  Duration: {result['duration_s']:.1f}s | {result['sample_rate']}Hz | {result['channels']}ch")
+    lines.append("║")
+
+    status_icons = {
+        "pass": "✅",
+        "warn": "⚠️ ",
+        "fail": "❌",
+        "hard_fail": "🛑",
+        "error": "💥",
+        "skipped": "⏭️ ",
+    }
+
+    for name, check in result["checks"].items():
+        icon = status_icons.get(check.get("status", "error"), "?")
+        label = name.replace("_", " ").title()
+
+        if check.get("status") == "skipped":
+            detail = "skipped (fail-fast)"
+        elif name == "null_drops":
+            gap_count = len(check.get("gaps", []))
+            silence = check.get("total_silence_ms", 0)
+            detail = f"{gap_count} gaps ({silence:.0f}ms total)"
+            if check.get("confirm"):
+                detail += ", bounds straddle a limit"
+        elif name == "spectral_floor":
+            pct = check.get("pct_below_threshold", 0)
+            hz = check.get("threshold_hz", 320)
+            detail = f"{pct:.0f}% below {hz}Hz"
+            if "error_pct" in check:
+                detail = f"{pct:.0f}% ± {_error(check['error_pct'], '.0f')} below {hz}Hz"
+        elif name == "lufs":
+            if "error" in check:
+                detail = check["error"]
+            else:
+                val = check.get("value", 0)
+                lra = check.get("lra", 0)
+                detail = f"{val:.1f} LUFS (LRA {lra:.1f})"
+                if "error_lu" in check:
+                    detail = f"{val:.1f} ± {_error(check['error_lu'], '.1f')} LUFS"
+        elif name == "true_peak":
+            val = check.get("value_dbfs", 0)
+            detail = f"{'≥ ' if check.get('value_is_lower_bound') else ''}{val:.1f} dBFS"
+            if "upper_dbfs" in check and check["upper_dbfs"] > val:
+                detail = f"{val:.1f} to {check['upper_dbfs']:.1f} dBFS"
+        else:
+            detail = str(check)
+
+        lines.append(f"║  {icon} {label}: {detail}")
+
+    lines.append("║")
+    overall_icon = status_icons.get(result["overall"], "?")
+    lines.append(f"║  {overall_icon} Overall: {result['overall'].upper()}")
+
+    if "quick" in result:
+        quick = result["quick"]
+        lines.append("║")
+        if quick["needs_full_pass"]:
+            lines.append(f"║  Quick pass: full pass needed ({', '.join(quick['confirm'])} "
+                         "too close to call)")
+        else:
+            lines.append("║  Quick pass: every verdict holds within its bounds")
+
+    if result["suggestions"]:
+        lines.append("║")
+        lines.append("║  Suggestions:")
+        for s in result["suggestions"]:
+            lines.append(f"║    → {s}")
+
+    if "timings" in result:
+        lines.append("║")
+        lines.append("║  Timings:")
+        for name, stage in result["timings"]["stages"].items():
+            lines.append(f"║    {name:<16} {stage['wall_s']:>8.3f}s  {stage['peak_mb']:>7.1f} MB")
+        lines.append(f"║    {'total':<16} {result['timings']['total_s']:>8.3f}s  "
+                     f"{result['timings']['peak_rss_mb']:>7.1f} MB RSS")
+
+    lines.append("╚" + "═" * 60)
+    return "\n".join(lines)
+
+
+def main(argv: list = None, prog: str = None):
+    # Hand the invocation to a running QA server before paying for
+    # numpy/scipy imports; returns if none is listening
+    delegate("gate", argv, prog)
+
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Post-render QA gate for Strudel compositions."
+    )
+    parser.add_argument("audio_file", nargs="?", help="Path to rendered audio file")
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    parser.add_argument("--lufs-min", type=float, default=-18.0)
+    parser.add_argument("--lufs-max", type=float, default=-14.0)
+    parser.add_argument("--peak-limit", type=float, default=-1.0)
+    parser.add_argument("--spectral-pct", type=float, default=80.0)
+    parser.add_argument("--spectral-hz", type=float, default=320.0)
+    parser.add_argument("--stream", action="store_true",
+                        help="Read in blocks with constant memory (long renders)")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="Stop at the first hard failure; later checks are skipped")
+    parser.add_argument("--quick", action="store_true",
+                        help="Approximate checks with error bounds (previews)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Threads for independent checks (default: 1 with --batch, "
+                             "else up to 3 by available CPUs)")
+    parser.add_argument("--shard-jobs", type=int, default=1, metavar="N",
+                        help="Analyse time shards of one long render on N processes")
+    parser.add_argument("--batch", action="append", metavar="SPEC",
+                        help="Directory, glob or manifest of files to check (NDJSON output)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Worker processes for --batch (default: available CPUs)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore and don't update the QA report cache")
+    parser.add_argument("--timings", action="store_true",
+                        help="Add per-stage wall time and peak memory to the report")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="Write a Chrome trace (.json) or cProfile dump of the run")
+    add_record_arguments(parser)
+
+    args = parser.parse_args(argv)
+    if not args.audio_file and not args.batch:
+        parser.error("an audio file or --batch is required")
+    if args.shard_jobs < 1:
+        parser.error("--shard-jobs must be at least 1")
+    if args.shard_jobs > 1 and (args.batch or args.stream):
+        parser.error("--shard-jobs splits one in-memory file; not with --batch or --stream")
+    if args.composition and args.batch:
+        parser.error("--composition names one file; --batch records each file's stem")
+    tool = "gate-quick" if args.quick else "gate"
+
+    options = dict(
+        lufs_min=args.lufs_min,
+        lufs_max=args.lufs_max,
+        peak_limit=args.peak_limit,
+        spectral_pct=args.spectral_pct,
+        spectral_hz=args.spectral_hz,
+        stream=args.stream,
+        cache=None if args.no_cache else ReportCache.default(),
+        fail_fast=args.fail_fast,
+        quick=args.quick,
+        # Batch workers already fill the CPUs with processes
+        threads=args.threads or (1 if args.batch else min(3, default_jobs())),
+        shard_jobs=args.shard_jobs,
+    )
+
+    if args.batch:
+        specs = args.batch + ([args.audio_file] if args.audio_file else [])
+        try:
+            files = expand_batch_inputs(specs)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(3)
+        with recorder(args, tool) as record:
+            summary = run_batch(files, options, args.jobs, timed=args.timings, on_result=record)
+        sys.exit(summary["worst_exit_code"])
+
+    timings = Timings() if args.timings or args.profile else NO_TIMINGS
+    try:
+        with profiling(args.profile, timings):
+            result = run_qa_gate(args.audio_file, **options, timings=timings)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(3)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(3)
+
+    if args.timings:
+        result["timings"] = timings.report()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_human(result))
+
+    with recorder(args, tool) as record:
+        record(result)
+    sys.exit(exit_code(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,580 @@
+"""
+history.py — SQLite history of QA summary metrics across renders.
+
+references/spectral-validation.md asks for a re-check after upgrading Node,
+Strudel or the renderer, but a QA report used to be gone once printed. With
+--history, `strudel-qa gate`, `analyze` and `pipeline` add one row per
+render to a local SQLite database:
+
+  - keyed by composition (the audio file's stem, as dispatch.sh names
+    renders, or --composition), render parameters (--render-params
+    "cycles=16,bpm=120"; the pipeline fills them in), renderer version
+    (package version, Node version, the installed @strudel/core and a hash
+    of src/runtime, or --renderer-version) and time, plus the QA code
+    version (cache.tool_version()) and the tool that produced it;
+  - holding the summary metrics in METRICS that the tool reports, NULL
+    for the rest, and the gate's overall verdict:
+      gate / pipeline  duration, loudness, LRA, true peak, energy share
+                       below the spectral threshold, gap count and longest
+                       gap (from the checks that ran)
+      analyze          duration, loudness, LRA, true peak, silence, cliffs
+                       and anomaly count
+      analyze-quick    duration, loudness, true peak, energy share below
+                       320 Hz, likely-gap count and longest, silence and
+                       anomaly count
+
+Rows are buffered and written BATCH_ROWS at a time in one transaction (a
+--batch or pipeline run commits once at the end), in WAL mode so
+concurrent recorders and readers do not block each other for long.
+
+Queries read only the database, never audio, and go through two indexes:
+runs_by_group (composition, tool, render_params, recorded_at) and
+runs_by_renderer (renderer_version, composition, tool, render_params,
+recorded_at):
+
+    strudel-qa history drift <composition>  every run of a composition
+        per tool and render parameters, oldest first, with each metric's
+        change from the run before and that run's regression flags
+    strudel-qa history regressions          for every composition, tool and
+        render parameters, the latest run against the one before it (or
+        against the latest run on --baseline-renderer VERSION); exits 1
+        when anything regressed
+    strudel-qa history renderers            renderer versions with their
+        number of runs and first and last use
+
+A regression is: integrated LUFS moving more than --lufs-db (1 dB), true
+peak rising more than --peak-db (1 dB), more gaps or a longest gap over
+--gap-ms (10 ms) longer, the energy share below the spectral threshold
+moving more than --spectral-pct (5 points), more silence (1 point) or
+spectral cliffs, a duration change over 0.1 s, or a worse gate verdict.
+
+The database is $STRUDEL_QA_HISTORY, or qa-history.sqlite under
+$STRUDEL_TMP (next to the report cache).
+
+Usage:
+    strudel-qa gate render.wav --history [--render-params cycles=16,bpm=120]
+    strudel-qa history drift my-track [--tool gate] [--limit 20] [--json]
+    strudel-qa history regressions [--baseline-renderer VERSION] [--json]
+
+    from strudel_qa.history import History
+
+    with History.open() as history:
+        history.record("gate", gate_result, render_params={"cycles": 16, "bpm": 120})
+    History.open().drift("my-track")
+
+Dependencies: none (stdlib only)
+"""
+
+import argparse
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .cache import render_dir, tool_version
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BATCH_ROWS = 64
+
+# Summary metrics stored per run, all numbers (NULL when the tool has none)
+METRICS = (
+    "duration_s", "integrated_lufs", "lra", "true_peak_dbfs", "pct_below_hz",
+    "gap_count", "longest_gap_ms", "silence_pct", "cliff_count", "anomaly_count",
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    tool TEXT NOT NULL,
+    composition TEXT NOT NULL,
+    render_params TEXT NOT NULL,
+    renderer_version TEXT NOT NULL,
+    qa_version TEXT NOT NULL,
+    file TEXT NOT NULL,
+    overall TEXT,
+    {", ".join(f"{name} REAL" for name in METRICS)}
+);
+CREATE INDEX IF NOT EXISTS runs_by_group
+    ON runs (composition, tool, render_params, recorded_at);
+CREATE INDEX IF NOT EXISTS runs_by_renderer
+    ON runs (renderer_version, composition, tool, render_params, recorded_at);
+"""
+
+COLUMNS = ("recorded_at", "tool", "composition", "render_params", "renderer_version",
+           "qa_version", "file", "overall") + METRICS
+
+# Gate verdicts from best to worst
+VERDICTS = ("pass", "warn", "fail", "hard_fail")
+
+TOLERANCES = {"lufs_db": 1.0, "peak_db": 1.0, "gap_ms": 10.0, "spectral_pct": 5.0,
+              "silence_pct": 1.0, "duration_s": 0.1}
+
+
+def default_path() -> Path:
+    """$STRUDEL_QA_HISTORY, or qa-history.sqlite under $STRUDEL_TMP."""
+    return Path(os.environ.get("STRUDEL_QA_HISTORY") or render_dir() / "qa-history.sqlite")
+
+
+@functools.lru_cache(maxsize=None)
+def renderer_version(renderer: str = None) -> str:
+    """
+    What the render depended on: "<package version> node-<version>
+    strudel-<@strudel/core version> runtime-<hash of src/runtime and the
+    renderer script>".
+    """
+    try:
+        package = json.loads((ROOT_DIR / "package.json").read_text()).get("version", "?")
+    except (OSError, ValueError):
+        package = "?"
+    try:
+        node = subprocess.run(["node", "--version"], capture_output=True, text=True,
+                              timeout=10).stdout.strip() or "?"
+    except (OSError, subprocess.SubprocessError):
+        node = "?"
+    try:
+        lock = json.loads((ROOT_DIR / "package-lock.json").read_text())
+        strudel = lock["packages"]["node_modules/@strudel/core"]["version"]
+    except (OSError, ValueError, KeyError):
+        strudel = "?"
+    digest = hashlib.blake2b(digest_size=4)
+    sources = sorted((ROOT_DIR / "src" / "runtime").glob("*.mjs"))
+    if renderer is not None and Path(renderer).resolve() not in sources:
+        sources.append(Path(renderer))
+    for source in sources:
+        try:
+            digest.update(source.read_bytes())
+        except OSError:
+            pass
+    return f"{package} node-{node.lstrip('v')} strudel-{strudel} runtime-{digest.hexdigest()}"
+
+
+def format_params(params) -> str:
+    """Canonical "key=value,..." text of render parameters (a dict or such text)."""
+    if isinstance(params, str):
+        params = dict(item.split("=", 1) for item in params.split(",") if "=" in item)
+    items = []
+    for key, value in sorted((params or {}).items()):
+        try:
+            value = format(float(value), "g")
+        except (TypeError, ValueError):
+            pass
+        items.append(f"{key.strip()}={str(value).strip()}")
+    return ",".join(items)
+
+
+def gate_metrics(result: dict) -> dict:
+    """METRICS of a gate (or pipeline) result; checks that did not run are None."""
+    checks = result.get("checks", {})
+
+    def ran(name):
+        check = checks.get(name, {})
+        return check if check.get("status") not in (None, "skipped", "error") else {}
+
+    null_drops = ran("null_drops")
+    gaps = null_drops.get("gaps")
+    return {
+        "duration_s": result.get("duration_s"),
+        "integrated_lufs": ran("lufs").get("value"),
+        "lra": ran("lufs").get("lra"),
+        "true_peak_dbfs": ran("true_peak").get("value_dbfs"),
+        "pct_below_hz": ran("spectral_floor").get("pct_below_threshold"),
+        "gap_count": None if gaps is None else len(gaps),
+        "longest_gap_ms": None if gaps is None else max(
+            (gap["duration_ms"] for gap in gaps), default=0.0),
+    }
+
+
+def analyze_metrics(report: dict) -> dict:
+    """
+    METRICS of an analyze (or --quick) report. Only the quick report has
+    the 320 Hz energy share and gaps; only the full one has LRA and cliffs.
+    """
+    summary = report.get("summary", {})
+    return {
+        "duration_s": report.get("duration_sec"),
+        "integrated_lufs": summary.get("integrated_lufs"),
+        "lra": summary.get("lra"),
+        "true_peak_dbfs": summary.get("true_peak_dbfs"),
+        "pct_below_hz": summary.get("pct_below_320hz"),
+        "gap_count": summary.get("gap_count"),
+        "longest_gap_ms": summary.get("longest_gap_ms"),
+        "silence_pct": summary.get("silence_pct"),
+        "cliff_count": summary.get("cliff_count"),
+        "anomaly_count": summary.get("anomaly_count"),
+    }
+
+
+def compare_runs(before: dict, after: dict, tolerances: dict = None) -> list:
+    """What got worse from run `before` to run `after` (see the module docstring)."""
+    tol = {**TOLERANCES, **(tolerances or {})}
+    flags = []
+
+    def delta(name):
+        if before.get(name) is None or after.get(name) is None:
+            return None
+        return after[name] - before[name]
+
+    change = delta("integrated_lufs")
+    if change is not None and abs(change) > tol["lufs_db"]:
+        flags.append(f"LUFS moved {change:+.1f} dB")
+    change = delta("true_peak_dbfs")
+    if change is not None and change > tol["peak_db"]:
+        flags.append(f"true peak rose {change:+.1f} dB")
+    change = delta("gap_count")
+    if change is not None and change > 0:
+        flags.append(f"new gaps ({before['gap_count']:g} -> {after['gap_count']:g})")
+    else:
+        change = delta("longest_gap_ms")
+        if change is not None and change > tol["gap_ms"]:
+            flags.append(f"longest gap {change:+.0f} ms")
+    change = delta("pct_below_hz")
+    if change is not None and abs(change) > tol["spectral_pct"]:
+        flags.append(f"low-frequency share moved {change:+.1f} points")
+    change = delta("silence_pct")
+    if change is not None and change > tol["silence_pct"]:
+        flags.append(f"silence {change:+.1f} points")
+    change = delta("cliff_count")
+    if change is not None and change > 0:
+        flags.append(f"new spectral cliffs ({before['cliff_count']:g} -> {after['cliff_count']:g})")
+    change = delta("duration_s")
+    if change is not None and abs(change) > tol["duration_s"]:
+        flags.append(f"duration {change:+.2f} s")
+    if before.get("overall") in VERDICTS and after.get("overall") in VERDICTS \
+            and VERDICTS.index(after["overall"]) > VERDICTS.index(before["overall"]):
+        flags.append(f"verdict {before['overall']} -> {after['overall']}")
+    return flags
+
+
+class History:
+    """A QA history database: buffered recording plus the drift/regression queries."""
+
+    def __init__(self, path, batch_rows: int = BATCH_ROWS, renderer_version: str = None):
+        self.path = Path(path)
+        self.batch_rows = batch_rows
+        self.renderer_version = renderer_version
+        self.pending = []
+        self._conn = None
+
+    @classmethod
+    def open(cls, path=None, **kwargs) -> "History":
+        return cls(path or default_path(), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), timeout=30.0)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def record(self, tool: str, result: dict, composition: str = None, render_params=None,
+               renderer: str = None):
+        """
+        Queue one run of `tool` ("gate", "analyze", or either with "-quick")
+        for writing. Results with "overall": "error" are not recorded.
+        """
+        if result.get("overall") == "error":
+            return
+        metrics = analyze_metrics(result) if tool.startswith("analyze") else gate_metrics(result)
+        row = {
+            "recorded_at": time.time(),
+            "tool": tool,
+            "composition": composition or Path(result["file"]).stem,
+            "render_params": format_params(render_params),
+            "renderer_version": self.renderer_version or renderer_version(renderer),
+            "qa_version": tool_version(),
+            "file": str(result["file"]),
+            "overall": result.get("overall"),
+            **{name: metrics.get(name) for name in METRICS},
+        }
+        self.pending.append(tuple(row[column] for column in COLUMNS))
+        if len(self.pending) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Write queued runs in one transaction."""
+        if not self.pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO runs ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in COLUMNS)})", self.pending)
+        self.pending = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ── Queries ───────────────────────────────────────────────────────
+
+    def drift(self, composition: str, tool: str = None, render_params: str = None,
+              limit: int = None, tolerances: dict = None) -> list:
+        """
+        Runs of `composition` grouped by (tool, render_params), oldest first
+        and at most the last `limit` per group. Each run carries "changes"
+        (metric deltas from the previous run) and "flags" (its regressions).
+        """
+        sql = "SELECT * FROM runs WHERE composition = ?"
+        args = [composition]
+        if tool is not None:
+            sql += " AND tool = ?"
+            args.append(tool)
+        if render_params is not None:
+            sql += " AND render_params = ?"
+            args.append(format_params(render_params))
+        sql += " ORDER BY tool, render_params, recorded_at"
+
+        series = {}
+        for row in self.conn.execute(sql, args):
+            series.setdefault((row["tool"], row["render_params"]), []).append(_run(row))
+        groups = []
+        for (group_tool, params), runs in series.items():
+            for previous, run in zip([None] + runs, runs):
+                run["changes"] = {} if previous is None else {
+                    name: round(run[name] - previous[name], 3) for name in METRICS
+                    if run[name] is not None and previous[name] is not None
+                    and run[name] != previous[name]
+                }
+                run["flags"] = [] if previous is None else compare_runs(previous, run, tolerances)
+            groups.append({"tool": group_tool, "render_params": params,
+                           "runs": runs[-limit:] if limit else runs})
+        return groups
+
+    def regressions(self, baseline_renderer: str = None, tolerances: dict = None,
+                    composition: str = None) -> list:
+        """
+        For each (composition, tool, render_params), the latest run against
+        the run before it, or against the latest run on `baseline_renderer`
+        (groups without one are left out). Returns only groups with flags.
+        """
+        sql = "SELECT DISTINCT composition, tool, render_params FROM runs"
+        args = []
+        if composition is not None:
+            sql += " WHERE composition = ?"
+            args.append(composition)
+        groups = self.conn.execute(sql, args).fetchall()
+
+        found = []
+        for group in groups:
+            key = (group["composition"], group["tool"], group["render_params"])
+            latest = self.conn.execute(
+                "SELECT * FROM runs WHERE composition = ? AND tool = ? AND render_params = ? "
+                "ORDER BY recorded_at DESC LIMIT 2", key).fetchall()
+            if baseline_renderer is None:
+                baseline = latest[1] if len(latest) > 1 else None
+            else:
+                baseline = self.conn.execute(
+                    "SELECT * FROM runs WHERE renderer_version = ? AND composition = ? "
+                    "AND tool = ? AND render_params = ? ORDER BY recorded_at DESC LIMIT 1",
+                    (baseline_renderer, *key)).fetchone()
+                if baseline is not None and baseline["id"] == latest[0]["id"]:
+                    baseline = None
+            if baseline is None:
+                continue
+            before, after = _run(baseline), _run(latest[0])
+            flags = compare_runs(before, after, tolerances)
+            if flags:
+                found.append({"composition": key[0], "tool": key[1], "render_params": key[2],
+                              "baseline": before, "latest": after, "flags": flags})
+        return found
+
+    def renderers(self) -> list:
+        """Renderer versions seen, with run counts and first/last use, oldest first."""
+        rows = self.conn.execute(
+            "SELECT renderer_version, COUNT(*) AS runs, MIN(recorded_at) AS first_at, "
+            "MAX(recorded_at) AS last_at FROM runs GROUP BY renderer_version ORDER BY first_at")
+        return [{"renderer_version": row["renderer_version"], "runs": row["runs"],
+                 "first": _timestamp(row["first_at"]), "last": _timestamp(row["last_at"])}
+                for row in rows]
+
+
+def _timestamp(seconds: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(seconds))
+
+
+def _run(row: sqlite3.Row) -> dict:
+    run = dict(row)
+    run["recorded_at"] = _timestamp(run["recorded_at"])
+    return run
+
+
+def add_record_arguments(parser: argparse.ArgumentParser, naming: bool = True):
+    """
+    The --history options of a recording command; `naming` adds
+    --composition and --render-params for commands that don't know them.
+    """
+    parser.add_argument("--history", action="store_true",
+                        help="Record summary metrics in the QA history database "
+                             "($STRUDEL_QA_HISTORY; see strudel-qa history)")
+    if naming:
+        parser.add_argument("--composition", default=None,
+                            help="Composition name for --history (default: the file's stem)")
+        parser.add_argument("--render-params", default="", metavar="K=V,...",
+                            help="Render parameters for --history, e.g. cycles=16,bpm=120")
+    parser.add_argument("--renderer-version", default=None,
+                        help="Renderer version for --history (default: detected from "
+                             "package.json, node, @strudel/core and src/runtime)")
+
+
+@contextlib.contextmanager
+def recorder(args: argparse.Namespace, tool: str, renderer: str = None):
+    """
+    A record(result, render_params=None) callable for the
+    add_record_arguments() options in `args` (a no-op without --history).
+    Queued runs are written on exit. A history that can't be written only
+    warns, so QA output and exit codes never depend on it.
+    """
+    if not args.history:
+        yield lambda result, render_params=None: None
+        return
+    history = History.open(renderer_version=args.renderer_version)
+
+    def warn(e):
+        print(f"Warning: QA history not updated: {e}", file=sys.stderr)
+        history.pending = []
+        args.history = False
+
+    def record(result, render_params=None):
+        if not args.history:
+            return
+        try:
+            history.record(tool, result, getattr(args, "composition", None),
+                           render_params or getattr(args, "render_params", None), renderer)
+        except (sqlite3.Error, OSError) as e:
+            warn(e)
+
+    try:
+        yield record
+    finally:
+        try:
+            history.close()
+        except (sqlite3.Error, OSError) as e:
+            warn(e)
+
+
+# ── CLI ───────────────────────────────────────────────────────────────
+
+def _value(value, spec: str = ".1f") -> str:
+    return "—" if value is None else format(value, spec)
+
+
+def format_drift(composition: str, groups: list) -> str:
+    lines = []
+    for group in groups:
+        params = group["render_params"] or "no render params"
+        lines.append(f"═══ {composition} — {group['tool']} ({params}) ═══")
+        lines.append(f"  {'recorded':<20} {'LUFS':>6} {'TP':>6} {'<Hz%':>5} {'gaps':>4} "
+                     f"{'longest':>7} {'silence%':>8} {'cliffs':>6}  verdict  renderer")
+        for run in group["runs"]:
+            lines.append(
+                f"  {run['recorded_at']:<20} {_value(run['integrated_lufs']):>6} "
+                f"{_value(run['true_peak_dbfs']):>6} {_value(run['pct_below_hz']):>5} "
+                f"{_value(run['gap_count'], 'g'):>4} {_value(run['longest_gap_ms'], '.0f'):>7} "
+                f"{_value(run['silence_pct']):>8} {_value(run['cliff_count'], 'g'):>6}  "
+                f"{run['overall'] or '—':<8} "
+                f"{run['renderer_version']}")
+            for flag in run["flags"]:
+                lines.append(f"    ⚠️  {flag}")
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def format_regressions(found: list) -> str:
+    if not found:
+        return "No regressions"
+    lines = []
+    for item in found:
+        params = f" ({item['render_params']})" if item["render_params"] else ""
+        lines.append(f"🔴 {item['composition']} — {item['tool']}{params}")
+        lines.append(f"   {item['baseline']['recorded_at']} {item['baseline']['renderer_version']}")
+        lines.append(f"   -> {item['latest']['recorded_at']} {item['latest']['renderer_version']}")
+        for flag in item["flags"]:
+            lines.append(f"   ⚠️  {flag}")
+    return "\n".join(lines)
+
+
+def main(argv: list = None, prog: str = None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Query the QA history: metric drift and regressions")
+    parser.add_argument("--db", default=None,
+                        help="History database (default: $STRUDEL_QA_HISTORY or "
+                             "$STRUDEL_TMP/qa-history.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    drift = commands.add_parser("drift", help="Metrics of every run of a composition")
+    drift.add_argument("composition")
+    drift.add_argument("--tool", default=None, help="Only this tool (gate, analyze, ...)")
+    drift.add_argument("--render-params", default=None, metavar="K=V,...",
+                       help="Only runs with these render parameters")
+    drift.add_argument("--limit", type=int, default=None, help="Last N runs per series")
+
+    found = commands.add_parser("regressions",
+                                help="Latest run of every composition against a baseline")
+    found.add_argument("--baseline-renderer", default=None, metavar="VERSION",
+                       help="Compare against the latest run on this renderer version "
+                            "(default: the run before the latest)")
+    found.add_argument("--composition", default=None, help="Only this composition")
+
+    commands.add_parser("renderers", help="Renderer versions with their runs")
+
+    for sub in (drift, found):
+        sub.add_argument("--lufs-db", type=float, default=TOLERANCES["lufs_db"],
+                         help="LUFS change flagged as a regression (default: 1.0)")
+        sub.add_argument("--peak-db", type=float, default=TOLERANCES["peak_db"],
+                         help="True-peak rise flagged as a regression (default: 1.0)")
+        sub.add_argument("--gap-ms", type=float, default=TOLERANCES["gap_ms"],
+                         help="Longest-gap growth flagged as a regression (default: 10)")
+        sub.add_argument("--spectral-pct", type=float, default=TOLERANCES["spectral_pct"],
+                         help="Low-frequency share change flagged, in points (default: 5)")
+    for sub in commands.choices.values():
+        sub.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args(argv)
+
+    path = Path(args.db) if args.db else default_path()
+    if not path.exists():
+        print(f"Error: no QA history at {path} (record with --history)", file=sys.stderr)
+        sys.exit(3)
+    tolerances = {name: getattr(args, name) for name in ("lufs_db", "peak_db", "gap_ms",
+                                                         "spectral_pct") if hasattr(args, name)}
+
+    with History.open(path) as history:
+        if args.command == "drift":
+            result = history.drift(args.composition, args.tool, args.render_params,
+                                   args.limit, tolerances)
+            if result:
+                text = format_drift(args.composition, result)
+            else:
+                text = f"No runs of {args.composition}"
+            code = 0
+        elif args.command == "regressions":
+            result = history.regressions(args.baseline_renderer, tolerances, args.composition)
+            text = format_regressions(result)
+            code = 1 if result else 0
+        else:
+            result = history.renderers()
+            text = "\n".join(f"{r['renderer_version']}  {r['runs']} runs  "
+                             f"{r['first']} – {r['last']}" for r in result)
+            code = 0
+
+    print(json.dumps(result, indent=2) if args.json else text)
+    sys.exit(code)
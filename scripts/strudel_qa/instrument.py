@@ -0,0 +1,133 @@
+"""
+instrument.py — Optional per-stage timing and profiling for the QA commands.
+
+The gate, analyze and gaps commands wrap their decode and analysis stages
+in `timings.stage(name)`. With --timings the report gains a "timings" block:
+wall time and traced peak memory per stage (tracemalloc, which numpy reports
+its buffers to), total wall time and the process's peak RSS. A stage entered repeatedly (once per streamed block) is accumulated
+under one name. Work shared between checks (one decode feeding several) is
+charged to whichever stage triggers it first.
+
+--profile FILE additionally records the run: FILE ending in .json gets a
+Chrome trace-event file (open in chrome://tracing or Perfetto) with one
+event per stage entry; any other name gets a cProfile dump readable with
+`python3 -m pstats FILE`.
+
+When neither flag is given the stages are no-ops (NO_TIMINGS).
+
+Usage:
+    from strudel_qa.instrument import NO_TIMINGS, Timings, profiling
+
+    timings = Timings() if args.timings or args.profile else NO_TIMINGS
+    with profiling(args.profile, timings):
+        with timings.stage("decode"):
+            ...
+    report["timings"] = timings.report()
+
+Dependencies: none (stdlib only)
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return rss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+class Timings:
+    """Wall time and peak traced memory per named stage."""
+
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.events = []
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        if self.memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else 0
+            entry = self.stages.setdefault(name, {"wall_s": 0.0, "peak_mb": 0.0, "calls": 0})
+            entry["wall_s"] += end - start
+            entry["peak_mb"] = max(entry["peak_mb"], peak / (1 << 20))
+            entry["calls"] += 1
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def report(self) -> dict:
+        """The "timings" block for a JSON report."""
+        return {
+            "stages": {
+                name: {
+                    "wall_s": round(entry["wall_s"], 4),
+                    "peak_mb": round(entry["peak_mb"], 1),
+                    "calls": entry["calls"],
+                }
+                for name, entry in self.stages.items()
+            },
+            "total_s": round(time.perf_counter() - self.started, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+    def chrome_trace(self) -> dict:
+        """Stage entries as Chrome trace "complete" events (microseconds)."""
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {"name": name, "ph": "X", "pid": pid, "tid": tid,
+                 "ts": round((start - self.started) * 1e6, 1),
+                 "dur": round((end - start) * 1e6, 1)}
+                for name, start, end, tid in self.events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+
+class _NoTimings:
+    """Stand-in when instrumentation is off: stages cost nothing."""
+
+    def stage(self, name: str):
+        return contextlib.nullcontext()
+
+
+NO_TIMINGS = _NoTimings()
+
+
+@contextlib.contextmanager
+def profiling(path: str, timings=NO_TIMINGS):
+    """Write a Chrome trace (path ending in .json) or a cProfile dump of the block."""
+    if not path:
+        yield
+        return
+    if path.endswith(".json"):
+        try:
+            yield
+        finally:
+            with open(path, "w") as f:
+                json.dump(timings.chrome_trace(), f)
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,498 @@
+"""
+null_drops.py — Detect silence gaps (null drops) in rendered audio.
+
+Scans a WAV/MP3/FLAC file for contiguous silence windows that indicate
+composition gaps (cycle boundaries, arrange() seams, loopAt() splices).
+
+Usage:
+    strudel-qa gaps <audio_file> [options]
+    python3 scripts/null-drop-detect.py <audio_file> [options]
+
+Options:
+    --window-ms     Envelope block size used to scan for gaps (default: 100).
+                    Only blocks dipping below --threshold are rescanned at
+                    sample resolution, so results do not depend on it.
+    --threshold     Max absolute amplitude to count as silence (default: 1e-5)
+    --skip-ms       Skip first/last N ms for natural fade (default: 500)
+    --min-gap-ms    Minimum gap duration to report (default: 50)
+    --json          Output as JSON instead of human-readable
+    --strict        Exit code 1 if ANY gap found (default: only if gap > 100ms)
+    --timings       Add wall time and peak memory per stage (decode, envelope,
+                    scan) to the result
+    --profile FILE  Write a Chrome trace (FILE.json) or a cProfile dump
+
+Seam mode (--bpm):
+    --bpm           Tempo the render used (dispatch.sh render's bpm). Enables
+                    seam analysis: every cycle boundary (cps = bpm / 240) is
+                    checked at sample resolution for short gaps, clicks and
+                    level drops, and all findings are placed by cycle/beat
+    --cycles        Cycles rendered (default: duration x cps, rounded)
+    --sections      arrange() section lengths in cycles, e.g. 4,8,4; seams
+                    where a section starts are reported as "arrange" seams
+    --seam-ms       Window checked on each side of a seam (default: 50)
+    --seam-min-gap-ms  Shortest gap reported at a seam (default: 5)
+    --click-db      Spike at the seam over the window's 99th-percentile
+                    second difference that counts as a click (default: 12)
+    --drop-db       RMS drop across a seam reported as a level drop (default: 20)
+
+If the QA server (strudel-qa serve) is running, the invocation is handed to
+it over its Unix socket (same output and exit code, without the import cost).
+
+Exit codes:
+    0  No problematic null drops found
+    1  Null drops detected (or --strict and any gap found)
+    2  Error (file not found, unsupported format, etc.)
+    With --strict in seam mode, any click or level drop also exits 1.
+
+Examples:
+    # Basic check
+    strudel-qa gaps output.wav
+
+    # Strict mode for CI/QA gate
+    strudel-qa gaps output.wav --strict --json
+
+    # Finer scan blocks for dense, noisy material
+    strudel-qa gaps output.wav --window-ms 10 --min-gap-ms 30
+
+    # Seams of a 16-cycle, 120 bpm render arranged as 4+8+4 cycles
+    strudel-qa gaps output.wav --bpm 120 --cycles 16 --sections 4,8,4
+
+WAV files with 16/32-bit integer or float PCM are memory-mapped and scanned
+in their native sample format, tile by tile; other formats are decoded with
+soundfile. Both paths share the session gap scan with `strudel-qa gate`.
+The rest of the track keeps that scan in seam mode; only the seam windows
+are read at sample resolution (seams.py).
+
+Dependencies: numpy, soundfile (both in strudel-music venv)
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .client import delegate
+from .instrument import NO_TIMINGS, Timings, profiling
+
+
+def detect_null_drops(
+    audio_path: str,
+    window_ms: float = 100.0,
+    threshold: float = 1e-5,
+    skip_ms: float = 500.0,
+    min_gap_ms: float = 50.0,
+    timings=NO_TIMINGS,
+    bpm: float = None,
+    cycles: int = None,
+    sections: list = None,
+    seam_ms: float = 50.0,
+    seam_min_gap_ms: float = 5.0,
+    click_db: float = 12.0,
+    drop_db: float = 20.0,
+) -> dict:
+    """
+    Scan audio for silence gaps. `timings` (an instrument.Timings) records
+    the decode, envelope and scan stages.
+
+    With `bpm`, the seams of a `cycles`-long render (arranged as
+    `sections`, in cycles) are also analysed at sample resolution (see
+    seams.py): gaps get cycle/bar/beat positions, and the result gains
+    "seams" (the grid used), "findings" (gaps, clicks and level drops in
+    time order) and "by_cycle".
+
+    Returns dict with:
+        file: str — input path
+        duration_s: float — total duration
+        sample_rate: int
+        channels: int
+        gaps: list of {start_s, end_s, duration_ms, max_amplitude}
+        summary: {total_gaps, total_silence_ms, longest_gap_ms}
+    """
+    path = Path(audio_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+
+    # numpy/soundfile load here, not at import, so --help and server
+    # delegation stay cheap
+    from .audio_session import open_session
+    from .gaps import analysis_bounds
+
+    # WAV PCM is scanned in place, in its native dtype; other formats decode
+    with timings.stage("decode"):
+        session = open_session(str(path))
+    sr, channels = session.sr, session.channels
+    duration_s = session.num_samples / sr
+
+    start_idx, end_idx = analysis_bounds(session.num_samples, sr, skip_ms)
+    if start_idx >= end_idx and bpm is None:
+        return {
+            "file": str(path),
+            "duration_s": duration_s,
+            "sample_rate": sr,
+            "channels": channels,
+            "gaps": [],
+            "summary": {
+                "total_gaps": 0,
+                "total_silence_ms": 0.0,
+                "longest_gap_ms": 0.0,
+            },
+        }
+
+    # Scan the envelope pyramid level matching the window, refining gap
+    # edges at sample resolution
+    with timings.stage("envelope"):
+        session.envelope_pyramid
+    with timings.stage("scan"):
+        starts, ends, peaks = session.gaps(threshold, skip_ms, min_gap_ms, window_ms)
+    gaps = [
+        {
+            "start_s": round(int(abs_start) / sr, 4),
+            "end_s": round(int(abs_end) / sr, 4),
+            "duration_ms": round((int(abs_end - abs_start) / sr) * 1000.0, 1),
+            # Max amplitude in the gap region for diagnostics
+            "max_amplitude": float(gap_max),
+        }
+        for abs_start, abs_end, gap_max in zip(starts, ends, peaks)
+    ]
+
+    seam_report = None
+    if bpm is not None:
+        with timings.stage("seams"):
+            seam_report = _seam_report(
+                session, gaps, list(zip(starts, ends)), bpm, cycles, sections, threshold,
+                seam_ms, seam_min_gap_ms, click_db, drop_db,
+            )
+
+    total_silence_ms = sum(g["duration_ms"] for g in gaps)
+    longest_gap_ms = max((g["duration_ms"] for g in gaps), default=0.0)
+
+    result = {
+        "file": str(path),
+        "duration_s": round(duration_s, 3),
+        "sample_rate": sr,
+        "channels": channels,
+        "gaps": gaps,
+        "summary": {
+            "total_gaps": len(gaps),
+            "total_silence_ms": round(total_silence_ms, 1),
+            "longest_gap_ms": round(longest_gap_ms, 1),
+        },
+    }
+    if seam_report is not None:
+        result.update(seam_report)
+    return result
+
+
+def _seam_report(session, gaps: list, spans: list, bpm: float, cycles: int, sections: list,
+                 threshold: float, seam_ms: float, min_gap_ms: float, click_db: float,
+                 drop_db: float) -> dict:
+    """
+    Seam analysis for detect_null_drops: adds positions to `gaps` (dicts
+    from the full scan, `spans` their sample ranges) in place, appends the
+    short gaps only seams reveal, and returns the seam-mode result fields.
+    """
+    from .seams import analyze_seams, cycles_per_second, position, seam_positions
+
+    sr = session.sr
+    cps = cycles_per_second(bpm)
+    if cycles is None:
+        cycles = max(1, round(session.num_samples / sr * cps))
+    seams = seam_positions(sr, bpm, cycles, sections)
+    per_seam = analyze_seams(session, seams, threshold, seam_ms, min_gap_ms, click_db, drop_db)
+
+    def place(sample, seam=None):
+        fields = position(sample, sr, bpm)
+        if seam is not None:
+            fields["seam"] = seam["kind"]
+            if "section" in seam:
+                fields["section"] = seam["section"]
+        return fields
+
+    # Gaps from the full scan that cross a seam window belong to that seam
+    reach = int(seam_ms / 1000.0 * sr)
+    for gap, (lo, hi) in zip(gaps, spans):
+        seam = next((s for s in seams if lo < s["sample"] + reach and hi > s["sample"] - reach),
+                    None)
+        gap.update(place(int(lo), seam))
+
+    findings = [{"kind": "gap", **g, "time_s": g["start_s"],
+                 "severity": "critical" if g["duration_ms"] > 100.0 else "warning"}
+                for g in gaps]
+    for seam, found in zip(seams, per_seam):
+        for item in found:
+            lo, hi = item.pop("start"), item.pop("end")
+            kind = item.pop("kind")
+            if kind == "gap":
+                if any(a < hi and b > lo for a, b in spans):
+                    continue  # Already reported, with its full extent
+                gap = {
+                    "start_s": round(lo / sr, 4),
+                    "end_s": round(hi / sr, 4),
+                    "duration_ms": round((hi - lo) / sr * 1000.0, 1),
+                    **item,
+                    **place(lo, seam),
+                }
+                gaps.append(gap)
+                findings.append({"kind": "gap", **gap, "time_s": gap["start_s"],
+                                 "severity": "critical" if gap["duration_ms"] > 100.0
+                                 else "warning"})
+            else:
+                findings.append({"kind": kind, "time_s": round(lo / sr, 4), **item,
+                                 **place(seam["sample"], seam), "severity": "warning"})
+    gaps.sort(key=lambda g: g["start_s"])
+    findings.sort(key=lambda f: f["time_s"])
+
+    by_cycle = {}
+    for finding in findings:
+        entry = by_cycle.setdefault(finding["cycle"], {
+            "cycle": finding["cycle"], "bar": finding["bar"], "kinds": {},
+        })
+        entry["kinds"][finding["kind"]] = entry["kinds"].get(finding["kind"], 0) + 1
+
+    return {
+        "seams": {
+            "bpm": bpm,
+            "cps": round(cps, 6),
+            "cycles": cycles,
+            "sections": list(sections) if sections else None,
+            "seam_count": len(seams),
+            "arrange_seams": sum(1 for s in seams if s["kind"] == "arrange"),
+            "seam_ms": seam_ms,
+        },
+        "findings": findings,
+        "by_cycle": [by_cycle[c] for c in sorted(by_cycle)],
+    }
+
+
+def format_human(result: dict) -> str:
+    """Format results for human reading."""
+    lines = []
+    lines.append(f"File: {result['file']}")
+    lines.append(
+        f"Duration: {result['duration_s']:.1f}s | "
+        f"{result['sample_rate']}Hz | "
+        f"{result['channels']}ch"
+    )
+    lines.append("")
+
+    if not result["gaps"]:
+        lines.append("✅ No null drops detected.")
+    else:
+        s = result["summary"]
+        lines.append(
+            f"⚠️  {s['total_gaps']} null drop(s) found "
+            f"({s['total_silence_ms']:.0f}ms total silence, "
+            f"longest: {s['longest_gap_ms']:.0f}ms)"
+        )
+        lines.append("")
+        lines.append("  Time         Duration   Max Amp")
+        lines.append("  ------------ ---------- --------")
+        for g in result["gaps"]:
+            lines.append(
+                f"  {g['start_s']:>7.2f}s     {g['duration_ms']:>6.1f}ms   "
+                f"{g['max_amplitude']:.2e}"
+            )
+
+    if "seams" in result:
+        lines.extend(_format_seams(result))
+
+    if "timings" in result:
+        t = result["timings"]
+        lines.append("")
+        for name, stage in t["stages"].items():
+            lines.append(f"  {name:<10} {stage['wall_s']:>8.3f}s  {stage['peak_mb']:>7.1f} MB")
+        lines.append(f"  {'total':<10} {t['total_s']:>8.3f}s  {t['peak_rss_mb']:>7.1f} MB RSS")
+
+    return "\n".join(lines)
+
+
+def _format_seams(result: dict) -> list:
+    seams = result["seams"]
+    arranged = f", {seams['arrange_seams']} arrange" if seams["sections"] else ""
+    lines = [
+        "",
+        f"Seams: {seams['seam_count']} ({seams['cycles']} cycles at {seams['bpm']:g} bpm"
+        f"{arranged}), ±{seams['seam_ms']:g}ms each",
+    ]
+    if not result["findings"]:
+        lines.append("✅ No seam problems detected.")
+        return lines
+
+    lines.append("")
+    lines.append("  Cycle  Bar:Beat  Kind        Seam        Detail")
+    lines.append("  -----  --------  ----------  ----------  ------")
+    for f in result["findings"]:
+        if f["kind"] == "gap":
+            detail = f"{f['duration_ms']:.1f}ms silent"
+        elif f["kind"] == "click":
+            spike = "over silence" if f["spike_db"] is None else f"+{f['spike_db']:.0f}dB"
+            detail = f"spike {spike}"
+        else:
+            detail = f"{f['before_db']:.0f} → {f['after_db']:.0f}dB"
+        seam = f.get("seam", "-")
+        if "section" in f:
+            seam += f" #{f['section']}"
+        bar_beat = f"{f['bar']}:{f['beat']:.2f}"
+        lines.append(f"  {f['cycle']:>5}  {bar_beat:>8}  {f['kind']:<10}  {seam:<10}  {detail}")
+    return lines
+
+
+def main(argv: list = None, prog: str = None):
+    # Hand the invocation to a running QA server before paying for
+    # numpy/soundfile imports; returns if none is listening
+    delegate("gaps", argv, prog)
+
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Detect silence gaps (null drops) in rendered audio."
+    )
+    parser.add_argument("audio_file", help="Path to audio file (WAV/MP3/FLAC)")
+    parser.add_argument(
+        "--window-ms",
+        type=float,
+        default=100.0,
+        help="Scan block size in ms (default: 100)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1e-5,
+        help="Silence threshold (default: 1e-5)",
+    )
+    parser.add_argument(
+        "--skip-ms",
+        type=float,
+        default=500.0,
+        help="Skip first/last N ms (default: 500)",
+    )
+    parser.add_argument(
+        "--min-gap-ms",
+        type=float,
+        default=50.0,
+        help="Min gap to report in ms (default: 50)",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Output JSON"
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Exit 1 on ANY gap (not just >100ms)",
+    )
+    parser.add_argument(
+        "--timings", action="store_true", help="Add per-stage timings"
+    )
+    parser.add_argument(
+        "--bpm",
+        type=float,
+        default=None,
+        help="Render tempo; enables seam analysis by cycle",
+    )
+    parser.add_argument(
+        "--cycles",
+        type=int,
+        default=None,
+        help="Cycles rendered (default: inferred from duration and --bpm)",
+    )
+    parser.add_argument(
+        "--sections",
+        default=None,
+        help="Comma-separated arrange() section lengths in cycles (e.g. 4,8,4)",
+    )
+    parser.add_argument(
+        "--seam-ms",
+        type=float,
+        default=50.0,
+        help="Window analysed on each side of a seam in ms (default: 50)",
+    )
+    parser.add_argument(
+        "--seam-min-gap-ms",
+        type=float,
+        default=5.0,
+        help="Min gap to report at a seam in ms (default: 5)",
+    )
+    parser.add_argument(
+        "--click-db",
+        type=float,
+        default=12.0,
+        help="Click spike threshold over the seam window in dB (default: 12)",
+    )
+    parser.add_argument(
+        "--drop-db",
+        type=float,
+        default=20.0,
+        help="Level drop across a seam to report in dB (default: 20)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help="Write a Chrome trace (.json) or cProfile dump",
+    )
+
+    args = parser.parse_args(argv)
+    sections = None
+    if args.sections:
+        try:
+            sections = [int(n) for n in args.sections.split(",") if n.strip()]
+        except ValueError:
+            parser.error("--sections takes comma-separated cycle counts")
+        if not sections or min(sections) < 1:
+            parser.error("--sections takes comma-separated cycle counts")
+    if (args.cycles is not None or sections) and args.bpm is None:
+        parser.error("--cycles and --sections need --bpm")
+    if args.bpm is not None and args.bpm <= 0:
+        parser.error("--bpm must be positive")
+
+    timings = Timings() if args.timings or args.profile else NO_TIMINGS
+    try:
+        with profiling(args.profile, timings):
+            result = detect_null_drops(
+                args.audio_file,
+                window_ms=args.window_ms,
+                threshold=args.threshold,
+                skip_ms=args.skip_ms,
+                min_gap_ms=args.min_gap_ms,
+                timings=timings,
+                bpm=args.bpm,
+                cycles=args.cycles,
+                sections=sections,
+                seam_ms=args.seam_ms,
+                seam_min_gap_ms=args.seam_min_gap_ms,
+                click_db=args.click_db,
+                drop_db=args.drop_db,
+            )
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+    except Exception as e:
+        print(f"Error analyzing audio: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.timings:
+        result["timings"] = timings.report()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(format_human(result))
+
+    # Exit code logic
+    if args.strict and result.get("findings"):
+        sys.exit(1)
+
+    if not result["gaps"]:
+        sys.exit(0)
+
+    if args.strict:
+        sys.exit(1)
+
+    # Default: exit 1 only if any gap > 100ms
+    if result["summary"]["longest_gap_ms"] > 100.0:
+        sys.exit(1)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+pipeline.py — Render, QA and MP3-encode compositions with overlapping stages.
+
+dispatch.sh renders a composition, then converts it to MP3, and the QA gate
+is a separate step afterwards, so turnaround is the three added up. The
+pipeline starts each render and consumes its WAV while it is being written:
+
+  - The renderer's output is followed as it grows (the WAV path is polled
+    for new bytes), or with --fifo the renderer writes into a named pipe
+    that is read directly and teed to the WAV path.
+  - Every block read goes both to ffmpeg (raw PCM on stdin, encoding in its
+    own process) and to a StreamedSession (the accumulators behind
+    `strudel-qa gate --stream`, fed on a worker thread), so QA and encoding
+    keep pace with the reader instead of re-reading the finished file.
+  - The true-peak meter only rises, so the block that takes it over
+    --peak-limit already decides the gate's hard fail. The render and the
+    encoder are stopped there, the partial WAV and MP3 are deleted and the
+    other checks are reported as "skipped", as with `gate --fail-fast`.
+  - Up to --jobs renders run at once; a result is written as each finishes.
+
+When the render ends, the gate's checks run on the accumulated session (the
+same report as `strudel-qa gate --stream` on the finished WAV), so little
+more than the encoder's tail is left once the renderer exits.
+
+offline-render-v2.mjs renders the whole buffer before it writes the WAV,
+so with it QA and encoding overlap each other and the other jobs' renders;
+a renderer that writes as it goes (see --renderer) is checked block by
+block and stopped early.
+
+Usage:
+    strudel-qa pipeline <composition.js>... [--cycles 16] [--bpm 120] [--jobs 2]
+                        [--out-dir DIR] [--fifo] [--no-mp3] [--json]
+    dispatch.sh pipeline ...   (same thing)
+
+Options:
+    --cycles, --bpm  Render length and tempo, as for dispatch.sh render
+    --jobs           Renders run at once (default: 2)
+    --out-dir        Where <name>.wav and <name>.mp3 go (default: $STRUDEL_TMP,
+                     as dispatch.sh)
+    --renderer       Node script called as <script> <input> <output.wav>
+                     <cycles> <bpm> (default: src/runtime/offline-render-v2.mjs)
+    --fifo           Have the renderer write into a named pipe instead of
+                     following the WAV file on disk
+    --no-mp3         Skip MP3 encoding (also skipped when ffmpeg is missing)
+    --keep-going     Finish the render and MP3 even after a hard fail
+    --block-ms       Read/QA block size in ms (default: 250)
+    --lufs-min, --lufs-max, --peak-limit, --spectral-pct, --spectral-hz
+                     Gate thresholds (see strudel-qa gate)
+    --json           One NDJSON line per job as it finishes, then a
+                     {"summary": ...} line (default: one line per job)
+    --history        Record each finished job's gate metrics in the QA history
+                     (history.py) under its composition, cycles and bpm
+    --renderer-version  Override the detected renderer version for --history
+
+Each result is the gate's report for the WAV plus a "pipeline" block with
+the output paths, the render time and the time taken after the render
+exited. A job that failed to render has "overall": "error"; a cancelled one
+has "file" and the pipeline block's "wav" set to null.
+
+Exit codes: the worst over all jobs, as for the gate (0 pass, 1 fail or
+warn, 2 hard fail, 3 error).
+
+Dependencies: numpy, scipy, soundfile, node; ffmpeg (for the MP3)
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from .cache import render_dir
+from .gate import exit_code
+from .history import add_record_arguments, recorder
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+RENDERER = ROOT_DIR / "src" / "runtime" / "offline-render-v2.mjs"
+
+BLOCK_MS = 250.0
+POLL_S = 0.02      # wait between reads of an output that has not grown
+LOG_LINES = 20     # renderer output kept for error reports
+
+# (WAVE format tag, bits per sample) -> ffmpeg raw input format, for the
+# layouts wavmap.NATIVE_FORMATS can read
+RAW_FORMATS = {
+    (0x0001, 16): "s16le",
+    (0x0001, 32): "s32le",
+    (0x0003, 32): "f32le",
+    (0x0003, 64): "f64le",
+}
+
+# Header sizes streamed WAV writers leave until they know the length
+PLACEHOLDER_SIZES = {0, 0xFFFFFFFF}
+
+
+class RenderTail:
+    """
+    Blocking reads of an output the renderer is still writing: a regular
+    file polled for growth or a FIFO, both opened non-blocking. read()
+    returns short only once `done()` says the writer exited and everything
+    it wrote has been read, or after stop(). With `copy`, every byte read
+    is also written there.
+    """
+
+    def __init__(self, path: Path, done, copy=None):
+        self.path = path
+        self.done = done
+        self.copy = copy
+        self.stopped = False
+        self.file = None
+
+    def _open(self) -> bool:
+        if self.file is None:
+            try:
+                fd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+            except FileNotFoundError:
+                return False
+            self.file = os.fdopen(fd, "rb", buffering=0)
+        return True
+
+    def read(self, size: int) -> bytes:
+        chunks, got = [], 0
+        while got < size and not self.stopped:
+            # Checked before reading, so bytes written just before the exit
+            # are still picked up
+            finished = self.done()
+            data = None
+            if self._open():
+                try:
+                    data = self.file.read(size - got)
+                except BlockingIOError:
+                    pass
+            if data:
+                chunks.append(data)
+                got += len(data)
+            elif finished:
+                break
+            else:
+                time.sleep(POLL_S)
+        data = b"".join(chunks)
+        if self.copy is not None:
+            self.copy.write(data)
+        return data
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def _collect(stream, lines: collections.deque):
+    """Keep the last lines a subprocess writes, so its pipe never fills."""
+    async for line in stream:
+        lines.append(line.decode(errors="replace").rstrip())
+
+
+async def _start_encoder(path: Path, raw: str, sr: int, channels: int):
+    return await asyncio.create_subprocess_exec(
+        "ffmpeg", "-f", raw, "-ar", str(sr), "-ac", str(channels), "-i", "pipe:0",
+        "-c:a", "libmp3lame", "-q:a", "2", "-f", "mp3", str(path), "-y", "-loglevel", "error",
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+
+def _error_result(wav: Path, message: str, log=()) -> dict:
+    result = {"file": str(wav), "pass": False, "overall": "error", "error": message}
+    if log:
+        result["render_log"] = list(log)
+    return result
+
+
+def _cancelled_result(wav: Path, session, peak_limit: float) -> dict:
+    """The gate's report for a render stopped at a true-peak hard fail."""
+    from .gate import CHECKS, gate_report
+    from .loudness import amplitude_to_dbfs
+    from .schedule import SKIPPED
+
+    checks = {name: dict(SKIPPED) for name in CHECKS}
+    checks["true_peak"] = {
+        "status": "hard_fail",
+        "value_dbfs": round(amplitude_to_dbfs(session.running_true_peak), 1),
+        "value_is_lower_bound": True,
+        "sample_peak_dbfs": round(amplitude_to_dbfs(session.sample_peak), 1),
+        "limit_dbfs": peak_limit,
+    }
+    return gate_report(wav, session, checks)
+
+
+async def _consume(tail: RenderTail, wav: Path, mp3: Path, render, gate_options: dict,
+                   block_ms: float, cancel: bool, info: dict) -> dict:
+    """
+    Read the render through `tail` into the encoder and QA. Returns the
+    gate report, or None when the render failed or wrote no WAV.
+    """
+    # numpy/scipy/soundfile load here, once a job actually runs
+    import numpy as np
+
+    from .audio_session import StreamedSession
+    from .gate import check_session
+    from .loudness import amplitude_to_dbfs
+    from .wavmap import NATIVE_FORMATS, read_wav_header
+
+    header = await asyncio.to_thread(read_wav_header, tail)
+    if header is None:
+        await render.wait()
+        return None
+    tag, channels, sr, bits, _, data_bytes = header
+    if (tag, bits) not in RAW_FORMATS:
+        raise ValueError(f"unsupported WAV sample format (tag {tag:#06x}, {bits}-bit)")
+    dtype, scale = NATIVE_FORMATS[(tag, bits)]
+    frame_bytes = channels * dtype.itemsize
+    block_bytes = max(1, int(sr * block_ms / 1000.0)) * frame_bytes
+    remaining = None if data_bytes in PLACEHOLDER_SIZES else data_bytes
+
+    session = StreamedSession(sr, channels, str(wav))
+    part = mp3.with_name(mp3.name + ".part") if mp3 else None
+    encoder = await _start_encoder(part, RAW_FORMATS[(tag, bits)], sr, channels) if part else None
+    peak_limit = gate_options["peak_limit"]
+    hard_fail = False
+    try:
+        pending = b""
+        while remaining is None or remaining > 0:
+            want = block_bytes if remaining is None else min(block_bytes, remaining)
+            data = await asyncio.to_thread(tail.read, want)
+            if remaining is not None:
+                remaining -= len(data)
+            data, short = pending + data, len(data) < want
+            usable = len(data) - len(data) % frame_bytes
+            data, pending = data[:usable], data[usable:]
+            if data:
+                drain = None
+                if encoder is not None:
+                    encoder.stdin.write(data)
+                    drain = asyncio.ensure_future(encoder.stdin.drain())
+                frames = np.frombuffer(data, dtype=dtype).reshape(-1, channels).astype(np.float64)
+                if scale != 1.0:
+                    frames *= 1.0 / scale
+                # The encoder drains while this block is measured
+                await asyncio.to_thread(session.feed, frames)
+                if drain is not None:
+                    try:
+                        await drain
+                    except (BrokenPipeError, ConnectionResetError):
+                        info["mp3_error"] = "encoder exited early"
+                        await encoder.wait()
+                        encoder = None
+                if (not hard_fail
+                        and amplitude_to_dbfs(session.running_true_peak) > peak_limit):
+                    hard_fail = True
+                    info["hard_fail_at_s"] = round(session.duration_s, 3)
+                    if cancel:
+                        break
+            if short:
+                break
+    except BaseException:
+        if encoder is not None:
+            encoder.kill()
+            await encoder.wait()
+        if part is not None:
+            part.unlink(missing_ok=True)
+        raise
+
+    if hard_fail and cancel:
+        # Nothing left to read could undo the hard fail
+        tail.stop()
+        if render.returncode is None:
+            render.terminate()
+        if encoder is not None:
+            encoder.kill()
+            await encoder.wait()
+        if part is not None:
+            part.unlink(missing_ok=True)
+        info["cancelled"] = True
+        return _cancelled_result(wav, session, peak_limit)
+
+    await render.wait()
+    if encoder is not None:
+        encoder.stdin.close()
+        stderr = await encoder.stderr.read()
+        if await encoder.wait() == 0:
+            os.replace(part, mp3)
+            info["mp3"] = str(mp3)
+        else:
+            info["mp3_error"] = stderr.decode(errors="replace").strip() or "ffmpeg failed"
+    if part is not None:
+        part.unlink(missing_ok=True)
+    if render.returncode != 0:
+        return None
+
+    await asyncio.to_thread(session.finish)
+    return await asyncio.to_thread(check_session, wav, session, **gate_options)
+
+
+async def render_job(composition: str, out_dir: Path, cycles: int = 16, bpm: float = 120,
+                     renderer: Path = RENDERER, fifo: bool = False, mp3: bool = True,
+                     cancel: bool = True, block_ms: float = BLOCK_MS,
+                     gate_options: dict = None) -> dict:
+    """Render one composition while encoding and checking it; returns its result."""
+    gate_options = {"lufs_min": -18.0, "lufs_max": -14.0, "peak_limit": -1.0,
+                    "spectral_pct": 80.0, "spectral_hz": 320.0, **(gate_options or {})}
+    name = Path(composition).stem
+    wav = out_dir / f"{name}.wav"
+    mp3_path = out_dir / f"{name}.mp3" if mp3 else None
+    info = {"composition": str(composition), "wav": str(wav), "mp3": None}
+
+    # A previous render at the same path must not be mistaken for this one
+    wav.unlink(missing_ok=True)
+    target, copy = wav, None
+    if fifo:
+        target = wav.with_name(wav.name + ".fifo")
+        target.unlink(missing_ok=True)
+        os.mkfifo(target)
+        copy = open(wav, "wb")
+
+    started = time.monotonic()
+    log = collections.deque(maxlen=LOG_LINES)
+    render = None
+    tail = None
+    try:
+        render = await asyncio.create_subprocess_exec(
+            "node", str(renderer), str(composition), str(target), str(cycles), str(bpm),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        draining = asyncio.ensure_future(_collect(render.stdout, log))
+        exited = asyncio.ensure_future(render.wait())
+        exited.add_done_callback(
+            lambda _: info.setdefault("render_s", round(time.monotonic() - started, 3)))
+
+        tail = RenderTail(target, lambda: render.returncode is not None, copy)
+        result = await _consume(tail, wav, mp3_path, render, gate_options, block_ms, cancel, info)
+        await exited
+        await draining
+        if result is None:
+            message = f"render exited with code {render.returncode}" if render.returncode \
+                else "the renderer did not write a WAV"
+            result = _error_result(wav, message, log)
+    except Exception as e:
+        result = _error_result(wav, str(e), log)
+    finally:
+        if render is not None and render.returncode is None:
+            render.kill()
+            await render.wait()
+        if tail is not None:
+            tail.close()
+        if copy is not None:
+            copy.close()
+        if fifo:
+            target.unlink(missing_ok=True)
+        # A cancelled render's WAV is truncated; don't leave it to be mistaken
+        # for a finished one
+        if info.get("cancelled"):
+            wav.unlink(missing_ok=True)
+            info["wav"] = None
+            result["file"] = None
+
+    finished = time.monotonic()
+    info["total_s"] = round(finished - started, 3)
+    if "render_s" in info:
+        info["after_render_s"] = round(info["total_s"] - info["render_s"], 3)
+    result["pipeline"] = info
+    result["exit_code"] = exit_code(result)
+    return result
+
+
+async def run_pipeline(compositions: list, out_dir: Path, jobs: int = 2, emit=None,
+                       **options) -> list:
+    """
+    Run render_job() for each composition, at most `jobs` at a time, calling
+    `emit(result)` as each finishes. Returns the results in input order.
+    """
+    limit = asyncio.Semaphore(max(1, jobs))
+
+    async def run(composition):
+        async with limit:
+            result = await render_job(composition, out_dir, **options)
+        if emit is not None:
+            emit(result)
+        return result
+
+    return await asyncio.gather(*(run(composition) for composition in compositions))
+
+
+def format_line(result: dict) -> str:
+    """One human-readable line per job."""
+    icons = {"pass": "✅", "warn": "⚠️ ", "fail": "❌", "hard_fail": "🛑", "error": "💥"}
+    info = result["pipeline"]
+    line = f"{icons.get(result['overall'], '?')} {Path(info['composition']).stem}: "
+    line += result["overall"].upper()
+    if "error" in result:
+        line += f" ({result['error']})"
+    elif info.get("cancelled"):
+        line += f" (true peak over the limit at {info['hard_fail_at_s']:.1f}s; render cancelled)"
+    timing = f"render {info['render_s']:.1f}s + {info['after_render_s']:.1f}s" \
+        if "after_render_s" in info else f"{info['total_s']:.1f}s"
+    line += f" [{timing}]"
+    if info.get("mp3"):
+        line += f" → {info['mp3']}"
+    elif info.get("mp3_error"):
+        line += f" (MP3 failed: {info['mp3_error']})"
+    return line
+
+
+def main(argv: list = None, prog: str = None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Render, QA and MP3-encode compositions with overlapping stages")
+    parser.add_argument("compositions", nargs="+", help="Composition .js files")
+    parser.add_argument("--cycles", type=int, default=16)
+    parser.add_argument("--bpm", type=float, default=120)
+    parser.add_argument("--jobs", type=int, default=2, help="Renders run at once (default: 2)")
+    parser.add_argument("--out-dir", default=None, help="Output directory (default: $STRUDEL_TMP)")
+    parser.add_argument("--renderer", default=str(RENDERER),
+                        help="Node render script (<input> <output.wav> <cycles> <bpm>)")
+    parser.add_argument("--fifo", action="store_true",
+                        help="Read the renderer's output from a named pipe")
+    parser.add_argument("--no-mp3", action="store_true", help="Skip MP3 encoding")
+    parser.add_argument("--keep-going", action="store_true",
+                        help="Finish the render and MP3 after a hard fail")
+    parser.add_argument("--block-ms", type=float, default=BLOCK_MS,
+                        help="Read/QA block size in ms (default: 250)")
+    parser.add_argument("--lufs-min", type=float, default=-18.0)
+    parser.add_argument("--lufs-max", type=float, default=-14.0)
+    parser.add_argument("--peak-limit", type=float, default=-1.0)
+    parser.add_argument("--spectral-pct", type=float, default=80.0)
+    parser.add_argument("--spectral-hz", type=float, default=320.0)
+    parser.add_argument("--json", action="store_true", help="NDJSON results")
+    add_record_arguments(parser, naming=False)
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.block_ms <= 0:
+        parser.error("--block-ms must be positive")
+
+    out_dir = Path(args.out_dir) if args.out_dir else render_dir()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    mp3 = not args.no_mp3 and shutil.which("ffmpeg") is not None
+    if not args.no_mp3 and not mp3:
+        print("ffmpeg not available; skipping MP3 encoding", file=sys.stderr)
+
+    render_params = {"cycles": args.cycles, "bpm": args.bpm}
+    with recorder(args, "gate", args.renderer) as record:
+        def emit(result):
+            print(json.dumps(result) if args.json else format_line(result), flush=True)
+            # A cancelled render's checks are mostly skipped; nothing to compare
+            if not result["pipeline"].get("cancelled"):
+                record(result, render_params)
+
+        results = asyncio.run(run_pipeline(
+            args.compositions, out_dir, jobs=args.jobs, emit=emit,
+            cycles=args.cycles, bpm=args.bpm, renderer=Path(args.renderer), fifo=args.fifo,
+            mp3=mp3, cancel=not args.keep_going, block_ms=args.block_ms,
+            gate_options={
+                "lufs_min": args.lufs_min, "lufs_max": args.lufs_max,
+                "peak_limit": args.peak_limit, "spectral_pct": args.spectral_pct,
+                "spectral_hz": args.spectral_hz,
+            },
+        ))
+
+    worst = max((result["exit_code"] for result in results), default=0)
+    if args.json:
+        counts = collections.Counter(result["overall"] for result in results)
+        cancelled = sum(1 for result in results if result["pipeline"].get("cancelled"))
+        print(json.dumps({"summary": {"jobs": len(results), **counts, "cancelled": cancelled,
+                                      "worst_exit_code": worst}}), flush=True)
+    sys.exit(worst)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+quick.py — Approximate QA from a strided subsample plus the peak envelope.
+
+For interactive previews a go/no-go answer matters more than full
+resolution. scan() reads every sample only through the peak envelope
+pyramid (block min/max, in the file's native dtype for mapped WAVs) and
+runs the expensive kernels on a fixed number of evenly spread excerpts, so
+its cost barely grows with track length:
+
+  - Loudness: BS.1770 400 ms blocks at stratified positions, each
+    K-weighted after a 200 ms filter warm-up, gated as in the full meter.
+    Error bound: z standard errors of the mean gated block power (with the
+    finite-population correction, so it is 0 when every block is sampled).
+  - True peak: the sample peak is exact (from the envelope). The 4x
+    interpolator runs on the loudest envelope blocks first; any block not
+    scanned is bounded by the interpolator's gain (sum |h| of its worst
+    phase) times its neighbourhood peak. The bound is strict, and exact
+    once the unscanned blocks cannot reach the peak already found.
+  - Spectral floor: Welch segments at stratified positions; the share
+    below the cut-off is a ratio estimate with a z standard-error bound.
+  - Gaps: envelope blocks whose max is below the threshold are certainly
+    silent, blocks whose min is below it possibly so. Each run of certain
+    blocks is a gap with its duration bounded by the possible neighbours;
+    with blocks at most half --min-gap-ms no reportable gap is missed.
+
+Sampled bounds are approximate confidence intervals (z=2, about 95%);
+peak and gap bounds hold always. Callers compare each bound with their
+threshold and ask for a full pass when the threshold falls inside it.
+
+Usage:
+    from strudel_qa.audio_session import open_session
+    from strudel_qa.quick import scan
+
+    estimates = scan(open_session("render.wav"))
+    estimates["loudness"]["integrated_lufs"], estimates["loudness"]["error_lu"]
+
+Dependencies: numpy, scipy
+"""
+
+import numpy as np
+from scipy.signal import sosfilt
+
+from . import loudness
+from .audio_session import float_frames
+from .gaps import analysis_bounds
+
+LOUDNESS_BLOCKS = 48       # sampled 400 ms loudness blocks
+WARMUP_S = 0.2             # K-weighting settle time before each block
+SPECTRUM_SEGMENTS = 32     # sampled Welch segments
+NPERSEG = 8192
+PEAK_BLOCK_MS = 10.0       # envelope block size scanned for true peak
+PEAK_BLOCKS = 1024         # at most this many loud blocks are interpolated
+Z = 2.0
+
+# Largest gain of any true-peak interpolation phase: |output| <= this times
+# the largest input magnitude in its 12-tap window
+PEAK_GAIN = float(np.abs(loudness.TRUE_PEAK_PHASES).sum(axis=1).max())
+
+
+def stratified(population: int, count: int) -> np.ndarray:
+    """`count` evenly spread indices into range(population), one per stratum."""
+    count = min(count, population)
+    return ((np.arange(count) + 0.5) * population / count).astype(np.int64)
+
+
+def _bound_db(mean: float, se: float, z: float):
+    """Half-width in dB of mean ± z·se, or None when it reaches zero."""
+    if se == 0.0:
+        return 0.0
+    if mean - z * se <= 0.0:
+        return None
+    return float(max(10.0 * np.log10((mean + z * se) / mean),
+                     -10.0 * np.log10((mean - z * se) / mean)))
+
+
+def quick_loudness(session, blocks: int = LOUDNESS_BLOCKS, z: float = Z) -> dict:
+    """Integrated loudness from sampled momentary blocks, with an error bound in LU."""
+    sr = session.sr
+    hop = loudness.hop_samples(sr)
+    per_block = int(round(loudness.MOMENTARY_S / loudness.HOP_S))
+    population = session.num_samples // hop - per_block + 1
+    if population <= 0:
+        return {"integrated_lufs": float("-inf"), "error_lu": 0.0, "blocks": 0, "of": 0}
+
+    sos = loudness.k_weighting_sos(sr)
+    warmup = int(WARMUP_S * sr)
+    picks = stratified(population, blocks)
+    powers = np.empty(len(picks))
+    for i, index in enumerate(picks):
+        start = int(index) * hop
+        lo = max(0, start - warmup)
+        weighted = sosfilt(sos, float_frames(session, lo, start + per_block * hop), axis=0)
+        powers[i] = loudness.weighted_power(weighted[start - lo:]).sum() / (per_block * hop)
+
+    exhaustive = len(picks) == population
+    gated = loudness.gated_power(powers)
+    if len(gated) == 0:
+        value, error = float("-inf"), 0.0 if exhaustive else None
+    else:
+        mean = float(np.mean(gated))
+        value = float(loudness.power_to_lufs(mean))
+        if exhaustive:
+            error = 0.0
+        elif len(gated) < 2:
+            error = None
+        else:
+            fpc = np.sqrt(1.0 - len(picks) / population)
+            error = _bound_db(mean, float(np.std(gated, ddof=1) / np.sqrt(len(gated)) * fpc), z)
+    return {"integrated_lufs": value, "error_lu": error, "blocks": len(picks), "of": population}
+
+
+def _interpolated_peak(session, lo: int, hi: int) -> float:
+    """Exact 4x-interpolated peak of the meter outputs ending in [lo, hi)."""
+    taps = loudness.TRUE_PEAK_PHASES.shape[1]
+    n = session.num_samples
+    frames = float_frames(session, max(0, lo - (taps - 1)), min(n, hi))
+    # The meter starts from zero history and flushes zeros after the end
+    pad_front = (taps - 1) - (lo - max(0, lo - (taps - 1)))
+    pad_back = (taps - 1) if hi >= n else 0
+    frames = np.pad(frames, ((pad_front, pad_back), (0, 0)))
+    kernel = loudness.TRUE_PEAK_PHASES[:, ::-1].T
+    peak = 0.0
+    for ch in range(frames.shape[1]):
+        windows = np.lib.stride_tricks.sliding_window_view(frames[:, ch], taps)
+        peak = max(peak, float(np.max(np.abs(windows @ kernel))))
+    return peak
+
+
+def quick_true_peak(session, blocks: int = PEAK_BLOCKS) -> dict:
+    """
+    Sample peak (exact) and true peak bounds (linear amplitudes): `value`
+    is the largest interpolated peak found, `upper` bounds every block
+    left unscanned.
+    """
+    sample_peak = session.sample_peak
+    n = session.num_samples
+    if n == 0:
+        return {"sample_peak": 0.0, "value": 0.0, "upper": 0.0, "scanned": 0, "of": 0}
+
+    pyramid = session.envelope_pyramid
+    level = pyramid.level_for(max(1, int(PEAK_BLOCK_MS / 1000.0 * session.sr)))
+    if level is None:
+        value = _interpolated_peak(session, 0, n)
+        return {"sample_peak": sample_peak, "value": max(value, sample_peak),
+                "upper": max(value, sample_peak), "scanned": 1, "of": 1}
+
+    size = pyramid.block_sizes[level]
+    block_max = pyramid.maxs[level].astype(np.float64) / session.scale
+    # An output depends on the 11 samples before it too, so bound each block
+    # by its own and its predecessor's peak
+    reach = np.maximum(block_max, np.concatenate([[0.0], block_max[:-1]]))
+    order = np.argsort(-reach, kind="stable")
+
+    value, scanned = sample_peak, 0
+    for index in order[:blocks]:
+        if PEAK_GAIN * reach[index] <= value:
+            break
+        lo = int(index) * size
+        value = max(value, _interpolated_peak(session, lo, min(lo + size, n)))
+        scanned += 1
+    rest = order[scanned:]
+    upper = max(value, PEAK_GAIN * float(reach[rest[0]])) if len(rest) else value
+    return {"sample_peak": sample_peak, "value": value, "upper": upper,
+            "scanned": scanned, "of": len(order)}
+
+
+def quick_spectrum(session, freq_threshold: float, segments: int = SPECTRUM_SEGMENTS,
+                   z: float = Z) -> dict:
+    """
+    Share of energy at or below `freq_threshold` from sampled Welch
+    segments, with an error bound in percentage points, plus the sampled
+    (freqs, psd) for band breakdowns.
+    """
+    sr = session.sr
+    hop = NPERSEG // 2
+    freqs = np.fft.rfftfreq(NPERSEG, d=1.0 / sr)
+    population = (session.num_samples - NPERSEG) // hop + 1
+    if population <= 0:
+        from .spectrum import welch_psd
+        freqs, psd = welch_psd(float_frames(session, 0, session.num_samples).mean(axis=1), sr)
+        total = psd.sum()
+        pct = 100.0 * psd[freqs <= freq_threshold].sum() / total if total > 0 else 100.0
+        return {"pct_below": float(pct), "error_pct": 0.0, "freqs": freqs, "psd": psd,
+                "segments": 1, "of": 1}
+
+    picks = stratified(population, segments)
+    rows = np.stack([float_frames(session, int(i) * hop, int(i) * hop + NPERSEG).mean(axis=1)
+                     for i in picks])
+    spectra = np.fft.rfft(rows * np.hanning(NPERSEG), axis=1)
+    power = spectra.real ** 2 + spectra.imag ** 2
+    total = power.sum(axis=1)
+    low = power[:, freqs <= freq_threshold].sum(axis=1)
+
+    if total.sum() == 0:
+        pct, error = 100.0, 0.0
+    else:
+        ratio = low.sum() / total.sum()
+        pct = 100.0 * ratio
+        if len(picks) > 1:
+            fpc = np.sqrt(1.0 - len(picks) / population)
+            residual = low - ratio * total
+            se = np.sqrt(np.sum(residual ** 2) / (len(picks) - 1) / len(picks)) / total.mean() * fpc
+            error = float(100.0 * z * se)
+        else:
+            error = 0.0 if population == 1 else None
+    return {"pct_below": float(pct), "error_pct": error, "freqs": freqs,
+            "psd": power.mean(axis=0), "segments": len(picks), "of": population}
+
+
+def quick_gaps(session, threshold: float = 1e-5, skip_ms: float = 500.0,
+               min_gap_ms: float = 50.0) -> list:
+    """
+    Likely gaps from envelope block min/max, without sample refinement.
+    Returns [(start, min_end, max_start, max_end)] in samples: the run is
+    certainly silent over [start, min_end) and can extend at most over
+    [max_start, max_end).
+    """
+    sr = session.sr
+    start_idx, end_idx = analysis_bounds(session.num_samples, sr, skip_ms)
+    min_len = max(1, int((min_gap_ms / 1000.0) * sr))
+    pyramid = session.envelope_pyramid
+    level = pyramid.level_for(max(1, min_len // 2))
+    native = session.native_threshold(threshold)
+    if level is None or end_idx <= start_idx:
+        starts, ends, _ = pyramid.find_gaps(native, min_len, start_idx, end_idx, 1)
+        return [(int(a), int(b), int(a), int(b)) for a, b in zip(starts, ends)]
+
+    size = pyramid.block_sizes[level]
+    first, last = start_idx // size, -(-end_idx // size)
+    certain = pyramid.maxs[level][first:last] < native
+    possible = pyramid.mins[level][first:last] < native
+
+    edges = np.diff(certain.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    found = []
+    for a, b in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        # Blocks cut by the skip region count only for their analysed part
+        lo = max(start_idx, (first + int(a)) * size)
+        hi = min(end_idx, (first + int(b)) * size)
+        grow_lo = a > 0 and possible[a - 1]
+        grow_hi = b < len(possible) and possible[b]
+        max_lo = max(start_idx, lo - size) if grow_lo else lo
+        max_hi = min(end_idx, hi + size) if grow_hi else hi
+        if max_hi - max_lo >= min_len:
+            found.append((lo, hi, max_lo, max_hi))
+    return found
+
+
+def scan(session, threshold: float = 1e-5, skip_ms: float = 500.0, min_gap_ms: float = 50.0,
+         spectral_hz: float = 320.0, z: float = Z) -> dict:
+    """All quick estimates for one session (see the module docstring)."""
+    return {
+        "loudness": quick_loudness(session, z=z),
+        "true_peak": quick_true_peak(session),
+        "spectrum": quick_spectrum(session, spectral_hz, z=z),
+        "gaps": quick_gaps(session, threshold, skip_ms, min_gap_ms),
+    }
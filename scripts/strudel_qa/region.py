@@ -0,0 +1,226 @@
+"""
+region.py — High-resolution drill-down into one span of a render.
+
+After `strudel-qa analyze` flags something at 143.2 s, rerunning the whole
+file with a smaller --window pays for a full decode to look at a second of
+audio. analyze_region() decodes only the requested span plus MARGIN_S on
+each side:
+
+  - Files soundfile can open (WAV, FLAC, OGG) are seeked to the first
+    sample and read at their native rate; anything else (MP3) goes through
+    ffmpeg with input seeking (-ss/-t before -i), resampled to 44.1 kHz as
+    analyze does.
+  - The margin only gives the metrics context: the window grid starts at
+    the region start and the windows before it seed the spectral-flux
+    reference, cliff frames compare against the audio just before the
+    region, and gaps that cross the region bounds are followed into the
+    margin for their true edges ("open_start"/"open_end" when they run
+    past it as well).
+  - Windows default to 10 ms, cliffs are checked at 20 and 100 ms, and
+    gaps are reported at sample resolution (absolute sample indices) down
+    to 5 ms. Loudness and true peak in the summary cover the region only.
+
+Cost therefore follows the region length, not the track length.
+
+Usage:
+    strudel-qa analyze render.mp3 --from 142.5 --to 144 [--window 0.005] [--json]
+
+    from strudel_qa.region import analyze_region
+
+    report = analyze_region("render.wav", 142.5, 144.0)
+    report["gaps"][0]["start_sample"], report["windows"][0]["centroid_hz"]
+
+Dependencies: numpy, soundfile, ffmpeg (in PATH, for formats soundfile can't read)
+"""
+
+import os
+
+import numpy as np
+import soundfile as sf
+
+from . import loudness
+from .analyze import build_anomalies, merge_cliffs
+from .features import CliffTracker, WindowStatsTracker, read_audio_via_ffmpeg
+from .gaps import find_silent_runs
+from .instrument import NO_TIMINGS
+
+MARGIN_S = 0.5
+WINDOW_S = 0.01
+CLIFF_WINDOWS_MS = (20, 100)
+GAP_THRESHOLD = 1e-5
+MIN_GAP_MS = 5.0
+FFMPEG_SR = 44100
+
+# Decimals of reported times: 0.1 ms, enough to tell 10 ms windows apart
+TIME_DIGITS = 4
+
+
+def read_region(path: str, start_s: float, end_s: float = None, margin_s: float = MARGIN_S) -> dict:
+    """
+    Decode [start_s - margin_s, end_s + margin_s), clipped to the track,
+    without decoding anything before it. `end_s=None` reads to the end.
+
+    Returns {"frames": float32 (samples, channels), "sr", "first": absolute
+    index of frames[0], "total": track length in samples or None when not
+    known, "decoder": "soundfile" or "ffmpeg"}.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Audio file not found: {path}")
+    try:
+        f = sf.SoundFile(path)
+    except RuntimeError:
+        # Not a libsndfile format (soundfile's errors subclass RuntimeError)
+        f = None
+
+    if f is not None:
+        with f:
+            sr, total = f.samplerate, f.frames
+            first = min(total, max(0, int(round((start_s - margin_s) * sr))))
+            last = total if end_s is None else min(total, int(round((end_s + margin_s) * sr)))
+            f.seek(first)
+            frames = f.read(max(0, last - first), dtype="float32", always_2d=True)
+        return {"frames": frames, "sr": sr, "first": first, "total": total, "decoder": "soundfile"}
+
+    sr = FFMPEG_SR
+    first = max(0, int(round((start_s - margin_s) * sr)))
+    wanted = None if end_s is None else max(0, int(round((end_s + margin_s) * sr)) - first)
+    frames, sr = read_audio_via_ffmpeg(path, sr, first / sr, None if wanted is None else wanted / sr)
+    frames = frames[:wanted]
+    # ffmpeg doesn't report the length; a short read means the track ended
+    total = first + len(frames) if wanted is None or len(frames) < wanted else None
+    return {"frames": frames, "sr": sr, "first": first, "total": total, "decoder": "ffmpeg"}
+
+
+def analyze_region(path: str, start_s: float, end_s: float = None, window_sec: float = WINDOW_S,
+                   hop_sec: float = None, silence_threshold_db: float = -50,
+                   cliff_threshold_db: float = 20, cliff_windows_ms=CLIFF_WINDOWS_MS,
+                   gap_threshold: float = GAP_THRESHOLD, min_gap_ms: float = MIN_GAP_MS,
+                   margin_s: float = MARGIN_S, timings=NO_TIMINGS, on_window=None,
+                   spectrogram=None, spectrogram_size=(1200, 256)) -> dict:
+    """
+    The analyze() metric set over [start_s, end_s) at high resolution,
+    plus sample-accurate gaps (see the module docstring). Times are
+    absolute, in seconds from the track start. `on_window` and
+    `spectrogram` work as in analyze(); the spectrogram spans the region.
+    """
+    if start_s < 0:
+        raise ValueError("region start must not be negative")
+    if end_s is not None and end_s <= start_s:
+        raise ValueError("region end must be after its start")
+
+    with timings.stage("decode"):
+        decoded = read_region(path, start_s, end_s, margin_s)
+    frames, sr, first, total = decoded["frames"], decoded["sr"], decoded["first"], decoded["total"]
+    decoded_end = first + len(frames)
+    lo = int(round(start_s * sr))
+    hi = decoded_end if end_s is None else min(decoded_end, int(round(end_s * sr)))
+    if lo >= hi:
+        raise ValueError(f"region starts after the end of the track ({decoded_end / sr:.2f}s)")
+
+    window_samples = max(1, int(sr * window_sec))
+    hop_samples = max(1, int(sr * hop_sec)) if hop_sec else window_samples
+    mono = frames.mean(axis=1) if frames.shape[1] > 1 else frames[:, 0]
+
+    # K-weighted power over the whole decoded span (the filters settle in
+    # the margin) for window LUFS; the summary meter sees the region only
+    with timings.stage("loudness"):
+        kpower = loudness.LoudnessMeter(sr, frames.shape[1]).feed(frames)
+        meter = loudness.LoudnessMeter(sr, frames.shape[1])
+        meter.feed(frames[lo - first:hi - first])
+        stats = meter.result()
+
+    # Start the window grid a whole number of hops before the region
+    with timings.stage("window_stats"):
+        skip = (lo - first) % hop_samples
+        tracker = WindowStatsTracker(sr, window_samples, hop_samples, silence_threshold_db,
+                                     start=first + skip, digits=TIME_DIGITS)
+        tracker.feed(mono[skip:], kpower[skip:])
+        lead = (lo - first - skip) // hop_samples
+        windows = tracker.finish()[lead:lead + -(-(hi - lo) // hop_samples)]
+    total_silence_sec = 0.0
+    for i, window in enumerate(windows):
+        window["window"] = i
+        if window["silent"]:
+            # Count only the window's own hop, and none of it past the region
+            total_silence_sec += max(0.0, min(hop_samples / sr, window["time_end"] - window["time_start"],
+                                              hi / sr - window["time_start"]))
+        if on_window is not None:
+            on_window(window)
+
+    with timings.stage("cliffs"):
+        cliff_tracker = CliffTracker(sr, cliff_threshold_db, cliff_windows_ms, offset=first,
+                                     digits=TIME_DIGITS)
+        cliff_tracker.feed(mono)
+        cliffs = [cliff for cliff in merge_cliffs(cliff_tracker.finish())
+                  if lo / sr <= cliff["time"] < hi / sr]
+
+    with timings.stage("gaps"):
+        envelope = np.max(np.abs(frames), axis=1)
+        min_len = max(1, int((min_gap_ms / 1000.0) * sr))
+        starts, ends, peaks = find_silent_runs(envelope, gap_threshold, min_len)
+        gaps = []
+        for start, end, peak in zip(starts + first, ends + first, peaks):
+            if end <= lo or start >= hi:
+                continue
+            gaps.append({
+                "start_s": round(int(start) / sr, 6),
+                "end_s": round(int(end) / sr, 6),
+                "start_sample": int(start),
+                "end_sample": int(end),
+                "duration_ms": round((int(end - start) / sr) * 1000.0, 2),
+                "max_amplitude": float(peak),
+                # The run continues past the decoded margin
+                "open_start": bool(start == first and first > 0),
+                "open_end": bool(end == decoded_end and decoded_end != total),
+            })
+
+    anomalies = build_anomalies(windows, cliffs, len(cliff_windows_ms) > 1)
+    for gap in gaps:
+        anomalies.append({
+            "time": round(gap["start_s"], TIME_DIGITS),
+            "type": "null_drop",
+            "severity": "critical" if gap["duration_ms"] > 100 else "warning",
+            "detail": f"Gap of {gap['duration_ms']:g} ms "
+                      f"(samples {gap['start_sample']}-{gap['end_sample']})",
+        })
+    anomalies.sort(key=lambda a: a["time"])
+
+    if spectrogram is not None:
+        from .spectrogram import Spectrogram
+        with timings.stage("spectrogram"):
+            image = Spectrogram(sr, *spectrogram_size)
+            image.feed(mono[lo - first:hi - first])
+            image.save(spectrogram, [{**a, "time": a["time"] - lo / sr} for a in anomalies])
+
+    duration = (hi - lo) / sr
+    return {
+        "file": os.path.basename(path),
+        "duration_sec": None if total is None else round(total / sr, 2),
+        "sample_rate": sr,
+        "region": {
+            "from_s": round(lo / sr, 6),
+            "to_s": round(hi / sr, 6),
+            "start_sample": lo,
+            "end_sample": hi,
+            "margin_sec": margin_s,
+            "decoded_sec": round(len(frames) / sr, 3),
+            "decoder": decoded["decoder"],
+        },
+        "summary": {
+            "integrated_lufs": round(max(-100.0, stats["integrated_lufs"]), 1),
+            "lra": round(stats["lra"], 1),
+            "true_peak_dbfs": round(max(-100.0, stats["true_peak_dbfs"]), 1),
+            "sample_peak_dbfs": round(max(-100.0, stats["sample_peak_dbfs"]), 1),
+            "total_silence_sec": round(total_silence_sec, 3),
+            "silence_pct": round(100 * total_silence_sec / duration, 1) if duration > 0 else 0,
+            "cliff_count": len(cliffs),
+            "gap_count": len(gaps),
+            "anomaly_count": len(anomalies),
+            "window_count": len(windows),
+            "window_sec": window_sec,
+            "hop_sec": hop_samples / sr,
+        },
+        "anomalies": anomalies,
+        "gaps": gaps,
+        "windows": windows,
+    }
@@ -0,0 +1,86 @@
+"""
+reports.py — Output formats for analysis reports.
+
+The default --json report holds one dict per window, so every key is
+repeated per row, and indent=2 roughly doubles it. For long renders with
+fine windows, serializing and parsing that costs more than the analysis.
+The other formats carry the same data:
+
+  - columns: compact JSON where each table ("windows", "anomalies", and
+    "gaps" in region reports) is one list per field, e.g.
+    report["windows"]["rms_db"][i].
+  - ndjson: one record per line, {"record": "window", ...} for each window
+    (written as analyze() computes it, see its `on_window`), then
+    {"record": "anomaly", ...} for each anomaly, {"record": "gap", ...} for
+    each gap and a final {"record": "summary", ...} with everything else.
+  - npz: numpy's zip of arrays for numeric tools. Table fields are arrays
+    named "<table>/<field>" (numbers as float64/int64, flags as bool, text
+    as unicode), and "report" is the rest of the report as a JSON string.
+
+Usage:
+    from strudel_qa.reports import columnar_report, write_npz
+
+    print(json.dumps(columnar_report(report), separators=(",", ":")))
+    write_npz(report, "render.npz")
+    data = np.load("render.npz")
+    data["windows/rms_db"], json.loads(str(data["report"]))
+
+Dependencies: none (numpy for npz)
+"""
+
+import json
+
+FORMATS = ("json", "columns", "ndjson", "npz")
+
+# Report keys holding a list of same-keyed dicts
+TABLES = ("windows", "anomalies", "gaps")
+
+COMPACT = (",", ":")
+
+
+def columns(rows: list) -> dict:
+    """One list per field of same-keyed dict rows, in the first row's key order."""
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+
+def columnar_report(report: dict) -> dict:
+    """`report` with each table turned into columns."""
+    return {key: columns(value) if key in TABLES else value for key, value in report.items()}
+
+
+def window_record(window: dict) -> dict:
+    return {"record": "window", **window}
+
+
+def trailing_records(report: dict):
+    """The ndjson records after the windows: anomalies, gaps, then the summary."""
+    for table, record in (("anomalies", "anomaly"), ("gaps", "gap")):
+        for row in report.get(table, []):
+            yield {"record": record, **row}
+    yield {"record": "summary",
+           **{key: value for key, value in report.items() if key not in TABLES}}
+
+
+def write_ndjson(report: dict, out, windows: bool = True):
+    """All of `report` as ndjson; `windows=False` when they were already written."""
+    if windows:
+        for window in report.get("windows", []):
+            out.write(json.dumps(window_record(window), separators=COMPACT) + "\n")
+    for record in trailing_records(report):
+        out.write(json.dumps(record, separators=COMPACT) + "\n")
+
+
+def write_npz(report: dict, path):
+    """`report` as a compressed .npz (see the module docstring)."""
+    import numpy as np
+
+    arrays = {}
+    for table in TABLES:
+        for key, values in columns(report.get(table, [])).items():
+            arrays[f"{table}/{key}"] = np.asarray(values)
+    rest = {key: value for key, value in report.items() if key not in TABLES}
+    arrays["report"] = np.asarray(json.dumps(rest))
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
@@ -0,0 +1,100 @@
+"""
+schedule.py — Cost-ordered, fail-fast execution of QA checks.
+
+Checks are registered with an estimated cost and the session resource they
+read ("envelope", "spectrum", "loudness"). Checks sharing a resource run in
+one group, cheapest first, so the resource is computed once; groups run
+cheapest first, or concurrently on threads (the heavy work inside each
+group is numpy/scipy kernels and file reads, which release the GIL).
+
+With fail_fast, registered screens run first: cheap tests that can settle a
+check's failure from a cheaper resource than the check itself reads (e.g.
+a sample peak over the limit is already a true-peak hard fail). The first
+hard_fail stops the run; checks that never started are reported as
+SKIPPED. A hard fail already fixes the exit code, so nothing skipped could
+change the verdict.
+
+Usage:
+    from strudel_qa.schedule import run_checks
+
+    results = run_checks({
+        "null_drops": (lambda: check_null_drops(session), 1.0, "envelope"),
+        ...
+    }, fail_fast=True, threads=3)
+
+Dependencies: none (stdlib only)
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrument import NO_TIMINGS
+
+SKIPPED = {"status": "skipped"}
+
+
+def plan(checks: dict) -> list:
+    """
+    Group check names by resource, cheapest check first within a group and
+    cheapest group first. `checks` maps name -> (run, cost, resource).
+    """
+    groups = {}
+    for name, (_, cost, resource) in checks.items():
+        groups.setdefault(resource, []).append(name)
+    ordered = [sorted(names, key=lambda n: checks[n][1]) for names in groups.values()]
+    return sorted(ordered, key=lambda names: checks[names[0]][1])
+
+
+def run_checks(checks: dict, fail_fast: bool = False, threads: int = 1,
+               screens: dict = None, timings=NO_TIMINGS) -> dict:
+    """
+    Run `checks` (name -> (run, cost, resource), run() returning a result
+    dict) and return name -> result in the order of `checks`.
+
+    `screens` maps a check name to (screen, cost, resource); screen()
+    returns a result to report instead of running the check, or None. They
+    are only consulted with `fail_fast`. Each check is timed as a stage
+    under its own name; with threads, stages overlap and their peak memory
+    figures are shared.
+    """
+    results = {}
+    stop = threading.Event()
+
+    def record(name, result):
+        results[name] = result
+        if fail_fast and result.get("status") == "hard_fail":
+            stop.set()
+
+    if fail_fast:
+        for name, (screen, _, _) in sorted((screens or {}).items(), key=lambda s: s[1][1]):
+            with timings.stage(f"{name}_screen"):
+                result = screen()
+            if result is not None:
+                record(name, result)
+                if stop.is_set():
+                    break
+
+    def run_group(names):
+        for name in names:
+            if stop.is_set():
+                return
+            if name in results:
+                continue  # Settled by its screen
+            try:
+                with timings.stage(name):
+                    record(name, checks[name][0]())
+            except BaseException:
+                stop.set()  # Let the other groups wind down
+                raise
+
+    groups = plan(checks)
+    if threads > 1 and len(groups) > 1:
+        with ThreadPoolExecutor(max_workers=min(threads, len(groups))) as pool:
+            futures = [pool.submit(run_group, names) for names in groups]
+            for future in futures:
+                future.result()
+    else:
+        for names in groups:
+            run_group(names)
+
+    return {name: results.get(name, dict(SKIPPED)) for name in checks}
@@ -0,0 +1,166 @@
+"""
+seams.py — Cycle-aware analysis of composition seams in a render.
+
+Null drops, clicks and sudden level drops in a Strudel render mostly sit on
+seams: cycle boundaries, arrange() section changes and loopAt() splices.
+Their sample positions follow from the tempo the render used, so instead of
+scanning every sample at full resolution:
+
+  - seam_positions() computes each boundary sample the way
+    offline-render-v2.mjs times a render (cps = bpm / 240, so one cycle is
+    one 4-beat bar), marking arrange() section changes when the section
+    lengths (in cycles) are given;
+  - analyze_seams() reads a short window around each seam at sample
+    resolution and looks for silent runs, clicks (a second-difference spike
+    at the seam far above the rest of the window) and level drops across it.
+
+The rest of the track keeps the usual envelope-pyramid gap scan (see
+null_drops.py). Every finding is placed by cycle and beat, which maps
+straight back to the pattern code.
+
+Usage:
+    from strudel_qa.audio_session import open_session
+    from strudel_qa.seams import analyze_seams, seam_positions
+
+    session = open_session("render.wav")
+    seams = seam_positions(session.sr, bpm=120, cycles=16, sections=[4, 8, 4])
+    findings = analyze_seams(session, seams, threshold=1e-5)
+
+Dependencies: numpy
+"""
+
+import math
+
+import numpy as np
+
+from .audio_session import float_frames
+from .gaps import find_silent_runs
+
+BEATS_PER_CYCLE = 4
+CORE_MS = 1.0      # half-width around the seam searched for a click spike
+LEVEL_MS = 20.0    # RMS window on each side of the seam for level drops
+SILENCE_DB = -120.0
+
+
+def cycles_per_second(bpm: float) -> float:
+    """The renderer's cps for a bpm: one cycle is one bar of four beats."""
+    return bpm / 60.0 / BEATS_PER_CYCLE
+
+
+def seam_positions(sr: int, bpm: float, cycles: int, sections: list = None) -> list:
+    """
+    Internal seams of a `cycles`-long render: one per cycle boundary, as
+    {"sample", "cycle", "kind"} with kind "cycle" or "arrange". With
+    `sections` (arrange() section lengths in cycles), boundaries where a
+    section starts are "arrange" seams carrying its "section" index; the
+    arrangement repeats if it is shorter than the render, as arrange() does.
+    """
+    section_starts = {}
+    if sections:
+        period = sum(sections)
+        offsets = np.cumsum([0] + list(sections[:-1]))
+        for repeat in range(0, cycles, period):
+            for index, offset in enumerate(offsets):
+                section_starts[repeat + int(offset)] = index
+
+    seams = []
+    for cycle in range(1, cycles):
+        seam = {
+            "sample": int(round(cycle * BEATS_PER_CYCLE * 60.0 * sr / bpm)),
+            "cycle": cycle,
+            "kind": "cycle",
+        }
+        if cycle in section_starts:
+            seam["kind"] = "arrange"
+            seam["section"] = section_starts[cycle]
+        seams.append(seam)
+    return seams
+
+
+def position(sample: int, sr: int, bpm: float) -> dict:
+    """Cycle (0-based, as in Strudel), bar (1-based) and beat of a sample index."""
+    cycles = sample / sr * cycles_per_second(bpm)
+    # Snap float noise so a seam sample lands on beat 1 of its cycle
+    cycle = math.floor(cycles + 1e-9)
+    beat = 1.0 + max(0.0, cycles - cycle) * BEATS_PER_CYCLE
+    return {"cycle": cycle, "bar": cycle + 1, "beat": round(beat, 2)}
+
+
+def _db(ratio: float) -> float:
+    return max(SILENCE_DB, 20.0 * math.log10(ratio)) if ratio > 0 else SILENCE_DB
+
+
+def _rms(block: np.ndarray) -> float:
+    return float(np.sqrt(np.mean(block ** 2))) if block.size else 0.0
+
+
+def analyze_seam(frames: np.ndarray, at: int, sr: int, threshold: float = 1e-5,
+                 min_gap_ms: float = 5.0, click_db: float = 12.0,
+                 drop_db: float = 20.0) -> list:
+    """
+    Findings in one seam window. `frames` is float (samples, channels) and
+    `at` the seam's index into it. Returns [(kind, lo, hi, detail)] with
+    lo/hi window indices and detail the kind-specific fields.
+    """
+    found = []
+    envelope = np.abs(frames).max(axis=1)
+    min_len = max(1, int(min_gap_ms / 1000.0 * sr))
+    starts, ends, peaks = find_silent_runs(envelope, threshold, min_len)
+    for lo, hi, peak in zip(starts, ends, peaks):
+        found.append(("gap", int(lo), int(hi), {"max_amplitude": float(peak)}))
+
+    core = max(1, int(CORE_MS / 1000.0 * sr))
+    if len(frames) > 2:
+        # Second difference: large where the waveform kinks, small for any
+        # band-limited signal, so a step or spike at the seam stands out
+        curvature = np.abs(np.diff(frames, n=2, axis=0)).max(axis=1)
+        lo, hi = max(0, at - 1 - core), min(len(curvature), at - 1 + core + 1)
+        rest = np.concatenate([curvature[:lo], curvature[hi:]])
+        spike = float(curvature[lo:hi].max()) if hi > lo else 0.0
+        if spike >= threshold:
+            floor = float(np.percentile(rest, 99)) if rest.size else 0.0
+            ratio = _db(spike / floor) if floor > 0 else None
+            if ratio is None or ratio >= click_db:
+                offset = lo + int(np.argmax(curvature[lo:hi])) + 1
+                found.append(("click", offset, offset + 1, {
+                    "spike_db": None if ratio is None else round(ratio, 1),
+                    "amplitude": round(spike, 4),
+                }))
+
+    level = max(1, int(LEVEL_MS / 1000.0 * sr))
+    before = _db(_rms(frames[max(0, at - core - level):max(0, at - core)]))
+    after = _db(_rms(frames[at + core:at + core + level]))
+    # A gap starting at the seam already explains a drop into it
+    gapped = any(kind == "gap" and lo < at + core + level and hi > at
+                 for kind, lo, hi, _ in found)
+    if before - after >= drop_db and not gapped:
+        found.append(("level_drop", at, at + 1, {
+            "before_db": round(before, 1),
+            "after_db": round(after, 1),
+            "drop_db": round(before - after, 1),
+        }))
+    return found
+
+
+def analyze_seams(session, seams: list, threshold: float = 1e-5, seam_ms: float = 50.0,
+                  min_gap_ms: float = 5.0, click_db: float = 12.0,
+                  drop_db: float = 20.0) -> list:
+    """
+    Dense analysis of `seam_ms` on each side of every seam (see
+    analyze_seam) for an AudioSession or MappedSession. Returns one list of
+    findings per seam: {"kind", "start", "end", ...detail} in samples.
+    """
+    sr, n = session.sr, session.num_samples
+    reach = max(1, int(seam_ms / 1000.0 * sr))
+    results = []
+    for seam in seams:
+        at = seam["sample"]
+        lo, hi = max(0, at - reach), min(n, at + reach)
+        if hi <= lo:
+            results.append([])
+            continue
+        frames = float_frames(session, lo, hi)
+        found = analyze_seam(frames, at - lo, sr, threshold, min_gap_ms, click_db, drop_db)
+        results.append([{"kind": kind, "start": lo + a, "end": lo + b, **detail}
+                        for kind, a, b, detail in found])
+    return results
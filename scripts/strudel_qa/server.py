@@ -0,0 +1,215 @@
+"""
+server.py — Resident QA server on a local Unix socket.
+
+Starting a QA command costs an interpreter plus numpy/scipy/soundfile
+imports, which for short 4-16 cycle previews outweighs the analysis itself.
+This server imports the QA tools once, warms their FFT plans and cached
+windows on a synthetic render, and then forks a child per request. Children
+inherit the warm interpreter copy-on-write, so each request starts instantly
+and requests run concurrently without sharing mutable state.
+
+While it is running, `strudel-qa gate|analyze|gaps` (and the qa-gate.py,
+analyze-render.py and null-drop-detect.py wrappers) hand their whole
+invocation to it (see client.py), with identical output and exit codes.
+Stop it and they run locally again.
+
+Usage:
+    strudel-qa serve [--socket PATH] [--idle-timeout SECONDS]
+
+The socket is created with mode 0600 (its directory 0700 when the server
+creates it), since requests run with the server user's permissions. Each
+request runs with the client's STRUDEL_* variables (see client.py).
+
+Protocol: see client.py. Besides "cli", the server exposes run_qa_gate
+("qa_gate"), analyze ("analyze") and detect_null_drops ("null_drops")
+directly, returning their result dicts.
+
+Dependencies: numpy, scipy, soundfile (ffmpeg in PATH for analyze)
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from . import cache
+from .client import client_env, socket_path
+
+
+# Commands the server runs for "cli" requests, by the name clients send
+TOOLS = {
+    "gate": "strudel_qa.gate",
+    "analyze": "strudel_qa.analyze",
+    "gaps": "strudel_qa.null_drops",
+}
+
+
+def load_tools() -> dict:
+    return {tool: importlib.import_module(module) for tool, module in TOOLS.items()}
+
+
+def warm_up(tools: dict):
+    """Run each tool once on a short synthetic render to fill FFT and window caches."""
+    import numpy as np
+    import soundfile as sf
+
+    sr = 44100
+    rng = np.random.default_rng(0)
+    audio = 0.1 * rng.standard_normal((sr * 4, 2))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "warmup.wav")
+        sf.write(path, audio, sr, subtype="PCM_16")
+        for warm in (
+            lambda: tools["gate"].run_qa_gate(path),
+            lambda: tools["gaps"].detect_null_drops(path),
+            lambda: tools["analyze"].analyze(path),
+        ):
+            try:
+                warm()
+            except Exception:
+                pass  # e.g. no ffmpeg; that tool just starts cold
+
+
+def apply_env(env: dict):
+    """
+    Replace this (forked) process's STRUDEL_* variables with the client's,
+    so its cache, history and render paths are the caller's, and drop the
+    lookups cached from the server's environment.
+    """
+    for key in client_env():
+        del os.environ[key]
+    os.environ.update({key: str(value) for key, value in env.items()
+                       if key.startswith("STRUDEL_") and key != "STRUDEL_QA_SERVER"})
+    cache.tool_version.cache_clear()
+    history = sys.modules.get(f"{__package__}.history")
+    if history is not None:
+        history.renderer_version.cache_clear()
+
+
+def run_cli(tools: dict, tool: str, argv: list, cwd: str, prog: str = None) -> dict:
+    """Run a tool's main() as if from the command line, capturing its output."""
+    module = tools[tool]
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code = 0
+    os.chdir(cwd)
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            module.main(list(argv), prog=prog)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                exit_code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+    return {"ok": True, "stdout": stdout.getvalue(), "stderr": stderr.getvalue(),
+            "exit_code": exit_code}
+
+
+def handle(tools: dict, message: dict) -> dict:
+    op = message.get("op")
+    if op == "ping":
+        return {"ok": True, "pid": os.getpid()}
+    if "env" in message:
+        apply_env(message["env"])
+    if op == "cli":
+        if message.get("tool") not in TOOLS:
+            raise ValueError(f"unknown tool: {message.get('tool')}")
+        return run_cli(tools, message["tool"], message.get("argv", []), message.get("cwd", "/"),
+                       message.get("prog"))
+
+    functions = {
+        "qa_gate": tools["gate"].run_qa_gate,
+        "analyze": tools["analyze"].analyze,
+        "null_drops": tools["gaps"].detect_null_drops,
+    }
+    if op not in functions:
+        raise ValueError(f"unknown op: {op}")
+    if message.get("cwd"):
+        os.chdir(message["cwd"])
+    result = functions[op](*message.get("args", []), **message.get("kwargs", {}))
+    return {"ok": True, "result": result}
+
+
+class QAServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Forks a child per connection from the warm parent."""
+
+    # Seconds between reaps of finished children while no request arrives
+    timeout = 1.0
+
+    def __init__(self, path: str, tools: dict, idle_timeout: float = None):
+        self.tools = tools
+        self.idle_timeout = idle_timeout
+        self.last_request = time.monotonic()
+        super().__init__(path, QARequestHandler)
+
+    def process_request(self, request, client_address):
+        self.last_request = time.monotonic()
+        super().process_request(request, client_address)
+
+    @property
+    def idle(self) -> bool:
+        return (self.idle_timeout is not None
+                and time.monotonic() - self.last_request >= self.idle_timeout)
+
+
+class QARequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            reply = handle(self.server.tools, json.loads(line))
+        except Exception as e:
+            reply = {"ok": False, "error": str(e), "type": type(e).__name__}
+        self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+def serve(path: str, idle_timeout: float = None):
+    os.environ["STRUDEL_QA_SERVER"] = "0"  # Children run commands, never re-delegate
+    tools = load_tools()
+    warm_up(tools)
+
+    Path(path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)  # Stale socket from a server that didn't exit cleanly
+    # Only the server's user may connect: requests run the QA tools as it
+    # and can write wherever it can (--output, --spectrogram, --profile)
+    umask = os.umask(0o177)
+    try:
+        server = QAServer(path, tools, idle_timeout)
+    finally:
+        os.umask(umask)
+    os.chmod(path, 0o600)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"QA server listening on {path} (pid {os.getpid()})", file=sys.stderr)
+    try:
+        while not server.idle:
+            # Returns after one request or `timeout` seconds (reaping finished
+            # children then); reap here too so a busy server collects them
+            server.handle_request()
+            server.service_actions()
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+def main(argv: list = None, prog: str = None):
+    parser = argparse.ArgumentParser(prog=prog, description="Resident QA server on a Unix socket.")
+    parser.add_argument("--socket", default=None,
+                        help="Socket path (default: $STRUDEL_QA_SOCKET or $STRUDEL_TMP/qa.sock)")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Exit after this many seconds without a request")
+    args = parser.parse_args(argv)
+    serve(args.socket or socket_path(), args.idle_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+shards.py — Process-parallel analysis of one long render in time shards.
+
+A render is cut into fixed-length shards (about 45 s, on a grid aligned to
+the 100 ms loudness hop and the envelope pyramid's coarsest block) and
+each shard is analysed by a worker process. Samples are never pickled:
+memory-mapped WAVs are mapped again by path in each worker (the page cache
+is shared), and decoded audio is copied once into
+multiprocessing.shared_memory and attached by name.
+
+Every unit of work (pyramid block, loudness hop, Welch segment, analysis
+window, cliff frame) belongs to the shard its first sample falls in, and a
+worker reads past its shard's edges for whatever context a unit needs, so
+merging is concatenation in shard order:
+
+  - Gaps: pyramid levels concatenate exactly, and the usual scan over the
+    joined pyramid finds gaps that cross shards.
+  - Loudness: hop energies concatenate and are gated once over the whole
+    track, so 400 ms and 3 s gating blocks straddling shards are formed as
+    usual. Each worker K-weights from WARMUP_S before its shard so the
+    filter state settles (its error decays below double precision), and
+    true peak starts from the interpolator's 11-sample history.
+  - Spectrum: Welch segment sums add up; the last shard keeps the
+    zero-padded tail.
+  - Windows and cliffs (analyze): each worker also transforms the window
+    or frame before its first one, for spectral flux and cliff drops.
+
+The grid depends only on the track and sample rate, never on the number of
+workers, so any --shard-jobs value does the same arithmetic. Reports match
+single-process ones; only the order of some float additions differs, far
+below the reported precision.
+
+Usage:
+    from strudel_qa.audio_session import open_session
+    from strudel_qa.shards import open_sharded
+
+    with open_sharded(open_session("concert.wav"), jobs=32) as session:
+        session.loudness, session.power_spectrum, session.gaps(1e-5, 500, 50)
+
+Dependencies: numpy, scipy
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import cached_property
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy.signal import sosfilt
+
+from . import loudness
+from .audio_session import AudioSession, MappedSession, _GapQueries
+from .features import CliffTracker, WindowStatsTracker, cliff_grid, spectral_rows
+from .gaps import EnvelopePyramid
+from .spectrum import WelchAccumulator
+from .wavmap import MappedWav, PeakEnvelope
+
+SHARD_S = 45.0
+WARMUP_S = 1.0
+
+
+def shard_bounds(num_samples: int, sr: int, shard_s: float = SHARD_S) -> list:
+    """
+    [(lo, hi)] covering the track. Shards start on multiples of the loudness
+    hop and the coarsest pyramid block; a short remainder joins the last one.
+    """
+    unit = math.lcm(loudness.hop_samples(sr), EnvelopePyramid.coarsest_block(sr))
+    size = unit * max(1, round(shard_s * sr / unit))
+    bounds = [(lo, min(lo + size, num_samples)) for lo in range(0, num_samples, size)]
+    if len(bounds) > 1 and bounds[-1][1] - bounds[-1][0] < size // 2:
+        bounds.pop()
+        bounds[-1] = (bounds[-1][0], num_samples)
+    return bounds
+
+
+class SharedFrames:
+    """A (samples, channels) array copied into shared memory for shard workers."""
+
+    def __init__(self, frames: np.ndarray, scale: float = 1.0):
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, frames.nbytes))
+        self.frames = np.ndarray(frames.shape, frames.dtype, buffer=self.shm.buf)
+        self.frames[...] = frames
+        self.source = ("shm", self.shm.name, frames.shape, frames.dtype.str, scale)
+
+    def close(self):
+        del self.frames
+        self.shm.close()
+        self.shm.unlink()
+
+
+# ── Worker side ───────────────────────────────────────────────────────
+
+# source -> (frames, scale, handle); each worker maps a source once
+_attached = {}
+
+
+def _attach(source: tuple) -> tuple:
+    """(frames, scale) for ("wav", path) or ("shm", name, shape, dtype, scale)."""
+    if source not in _attached:
+        if source[0] == "wav":
+            wav = MappedWav.from_file(source[1])
+            _attached[source] = (wav.frames, wav.scale, wav)
+        else:
+            _, name, shape, dtype, scale = source
+            shm = shared_memory.SharedMemory(name=name)
+            _attached[source] = (np.ndarray(shape, np.dtype(dtype), buffer=shm.buf), scale, shm)
+    frames, scale, _ = _attached[source]
+    return frames, scale
+
+
+def _float(frames: np.ndarray, scale: float, lo: int, hi: int) -> np.ndarray:
+    block = frames[lo:hi].astype(np.float64)
+    if scale != 1.0:
+        block *= 1.0 / scale
+    return block
+
+
+def _mono(block: np.ndarray) -> np.ndarray:
+    return np.mean(block, axis=1) if block.shape[1] > 1 else block[:, 0]
+
+
+def _loudness_parts(frames, scale, lo, hi, sr, weighted_from, power):
+    """
+    Hop energies, true peak and sample peak owned by [lo, hi). `power` is
+    the K-weighted power from sample `weighted_from` (<= lo) onwards.
+    """
+    hop = loudness.hop_samples(sr)
+    own_power = power[lo - weighted_from:hi - weighted_from]
+    full = len(own_power) // hop * hop
+    hop_energy = own_power[:full].reshape(-1, hop).sum(axis=1)
+
+    own = _float(frames, scale, lo, hi)
+    meter = loudness.TruePeakMeter(frames.shape[1])
+    history = _float(frames, scale, max(0, lo - (meter.taps - 1)), lo)
+    meter.history[len(meter.history) - len(history):] = history
+    meter.feed(own)
+    true_peak = meter.finish() if hi == len(frames) else meter.peak
+    sample_peak = float(np.max(np.abs(own))) if len(own) else 0.0
+    return hop_energy, true_peak, sample_peak
+
+
+def _k_weighted_power(frames, scale, lo, hi, sr) -> tuple:
+    """(first sample, K-weighted power) over [lo - WARMUP_S, hi)."""
+    start = max(0, lo - int(WARMUP_S * sr))
+    weighted = sosfilt(loudness.k_weighting_sos(sr), _float(frames, scale, start, hi), axis=0)
+    return start, loudness.weighted_power(weighted)
+
+
+def envelope_shard(source: tuple, lo: int, hi: int, sr: int) -> tuple:
+    frames, _ = _attach(source)
+    pyramid = EnvelopePyramid(PeakEnvelope(frames[lo:hi]), sr)
+    return pyramid.block_sizes, pyramid.mins, pyramid.maxs
+
+
+def loudness_shard(source: tuple, lo: int, hi: int, sr: int) -> tuple:
+    frames, scale = _attach(source)
+    start, power = _k_weighted_power(frames, scale, lo, hi, sr)
+    return _loudness_parts(frames, scale, lo, hi, sr, start, power)
+
+
+def spectrum_shard(source: tuple, lo: int, hi: int, sr: int) -> WelchAccumulator:
+    frames, scale = _attach(source)
+    n = len(frames)
+    welch = WelchAccumulator(sr)
+    hop, nperseg = welch.hop, welch.nperseg
+    total = (n - nperseg) // hop + 1 if n >= nperseg else 0
+    first = min(-(-lo // hop), total)
+    if hi == n:
+        # The last shard also buffers the tail finish() zero-pads
+        end = n
+    else:
+        owned = min(-(-hi // hop), total) - first
+        end = (first + owned - 1) * hop + nperseg if owned > 0 else first * hop
+    if end > first * hop:
+        welch.feed(_mono(_float(frames, scale, first * hop, end)))
+    return welch
+
+
+def analysis_shard(source: tuple, lo: int, hi: int, sr: int, window_samples: int,
+                   hop_samples: int, silence_threshold_db: float, cliff_threshold_db: float,
+                   cliff_windows_ms: tuple) -> dict:
+    """Loudness parts, windows and cliffs owned by [lo, hi) for analyze()."""
+    frames, scale = _attach(source)
+    n = len(frames)
+    last = hi == n
+
+    span = max(window_samples, WindowStatsTracker.MIN_SAMPLES)
+    first_window = -(-lo // hop_samples)
+    window_lo = first_window * hop_samples
+    window_hi = n if last else min(n, (-(-hi // hop_samples) - 1) * hop_samples + span)
+
+    start, power = _k_weighted_power(frames, scale, lo, max(hi, window_hi), sr)
+    hop_energy, true_peak, sample_peak = _loudness_parts(frames, scale, lo, hi, sr, start, power)
+
+    # analyze() downmixes in the decoded dtype; keep that arithmetic
+    def mono(a, b):
+        return _mono(frames[a:b])
+
+    prev_norm = None
+    if first_window > 0:
+        prev = np.zeros(window_samples, dtype=frames.dtype)
+        row = mono(window_lo - hop_samples, min(n, window_lo - hop_samples + window_samples))
+        prev[:len(row)] = row
+        _, prev_norm = spectral_rows(prev[np.newaxis, :], sr)
+    tracker = WindowStatsTracker(sr, window_samples, hop_samples, silence_threshold_db,
+                                 start=window_lo, prev_norm=prev_norm)
+    if window_hi > window_lo:
+        tracker.feed(mono(window_lo, window_hi), power[window_lo - start:window_hi - start])
+    windows = tracker.finish() if last else tracker.windows
+
+    # One tracker per window size, each starting a frame before its first
+    # owned one; all of them use the track's common block grid
+    cliffs = {}
+    for window_ms, (window, hop) in zip(cliff_windows_ms, cliff_grid(sr, cliff_windows_ms)[0]):
+        first = max(0, -(-lo // hop) - 1)
+        end = n if last else min(n, (-(-hi // hop) - 1) * hop + window + 1)
+        cliff_tracker = CliffTracker(sr, cliff_threshold_db, cliff_windows_ms, offset=first * hop)
+        if end > first * hop:
+            cliff_tracker.feed(mono(first * hop, end))
+        cliffs[window_ms] = cliff_tracker.finish()[window_ms]
+
+    return {
+        "hop_energy": hop_energy,
+        "true_peak": true_peak,
+        "sample_peak": sample_peak,
+        "windows": windows,
+        "total_silence_sec": tracker.total_silence_sec,
+        "cliffs": cliffs,
+    }
+
+
+# ── Parent side ───────────────────────────────────────────────────────
+
+class ShardedSession(_GapQueries):
+    """
+    An AudioSession or MappedSession whose envelope pyramid, loudness and
+    power spectrum are computed shard by shard on a process pool.
+    """
+
+    def __init__(self, session, source: tuple, pool: ProcessPoolExecutor, bounds: list):
+        self.session = session
+        self.source = source
+        self.pool = pool
+        self.bounds = bounds
+        self.sr = session.sr
+        self.path = session.path
+
+    @property
+    def channels(self) -> int:
+        return self.session.channels
+
+    @property
+    def num_samples(self) -> int:
+        return self.session.num_samples
+
+    @property
+    def duration_s(self) -> float:
+        return self.session.duration_s
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self.session.frames
+
+    @property
+    def envelope(self):
+        return self.session.envelope
+
+    @property
+    def scale(self) -> float:
+        return self.session.scale
+
+    def native_threshold(self, threshold: float):
+        return self.session.native_threshold(threshold)
+
+    def _map(self, task, *args) -> list:
+        futures = [self.pool.submit(task, self.source, lo, hi, self.sr, *args)
+                   for lo, hi in self.bounds]
+        return [future.result() for future in futures]
+
+    @cached_property
+    def envelope_pyramid(self) -> EnvelopePyramid:
+        return EnvelopePyramid.from_parts(self.envelope, self.sr, self._map(envelope_shard))
+
+    @cached_property
+    def loudness(self) -> dict:
+        parts = self._map(loudness_shard)
+        return loudness.summarize(np.concatenate([p[0] for p in parts]),
+                                  loudness.hop_samples(self.sr),
+                                  max(p[1] for p in parts), max(p[2] for p in parts))
+
+    @cached_property
+    def power_spectrum(self) -> tuple:
+        parts = self._map(spectrum_shard)
+        welch = parts[0]
+        for later in parts[1:]:
+            welch.add(later)
+        return welch.finish()
+
+
+@contextmanager
+def shard_pool(frames: np.ndarray, jobs: int, path: str = None, scale: float = 1.0):
+    """
+    (source, pool) for workers reading `frames`: by mapping `path` when
+    the frames are that WAV's memory map, otherwise via shared memory.
+    """
+    shared = None
+    if path is not None:
+        source = ("wav", path)
+    else:
+        shared = SharedFrames(frames, scale)
+        source = shared.source
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            yield source, pool
+    finally:
+        if shared is not None:
+            shared.close()
+
+
+@contextmanager
+def open_sharded(session, jobs: int, shard_s: float = SHARD_S):
+    """
+    Yield a ShardedSession over `session` using `jobs` worker processes, or
+    `session` itself when it is a single shard long or cannot be sharded.
+    """
+    bounds = shard_bounds(session.num_samples, session.sr, shard_s)
+    if jobs <= 1 or len(bounds) < 2 or not isinstance(session, (AudioSession, MappedSession)):
+        yield session
+        return
+    path = session.path if isinstance(session, MappedSession) else None
+    with shard_pool(session.frames, min(jobs, len(bounds)), path, session.scale) as (source, pool):
+        yield ShardedSession(session, source, pool, bounds)
+
+
+def analyze_sharded(frames: np.ndarray, sr: int, jobs: int, window_samples: int,
+                    hop_samples: int, silence_threshold_db: float, cliff_threshold_db: float,
+                    cliff_windows_ms: tuple, shard_s: float = SHARD_S):
+    """
+    analyze()'s measurements of decoded `frames` on `jobs` processes:
+    (loudness stats, windows, total silence in s, {window_ms: cliffs}), or
+    None when the track is too short to shard.
+    """
+    bounds = shard_bounds(len(frames), sr, shard_s)
+    shortest = min(hi - lo for lo, hi in bounds)
+    if jobs <= 1 or len(bounds) < 2 or 2 * max(window_samples, hop_samples) > shortest:
+        return None
+
+    with shard_pool(frames, min(jobs, len(bounds))) as (source, pool):
+        futures = [pool.submit(analysis_shard, source, lo, hi, sr, window_samples, hop_samples,
+                               silence_threshold_db, cliff_threshold_db, cliff_windows_ms)
+                   for lo, hi in bounds]
+        parts = [future.result() for future in futures]
+
+    stats = loudness.summarize(np.concatenate([p["hop_energy"] for p in parts]),
+                               loudness.hop_samples(sr),
+                               max(p["true_peak"] for p in parts),
+                               max(p["sample_peak"] for p in parts))
+    windows = [w for p in parts for w in p["windows"]]
+    total_silence_sec = sum(p["total_silence_sec"] for p in parts)
+    cliffs = {window_ms: [c for p in parts for c in p["cliffs"][window_ms]]
+              for window_ms in cliff_windows_ms}
+    return stats, windows, total_silence_sec, cliffs
@@ -0,0 +1,202 @@
+"""
+spectrogram.py — Spectrogram PNGs with numpy and zlib only.
+
+matplotlib would add seconds of import time to a tool agents run after
+every render, so the image is built directly:
+
+  - Spectrogram.feed() takes mono blocks and computes a Hann-windowed STFT
+    as they arrive, folding each frame's power spectrum into log-spaced
+    frequency rows (from FMIN_HZ to Nyquist).
+  - Frames are averaged into at most 2 x width columns. When those fill
+    up, neighbouring columns are merged pairwise and each column covers
+    twice as many frames, so memory stays at a few image widths of rows
+    for a track of any length and the duration need not be known up front.
+  - finish() resamples to the requested width, maps dB (relative to the
+    loudest cell, over DYNAMIC_RANGE_DB) through a precomputed 256-entry
+    colour lookup table, and write_png() deflates the rows into a PNG.
+  - Anomalies are drawn as vertical markers at their timestamps: a solid
+    tick in a band above the spectrogram and a translucent line through
+    it, red for critical and yellow for warnings.
+
+Usage:
+    from strudel_qa.spectrogram import Spectrogram
+
+    image = Spectrogram(44100, width=1200, height=256)
+    for block in mono_blocks:
+        image.feed(block)
+    image.save("render.png", anomalies=report["anomalies"])
+
+Dependencies: numpy
+"""
+
+import struct
+import zlib
+
+import numpy as np
+
+NFFT = 2048
+HOP = 512
+BATCH_FRAMES = 256      # STFT frames transformed at once, bounding scratch memory
+FMIN_HZ = 20.0
+DYNAMIC_RANGE_DB = 80.0
+MARKER_PX = 10          # band above the spectrogram holding anomaly ticks
+MARKER_ALPHA = 0.45     # opacity of marker lines over the spectrogram
+
+# Anchor colours of a magma-like ramp (quiet to loud), interpolated into
+# the lookup table once at import
+_ANCHORS = np.array([
+    (0, 0, 4), (28, 16, 68), (79, 18, 123), (129, 37, 129), (181, 54, 122),
+    (229, 80, 100), (251, 135, 97), (254, 194, 135), (252, 253, 191),
+], dtype=np.float64)
+COLORMAP = np.stack([
+    np.interp(np.linspace(0.0, 1.0, 256), np.linspace(0.0, 1.0, len(_ANCHORS)), _ANCHORS[:, c])
+    for c in range(3)
+], axis=1).round().astype(np.uint8)
+
+MARKER_COLORS = {
+    "critical": np.array([255, 48, 48], dtype=np.uint8),
+    "warning": np.array([255, 214, 0], dtype=np.uint8),
+}
+
+
+def row_edges(sr: int, height: int, nfft: int = NFFT, fmin: float = FMIN_HZ) -> tuple:
+    """
+    (lo, hi) FFT bin ranges of `height` log-spaced rows, lowest first. Each
+    row has at least one bin, so low rows narrower than a bin repeat it.
+    """
+    bins = nfft // 2 + 1
+    hz_per_bin = sr / nfft
+    edges = np.geomspace(fmin, sr / 2.0, height + 1) / hz_per_bin
+    lo = np.clip(np.floor(edges[:-1]).astype(np.int64), 0, bins - 1)
+    hi = np.clip(np.ceil(edges[1:]).astype(np.int64), lo + 1, bins)
+    return lo, hi
+
+
+class Spectrogram:
+    """Streaming log-frequency spectrogram with bounded memory (see the module docstring)."""
+
+    def __init__(self, sr: int, width: int = 1200, height: int = 256,
+                 nfft: int = NFFT, hop: int = HOP):
+        self.sr = sr
+        self.width = width
+        self.height = height
+        self.nfft = nfft
+        self.hop = hop
+        self.window = np.hanning(nfft)
+        self.lo, self.hi = row_edges(sr, height, nfft)
+        self.buffer = np.zeros(0)
+        self.samples = 0
+        # Column sums of row power and the frames in each
+        self.sums = np.zeros((2 * width, height))
+        self.counts = np.zeros(2 * width, dtype=np.int64)
+        self.columns = 0
+        self.span = 1
+        self.pending = np.zeros((0, height))
+
+    def feed(self, mono: np.ndarray):
+        self.samples += len(mono)
+        data = np.concatenate([self.buffer, np.asarray(mono, dtype=np.float64)])
+        ready = (len(data) - self.nfft) // self.hop + 1 if len(data) >= self.nfft else 0
+        if ready:
+            frames = np.lib.stride_tricks.sliding_window_view(data, self.nfft)[::self.hop][:ready]
+            # A whole decoded track arrives as one block; transform it in batches
+            for lo in range(0, ready, BATCH_FRAMES):
+                self._add(self._rows(frames[lo:lo + BATCH_FRAMES]))
+        self.buffer = data[ready * self.hop:].copy()
+
+    def _rows(self, frames: np.ndarray) -> np.ndarray:
+        spectra = np.fft.rfft(frames * self.window, axis=1)
+        power = spectra.real ** 2 + spectra.imag ** 2
+        # Mean power over each row's bins, from a running sum along frequency
+        cumulative = np.concatenate([np.zeros((len(power), 1)), np.cumsum(power, axis=1)], axis=1)
+        return (cumulative[:, self.hi] - cumulative[:, self.lo]) / (self.hi - self.lo)
+
+    def _add(self, rows: np.ndarray):
+        rows = np.concatenate([self.pending, rows])
+        while len(rows) >= self.span:
+            if self.columns == len(self.counts):
+                self._halve()
+            take = min(len(rows) // self.span, len(self.counts) - self.columns)
+            grouped = rows[:take * self.span].reshape(take, self.span, self.height)
+            self.sums[self.columns:self.columns + take] = grouped.sum(axis=1)
+            self.counts[self.columns:self.columns + take] = self.span
+            self.columns += take
+            rows = rows[take * self.span:]
+        self.pending = rows.copy()
+
+    def _halve(self):
+        """Merge neighbouring columns so each covers twice the frames."""
+        half = self.columns // 2
+        self.sums[:half] = self.sums[0:2 * half:2] + self.sums[1:2 * half:2]
+        self.counts[:half] = self.counts[0:2 * half:2] + self.counts[1:2 * half:2]
+        self.sums[half:] = 0.0
+        self.counts[half:] = 0
+        self.columns = half
+        self.span *= 2
+
+    def finish(self) -> np.ndarray:
+        """RGB image (height, width, 3) of everything fed, low frequencies at the bottom."""
+        # Samples no frame has covered yet, zero-padded into one last frame
+        started = self.columns or len(self.pending)
+        uncovered = len(self.buffer) - (self.nfft - self.hop) if started else len(self.buffer)
+        if uncovered > 0 or not started:
+            frame = np.zeros((1, self.nfft))
+            frame[0, :len(self.buffer)] = self.buffer[:self.nfft]
+            self.pending = np.concatenate([self.pending, self._rows(frame)])
+            self.buffer = self.buffer[:0]
+        sums, counts = self.sums[:self.columns], self.counts[:self.columns]
+        if len(self.pending):
+            sums = np.concatenate([sums, self.pending.sum(axis=0, keepdims=True)])
+            counts = np.concatenate([counts, [len(self.pending)]])
+
+        # Resample to the output width: average when there are more
+        # columns than pixels, repeat when there are fewer
+        if len(counts) > self.width:
+            starts = np.linspace(0, len(counts), self.width + 1).astype(np.int64)[:-1]
+            sums = np.add.reduceat(sums, starts, axis=0)
+            counts = np.add.reduceat(counts, starts)
+        power = sums / counts[:, np.newaxis]
+        if len(power) < self.width:
+            power = power[np.arange(self.width) * len(power) // self.width]
+
+        db = 10.0 * np.log10(np.maximum(power, 1e-30))
+        top = db.max()
+        level = np.clip((db - (top - DYNAMIC_RANGE_DB)) / DYNAMIC_RANGE_DB, 0.0, 1.0)
+        return COLORMAP[(level.T[::-1] * 255).round().astype(np.uint8)]
+
+    @property
+    def duration_s(self) -> float:
+        return self.samples / self.sr
+
+    def save(self, path, anomalies: list = ()):
+        """finish() with a marker band and anomaly markers, written as a PNG."""
+        image = np.concatenate([
+            np.zeros((MARKER_PX, self.width, 3), dtype=np.uint8), self.finish()])
+        if self.duration_s > 0:
+            # Warnings first, so critical markers win where they overlap
+            for anomaly in sorted(anomalies, key=lambda a: a.get("severity") == "critical"):
+                color = MARKER_COLORS.get(anomaly.get("severity"), MARKER_COLORS["warning"])
+                x = min(self.width - 1, int(anomaly["time"] / self.duration_s * self.width))
+                image[:MARKER_PX, x] = color
+                line = image[MARKER_PX:, x].astype(np.float64)
+                image[MARKER_PX:, x] = (line * (1.0 - MARKER_ALPHA)
+                                        + color * MARKER_ALPHA).round().astype(np.uint8)
+        write_png(path, image)
+
+
+def write_png(path, rgb: np.ndarray):
+    """Write an (height, width, 3) uint8 array as an 8-bit RGB PNG."""
+    height, width, _ = rgb.shape
+    # Filter type 0 (none) before each scanline
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8),
+                          np.ascontiguousarray(rgb).reshape(height, width * 3)], axis=1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
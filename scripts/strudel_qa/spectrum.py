@@ -0,0 +1,122 @@
+"""
+spectrum.py — Bounded-memory power spectrum estimates for the QA checks.
+
+welch_psd() averages Hann-windowed power-of-two segments (50% overlap),
+transforming a batch of segments at a time and accumulating into a single
+spectrum. WelchAccumulator is the same estimate fed block by block.
+Memory is bounded by the batch, and runtime is linear in track length
+regardless of how its sample count factors — unlike one rfft over the
+whole track.
+
+band_energy() splits the resulting spectrum into the named bands used by
+the spectral-floor diagnosis.
+
+Usage:
+    from strudel_qa.spectrum import band_energy, welch_psd
+
+    freqs, psd = welch_psd(mono, sr)
+    bands = band_energy(freqs, psd)
+
+Dependencies: numpy
+"""
+
+import numpy as np
+
+
+# (name, low Hz, high Hz) — high of the last band is open-ended
+BANDS = (
+    ("sub_bass", 0.0, 60.0),
+    ("bass", 60.0, 250.0),
+    ("low_mid", 250.0, 500.0),
+    ("mid", 500.0, 2000.0),
+    ("high_mid", 2000.0, 4000.0),
+    ("presence", 4000.0, 6000.0),
+    ("brilliance", 6000.0, float("inf")),
+)
+
+
+class WelchAccumulator:
+    """
+    Incremental Welch spectrum: feed mono blocks, then finish().
+
+    Keeps at most one segment of carry-over samples plus the running sum,
+    so memory is independent of how much audio is fed.
+    """
+
+    def __init__(self, sr: int, nperseg: int = 8192, batch_segments: int = 64):
+        self.sr = sr
+        self.nperseg = nperseg
+        self.hop = nperseg // 2
+        self.batch_segments = batch_segments
+        self.window = np.hanning(nperseg)
+        self.freqs = np.fft.rfftfreq(nperseg, d=1.0 / sr)
+        self.psd = np.zeros(len(self.freqs))
+        self.count = 0
+        self.seen = 0
+        self.buffer = np.zeros(0)
+
+    def _transform(self, segments: np.ndarray):
+        for lo in range(0, len(segments), self.batch_segments):
+            spectra = np.fft.rfft(segments[lo:lo + self.batch_segments] * self.window, axis=1)
+            self.psd += np.sum(spectra.real ** 2 + spectra.imag ** 2, axis=0)
+        self.count += len(segments)
+
+    def feed(self, mono: np.ndarray):
+        self.seen += len(mono)
+        buffer = np.concatenate([self.buffer, mono]) if len(self.buffer) else np.asarray(mono)
+        if len(buffer) >= self.nperseg:
+            ready = (len(buffer) - self.nperseg) // self.hop + 1
+            view = np.lib.stride_tricks.sliding_window_view(buffer, self.nperseg)
+            self._transform(view[::self.hop][:ready])
+            buffer = buffer[ready * self.hop:]
+        self.buffer = np.array(buffer, dtype=np.float64)
+
+    def add(self, later: "WelchAccumulator"):
+        """
+        Fold in an accumulator fed the audio that follows this one's
+        segments (the next shard of a track): segment sums add up, and its
+        unconsumed tail replaces this one's.
+        """
+        self.psd += later.psd
+        self.count += later.count
+        self.seen += later.seen
+        self.buffer = later.buffer
+
+    def finish(self) -> tuple:
+        """Zero-pad any uncovered tail into one last segment; returns (freqs, psd)."""
+        covered = self.hop if self.count else 0
+        if self.seen and len(self.buffer) > covered:
+            tail = np.zeros(self.nperseg)
+            tail[:len(self.buffer)] = self.buffer
+            self._transform(tail[np.newaxis, :])
+            self.buffer = np.zeros(0)
+        if self.count == 0:
+            return self.freqs, self.psd
+        return self.freqs, self.psd / self.count
+
+
+def welch_psd(mono: np.ndarray, sr: int, nperseg: int = 8192) -> tuple:
+    """
+    Welch-averaged power spectrum of a mono signal.
+
+    The tail is zero-padded to a whole segment so every sample contributes.
+    Returns (freqs, psd) with psd as mean power per rfft bin.
+    """
+    acc = WelchAccumulator(sr, nperseg)
+    acc.feed(mono)
+    return acc.finish()
+
+
+def band_energy(freqs: np.ndarray, psd: np.ndarray, bands=BANDS) -> list:
+    """Percent of total energy in each band: [{band, lo_hz, hi_hz, pct}]."""
+    total = float(np.sum(psd))
+    table = []
+    for name, lo, hi in bands:
+        energy = float(np.sum(psd[(freqs >= lo) & (freqs < hi)]))
+        table.append({
+            "band": name,
+            "lo_hz": lo,
+            "hi_hz": hi if np.isfinite(hi) else None,
+            "pct": round(100.0 * energy / total, 1) if total > 0 else 0.0,
+        })
+    return table
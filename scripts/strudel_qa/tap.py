@@ -0,0 +1,283 @@
+"""
+tap.py — Real-time QA tap for a raw PCM stream.
+
+Reads interleaved s16le or f32le PCM from stdin in small blocks and watches
+it live for the problems `strudel-qa gate` finds after the fact:
+  - Null drops — silence runs longer than --min-gap-ms (peak across channels
+    below --threshold), reported when the run reaches that length and again
+    when it ends
+  - Clipping — samples at or above --clip-dbfs, reported when an episode
+    starts and when it ends
+  - Short-term loudness — ITU BS.1770 momentary (400 ms) and short-term (3 s)
+    LUFS, reported every --loudness-every seconds
+
+Every event is one NDJSON line, written within one block of the issue
+appearing. State is a few fixed-size buffers (one block, 3 s of 100 ms hop
+energies, the K-weighting filter memory), so memory and per-block CPU stay
+constant for a stream of any length.
+
+Usage:
+    # Tee'd off the voice stream
+    ffmpeg -i render.wav -f s16le -ar 48000 -ac 2 - \\
+        | tee >(scripts/strudel-qa tap > qa-events.ndjson) \\
+        | <consumer>
+
+    # Inline: PCM passes through to stdout, events go to stderr
+    ffmpeg ... -f s16le - | scripts/strudel-qa tap --passthrough | <consumer>
+
+scripts/qa-tap.py runs the same command.
+
+Options:
+    --format         s16le or f32le (default: s16le)
+    --rate           Sample rate in Hz (default: 48000)
+    --channels       Interleaved channel count (default: 2)
+    --block-ms       Read/analysis block size in ms (default: 20)
+    --threshold      Max absolute amplitude counted as silence (default: 1e-5)
+    --min-gap-ms     Minimum silence run reported as a null drop (default: 50)
+    --skip-ms        Ignore silence in the first N ms of the stream (default: 500)
+    --clip-dbfs      Sample level counted as clipping (default: -0.1)
+    --loudness-every Seconds between loudness events (default: 1.0)
+    --passthrough    Copy the input PCM to stdout; events go to stderr
+
+Events (all carry "t", the stream position in seconds):
+    start, null_drop_start, null_drop, clipping_start, clipping, loudness, end
+
+Exit codes:
+    0  Stream ended with no null drops or clipping
+    1  Null drops or clipping were seen
+    3  Error (bad arguments, etc.)
+
+Dependencies: numpy, scipy
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from . import loudness
+from .gaps import find_silent_runs
+
+
+FORMATS = {
+    "s16le": (np.dtype("<i2"), float(1 << 15)),
+    "f32le": (np.dtype("<f4"), 1.0),
+}
+
+
+class SilenceWatch:
+    """Open/closed silent runs across blocks, announced once they reach min_len."""
+
+    def __init__(self, threshold: float, min_len: int, skip: int):
+        self.threshold = threshold
+        self.min_len = max(1, min_len)
+        self.skip = skip
+        self.open_start = None
+        self.open_peak = 0.0
+        self.announced = False
+        self.count = 0
+
+    def feed(self, envelope: np.ndarray, offset: int) -> list:
+        """Returns ("start" | "end", start, end, peak) tuples for this block."""
+        n = len(envelope)
+        lo = min(n, max(0, self.skip - offset))
+        starts, ends, peaks = find_silent_runs(envelope, self.threshold, 1, lo)
+        events = []
+        if self.open_start is not None and not (len(starts) and starts[0] == 0):
+            events.extend(self.flush(offset))
+
+        for start, end, peak in zip(starts.tolist(), ends.tolist(), peaks.tolist()):
+            if self.open_start is not None:
+                # Only the block's first run can continue one from the last block
+                self.open_peak = max(self.open_peak, peak)
+            else:
+                self.open_start, self.open_peak = offset + start, peak
+            if end < n:
+                events.extend(self.flush(offset + end))
+
+        if (self.open_start is not None and not self.announced
+                and offset + n - self.open_start >= self.min_len):
+            self.announced = True
+            events.append(("start", self.open_start, offset + n, self.open_peak))
+        return events
+
+    def flush(self, end: int) -> list:
+        """Close the open run (if any) at `end`."""
+        if self.open_start is None:
+            return []
+        start, peak = self.open_start, self.open_peak
+        self.open_start, self.announced = None, False
+        if end - start < self.min_len:
+            return []
+        self.count += 1
+        return [("end", start, end, peak)]
+
+
+class ClipWatch:
+    """Clipping episodes: consecutive blocks holding samples at or above the limit."""
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.episode = None
+        self.total = 0
+
+    def feed(self, frames: np.ndarray, offset: int, block_peak: float) -> list:
+        clipped = int(np.count_nonzero(np.abs(frames) >= self.limit)) if block_peak >= self.limit else 0
+        if clipped:
+            self.total += clipped
+            if self.episode is None:
+                self.episode = {"start": offset, "samples": clipped, "peak": block_peak}
+                return [("start", dict(self.episode))]
+            self.episode["samples"] += clipped
+            self.episode["peak"] = max(self.episode["peak"], block_peak)
+            return []
+        return self.flush(offset)
+
+    def flush(self, end: int) -> list:
+        if self.episode is None:
+            return []
+        episode, self.episode = self.episode, None
+        episode["end"] = end
+        return [("end", episode)]
+
+
+def run_tap(source, out, fmt="s16le", sr=48000, channels=2, block_ms=20.0,
+            threshold=1e-5, min_gap_ms=50.0, skip_ms=500.0, clip_dbfs=-0.1,
+            loudness_every=1.0, passthrough=None) -> dict:
+    """
+    Analyze PCM from the binary file `source`, writing NDJSON events to the
+    text file `out`. Returns the final "end" event.
+    """
+    dtype, scale = FORMATS[fmt]
+    frame_bytes = dtype.itemsize * channels
+    block_frames = max(1, int(sr * block_ms / 1000.0))
+    buffer = bytearray(block_frames * frame_bytes)
+    view = memoryview(buffer)
+
+    silence = SilenceWatch(threshold, int(sr * min_gap_ms / 1000.0), int(sr * skip_ms / 1000.0))
+    clips = ClipWatch(10.0 ** (clip_dbfs / 20.0))
+    meter = loudness.ShortTermMeter(sr, channels)
+    hop_s = meter.hop / sr
+    every_hops = max(1, int(round(loudness_every / hop_s)))
+    short_term_max = float("-inf")
+
+    def emit(event, position, **fields):
+        out.write(json.dumps({"event": event, "t": round(position / sr, 3), **fields}) + "\n")
+        out.flush()
+
+    def report_silence(events):
+        for kind, start, end, peak in events:
+            if kind == "start":
+                emit("null_drop_start", end, start_s=round(start / sr, 3))
+            else:
+                emit("null_drop", end, start_s=round(start / sr, 3),
+                     duration_ms=round((end - start) / sr * 1000.0, 1), max_amplitude=peak)
+
+    def report_clips(events, position):
+        for kind, episode in events:
+            peak_dbfs = round(loudness.amplitude_to_dbfs(episode["peak"]), 2)
+            if kind == "start":
+                emit("clipping_start", position, samples=episode["samples"], peak_dbfs=peak_dbfs)
+            else:
+                emit("clipping", position, start_s=round(episode["start"] / sr, 3),
+                     duration_ms=round((episode["end"] - episode["start"]) / sr * 1000.0, 1),
+                     samples=episode["samples"], peak_dbfs=peak_dbfs)
+
+    emit("start", 0, format=fmt, sample_rate=sr, channels=channels, block_ms=block_ms)
+    position = 0
+    pending = 0  # Bytes of a partial frame carried into the next read
+    while True:
+        got = source.readinto(view[pending:])
+        if not got:
+            break
+        filled = pending + got
+        usable = filled - filled % frame_bytes
+        if passthrough is not None:
+            passthrough.write(view[pending:filled])
+            passthrough.flush()
+        if usable == 0:
+            pending = filled
+            continue
+
+        frames = np.frombuffer(buffer, dtype=dtype, count=usable // dtype.itemsize)
+        frames = frames.reshape(-1, channels).astype(np.float64)
+        if scale != 1.0:
+            frames *= 1.0 / scale
+        envelope = np.max(np.abs(frames), axis=1)
+
+        report_silence(silence.feed(envelope, position))
+        report_clips(clips.feed(frames, position, float(envelope.max())), position + len(frames))
+        for hops, momentary, short_term in meter.feed(frames):
+            if short_term is not None:
+                short_term_max = max(short_term_max, short_term)
+            if hops % every_hops == 0:
+                emit("loudness", hops * meter.hop,
+                     momentary_lufs=None if momentary is None else round(momentary, 1),
+                     short_term_lufs=None if short_term is None else round(short_term, 1))
+
+        position += len(frames)
+        pending = filled - usable
+        buffer[:pending] = buffer[usable:filled]
+
+    report_silence(silence.flush(position))
+    report_clips(clips.flush(position), position)
+    end = {
+        "duration_s": round(position / sr, 3),
+        "null_drops": silence.count,
+        "clipped_samples": clips.total,
+        "short_term_max_lufs": round(short_term_max, 1) if np.isfinite(short_term_max) else None,
+    }
+    emit("end", position, **end)
+    return end
+
+
+def main(argv: list = None, prog: str = None):
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description="Real-time QA tap: raw PCM on stdin, NDJSON events out."
+    )
+    parser.add_argument("--format", choices=sorted(FORMATS), default="s16le")
+    parser.add_argument("--rate", type=int, default=48000)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--block-ms", type=float, default=20.0)
+    parser.add_argument("--threshold", type=float, default=1e-5)
+    parser.add_argument("--min-gap-ms", type=float, default=50.0)
+    parser.add_argument("--skip-ms", type=float, default=500.0)
+    parser.add_argument("--clip-dbfs", type=float, default=-0.1)
+    parser.add_argument("--loudness-every", type=float, default=1.0)
+    parser.add_argument("--passthrough", action="store_true",
+                        help="Copy PCM to stdout and write events to stderr")
+    args = parser.parse_args(argv)
+    if args.channels < 1 or args.rate < 1 or args.block_ms <= 0:
+        print("Error: --rate, --channels and --block-ms must be positive", file=sys.stderr)
+        sys.exit(3)
+
+    try:
+        end = run_tap(
+            sys.stdin.buffer,
+            sys.stderr if args.passthrough else sys.stdout,
+            fmt=args.format,
+            sr=args.rate,
+            channels=args.channels,
+            block_ms=args.block_ms,
+            threshold=args.threshold,
+            min_gap_ms=args.min_gap_ms,
+            skip_ms=args.skip_ms,
+            clip_dbfs=args.clip_dbfs,
+            loudness_every=args.loudness_every,
+            passthrough=sys.stdout.buffer if args.passthrough else None,
+        )
+    except KeyboardInterrupt:
+        sys.exit(0)
+    except BrokenPipeError:
+        sys.exit(0)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(3)
+
+    sys.exit(1 if end["null_drops"] or end["clipped_samples"] else 0)
+
+
+if __name__ == "__main__":
+    main()
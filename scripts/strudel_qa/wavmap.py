@@ -0,0 +1,213 @@
+"""
+wavmap.py — Zero-copy memory-mapped access to WAV PCM data.
+
+sf.read(dtype="float64") turns a 16-bit render into an array four times its
+size before any check runs, and the peak envelope is a second full-length
+copy. MappedWav instead maps the WAV data chunk with np.memmap and hands out
+cache-sized tiles in the file's native dtype:
+
+  - Silence thresholds are converted once to the native scale, so gap
+    detection compares int16/int32/float32 samples directly, with results
+    identical to thresholding the float64 decode.
+  - PeakEnvelope computes max |x| across channels one slice at a time, so
+    no full-length abs/max copy is ever built.
+  - float_blocks() converts a block at a time for the checks that need
+    floating point (K-weighting, Welch), with the same values sf.read
+    would produce.
+
+Only plain 16/32-bit integer and 32/64-bit float PCM can be mapped as-is
+(including WAVE_FORMAT_EXTENSIBLE); for anything else MappedWav.from_file()
+returns None and callers fall back to decoding with soundfile.
+
+Usage:
+    from strudel_qa.wavmap import MappedWav
+
+    wav = MappedWav.from_file("render.wav")
+    if wav is not None:
+        limit = wav.native_threshold(1e-5)
+        for offset, envelope in wav.envelope_tiles():
+            ...
+
+Dependencies: numpy
+"""
+
+import math
+import struct
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+
+
+# Frames per native-dtype tile: 16k stereo int16 frames is 64 KiB
+TILE_FRAMES = 1 << 14
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> (numpy dtype, full-scale divisor)
+# The divisors match libsndfile's normalization when reading as float.
+NATIVE_FORMATS = {
+    (WAVE_FORMAT_PCM, 16): (np.dtype("<i2"), float(1 << 15)),
+    (WAVE_FORMAT_PCM, 32): (np.dtype("<i4"), float(1 << 31)),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): (np.dtype("<f4"), 1.0),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): (np.dtype("<f8"), 1.0),
+}
+
+# Integer envelopes are widened so |-32768| does not wrap
+ENVELOPE_DTYPES = {
+    np.dtype("<i2"): np.dtype(np.int32),
+    np.dtype("<i4"): np.dtype(np.int64),
+}
+
+
+def parse_wav_header(path: str):
+    """
+    Locate the fmt and data chunks of a RIFF/WAVE file.
+
+    Returns (format_tag, channels, sr, bits, data_offset, data_bytes), or
+    None if the file is not a WAV with both chunks. data_bytes is clamped
+    to the file size (streamed writers leave a placeholder size).
+    """
+    file_size = Path(path).stat().st_size
+    with open(path, "rb") as f:
+        return read_wav_header(f, file_size)
+
+
+def read_wav_header(f, file_size: int = None):
+    """
+    parse_wav_header() for a binary stream at the start of a WAV, which is
+    left at the first data byte (pipes and files still being written work
+    too). Without `file_size`, data_bytes is the size the header claims.
+    """
+    head = f.read(12)
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    offset = 12
+    fmt = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        offset += 8
+        chunk_id, size = struct.unpack("<4sI", chunk)
+        if chunk_id == b"data":
+            if fmt is None:
+                return None
+            if file_size is not None:
+                size = min(size, file_size - offset)
+            return fmt + (offset, size)
+        body = f.read(size + (size & 1))
+        offset += len(body)
+        if chunk_id == b"fmt " and len(body) >= 16:
+            tag, channels, sr, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                # First two bytes of the SubFormat GUID are the real tag
+                tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (tag, channels, sr, bits)
+
+
+class PeakEnvelope:
+    """
+    Per-sample max |x| across channels of a mapped WAV, computed per slice.
+
+    Behaves like a read-only 1-D array for len() and slicing, so the gap
+    kernels and EnvelopePyramid can scan it tile by tile. Values are in the
+    native scale (widened for integers).
+    """
+
+    def __init__(self, frames: np.ndarray):
+        self.frames = frames
+        self.dtype = ENVELOPE_DTYPES.get(frames.dtype, frames.dtype)
+
+    def __len__(self) -> int:
+        return self.frames.shape[0]
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("PeakEnvelope only supports contiguous slices")
+        tile = self.frames[key]
+        if self.dtype != tile.dtype:
+            tile = tile.astype(self.dtype)
+        if tile.shape[1] == 1:
+            return np.abs(tile[:, 0])
+        return np.abs(tile).max(axis=1)
+
+
+class MappedWav:
+    """Memory-mapped WAV PCM data, shaped (samples, channels) in native dtype."""
+
+    def __init__(self, frames: np.ndarray, sr: int, scale: float, path: str = None):
+        self.frames = frames
+        self.sr = int(sr)
+        self.scale = scale
+        self.path = path
+
+    @classmethod
+    def from_file(cls, audio_path: str):
+        """Map a WAV file's data chunk, or return None if it cannot be mapped natively."""
+        path = Path(audio_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        header = parse_wav_header(str(path))
+        if header is None:
+            return None
+        tag, channels, sr, bits, offset, data_bytes = header
+        native = NATIVE_FORMATS.get((tag, bits))
+        if native is None or channels < 1:
+            return None
+        dtype, scale = native
+
+        num_samples = data_bytes // (dtype.itemsize * channels)
+        if num_samples == 0:
+            frames = np.zeros((0, channels), dtype=dtype)
+        else:
+            frames = np.memmap(str(path), dtype=dtype, mode="r", offset=offset,
+                               shape=(num_samples, channels))
+        return cls(frames, sr, scale, str(path))
+
+    @property
+    def channels(self) -> int:
+        return self.frames.shape[1]
+
+    @property
+    def num_samples(self) -> int:
+        return self.frames.shape[0]
+
+    @property
+    def duration_s(self) -> float:
+        return self.num_samples / self.sr
+
+    @cached_property
+    def envelope(self) -> PeakEnvelope:
+        return PeakEnvelope(self.frames)
+
+    def native_threshold(self, threshold: float):
+        """
+        Threshold `t` in the envelope's native dtype, such that
+        envelope < native_threshold(t) exactly when envelope / scale < t.
+        """
+        dtype = self.envelope.dtype
+        if dtype.kind == "i":
+            # Integers below t*scale are exactly those below its ceiling
+            return dtype.type(min(math.ceil(threshold * self.scale), np.iinfo(dtype).max))
+        # Smallest value of the dtype that is >= t: x < t iff x < that value
+        native = dtype.type(threshold)
+        if float(native) < threshold:
+            native = np.nextafter(native, dtype.type(np.inf))
+        return native
+
+    def envelope_tiles(self, start: int = 0, end: int = None, tile_frames: int = TILE_FRAMES):
+        """Yield (offset, native peak envelope) for tiles of [start, end)."""
+        end = self.num_samples if end is None else end
+        for lo in range(start, end, tile_frames):
+            yield lo, self.envelope[lo:min(lo + tile_frames, end)]
+
+    def float_blocks(self, block_frames: int = 1 << 16):
+        """Yield float64 (samples, channels) blocks, scaled as sf.read would."""
+        for lo in range(0, self.num_samples, block_frames):
+            block = self.frames[lo:lo + block_frames].astype(np.float64)
+            if self.scale != 1.0:
+                block *= 1.0 / self.scale
+            yield block